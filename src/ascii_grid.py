@@ -0,0 +1,968 @@
+"""
+Reader for ESRI ASCII grids
+The header is parsed once by keyword and the body is bulk parsed into one contiguous float array,
+rather than reading the file line by line
+Parsed grids are cached as binary sidecars (.npy body and .json header), so later loads memory-map
+the body instead of parsing text again. The cache is kept within a size budget by removing least recently
+used sidecars, and sidecars of grids that have since changed
+Lazy grids aren't parsed at all, an index of row byte offsets lets single rows be read when sampled
+Directories of tiles are catalogued from their headers alone, and tiles are only opened when sampled
+Gzip and bz2 compressed grids are decompressed as they're parsed, without a decompressed copy on disk
+Bodies of large plain grids are split into ranges of rows parsed by a pool of processes into shared memory
+"""
+
+import bz2
+import gzip
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Any, BinaryIO, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+# Header keywords, and the field each is stored in
+header_keys = {
+    "ncols": "n_cols",
+    "nrows": "n_rows",
+    "xllcorner": "x_corner",
+    "xllcenter": "x_corner",
+    "yllcorner": "y_corner",
+    "yllcenter": "y_corner",
+    "cellsize": "cellsize",
+    "nodata_value": "nodata_value"
+}
+
+# NODATA value assumed when header doesn't give one
+default_nodata_value = -9999
+
+# Rasters are stored at single precision, ample for surveyed elevations and 4 bytes per cell
+raster_dtype = np.float32
+
+# Local directory of cached grids, shared between sessions
+cache_dir = os.path.join(os.path.expanduser("~"), ".stix", "raster_cache")
+
+# Whether sidecars are read and written at all
+cache_enabled = True
+
+# Bytes sidecars may use on disk, None for no limit
+cache_budget = 2 * 2**30
+
+# Changed whenever the layout of cached grids changes, so older sidecars are ignored
+cache_version = 2
+
+# Bytes of grid scanned at once when indexing rows
+index_chunk_size = 2 ** 24
+
+# Bytes of grid body text parsed at once
+parse_chunk_size = 2 ** 20
+
+# Bytes of grid body above which the body is parsed in parallel, smaller bodies aren't worth starting processes
+parallel_parse_size = 2 ** 26
+
+# Leading bytes of compressed grids, and the module that decompresses them
+compressions = {
+    b"\x1f\x8b": gzip,
+    b"BZh": bz2
+}
+
+# File extensions of plain and compressed ASCII grids
+grid_extensions = (".asc", ".asc.gz", ".asc.bz2")
+
+# Tile catalogs built this session, by directory
+tile_catalogs = {}
+
+
+class RasterCache():
+    """
+    Rasters held in memory up to a budget, by cache key
+    Least recently used rasters are evicted first, the most recently added raster is always kept
+    """
+    def __init__(self, budget: Optional[int] = None) -> None:
+        """
+        Args:
+            budget (Optional[int], optional): Bytes rasters may use. Defaults to None (unlimited)
+        """
+        self.budget = budget
+        self.rasters = OrderedDict()
+        self.size = 0
+
+    def get(self, key: str, read: Callable[[], np.ndarray]) -> np.ndarray:
+        """ Get raster, reading and adding it if not held
+        """
+        if key in self.rasters:
+            self.rasters.move_to_end(key)
+            return self.rasters[key]
+
+        raster = read()
+        self.put(key, raster)
+        return raster
+
+    def put(self, key: str, raster: np.ndarray) -> None:
+        """ Add raster as most recently used, evicting others while over budget
+        """
+        self.discard(key)
+        self.rasters[key] = raster
+        self.size += raster.nbytes
+
+        while self.budget is not None and self.size > self.budget and len(self.rasters) > 1:
+            _, evicted = self.rasters.popitem(last=False)
+            self.size -= evicted.nbytes
+
+    def discard(self, key: str) -> None:
+        """ Remove raster if held
+        """
+        if key in self.rasters:
+            self.size -= self.rasters.pop(key).nbytes
+
+
+# Rasters of grids uploaded with a memory budget, shared by the whole session
+raster_cache = RasterCache()
+
+
+def parse_number(token: Union[bytes, float]) -> Union[int, float]:
+    """ Parse header value, keeping whole numbers as ints
+    """
+    value = float(token)
+    return int(value) if value.is_integer() else value
+
+
+def get_compression(fname: str) -> Optional[Any]:
+    """ Module that decompresses grid (gzip or bz2), None if grid isn't compressed
+    """
+    with open(fname, "rb") as f:
+        magic = f.read(3)
+    for prefix, module in compressions.items():
+        if magic.startswith(prefix):
+            return module
+    return None
+
+
+def open_grid(fname: str) -> BinaryIO:
+    """ Open ASCII grid in binary mode, compressed grids are decompressed as they're read
+    """
+    compression = get_compression(fname)
+    return open(fname, "rb") if compression is None else compression.open(fname, "rb")
+
+
+def read_header(f: BinaryIO) -> Dict[str, Union[int, float]]:
+    """ Read header of ASCII grid, leaving file positioned at start of body
+
+    Args:
+        f (BinaryIO): ASCII grid opened in binary mode
+
+    Returns:
+        Dict[str, Union[int, float]]: Number of columns and rows, lower left corner coordinates, cellsize and
+            NODATA value of grid
+
+    Raises:
+        ValueError: A required header value is missing
+    """
+    header = {"nodata_value": default_nodata_value}
+    centers = []
+    while True:
+        position = f.tell()
+        tokens = f.readline().split()
+
+        # Body starts at first line that isn't a header keyword
+        if len(tokens) != 2 or tokens[0].decode("ascii", "ignore").lower() not in header_keys:
+            f.seek(position)
+            break
+
+        key = tokens[0].decode().lower()
+        header[header_keys[key]] = parse_number(tokens[1])
+        if key.endswith("center"):
+            centers.append(header_keys[key])
+
+    missing = [field for field in ["n_cols", "n_rows", "x_corner", "y_corner", "cellsize"] if field not in header]
+    if missing:
+        raise ValueError(f"ASCII grid header is missing {', '.join(missing)}")
+
+    # Centre of lower left cell is half a cell in from the corner
+    for field in centers:
+        header[field] = parse_number(header[field] - header["cellsize"] / 2)
+
+    return header
+
+
+def get_cache_key(fname: str) -> str:
+    """ Key of grid's cached sidecars, changes if grid file is moved, resized or modified
+    Keys of the same grid share a prefix, so sidecars superseded by changes to the grid can be found
+
+    Args:
+        fname (str): Filename of ASCII grid
+
+    Returns:
+        str: Hex digest of grid's path, then of its size and modification time
+    """
+    stat = os.stat(fname)
+    source = hashlib.sha1(f"{cache_version}|{os.path.abspath(fname)}".encode()).hexdigest()[:20]
+    state = hashlib.sha1(f"{stat.st_size}|{stat.st_mtime_ns}".encode()).hexdigest()[:20]
+    return f"{source}_{state}"
+
+
+def get_cache_paths(key: str) -> Tuple[str, str]:
+    """ Locations of body (.npy) and header (.json) sidecars of cached grid
+    """
+    return os.path.join(cache_dir, f"{key}.npy"), os.path.join(cache_dir, f"{key}.json")
+
+
+def get_row_index_path(key: str) -> str:
+    """ Location of row offsets (.rows.npy) sidecar of lazy grid
+    """
+    return os.path.join(cache_dir, f"{key}.rows.npy")
+
+
+def write_sidecar(path: str, write: Callable[[BinaryIO], Any]) -> None:
+    """ Write sidecar in the cache directory, replacing it in one step so other sessions never see
+    partial sidecars. Nothing is written if the cache is disabled
+    """
+    if not cache_enabled:
+        return
+
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        write(f)
+    os.replace(temp_path, path)
+
+
+def touch_sidecar(path: str) -> None:
+    """ Mark sidecar as used, sidecars used least recently are removed first when the cache is over budget
+    """
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def prune_cache(key: Optional[str] = None) -> None:
+    """ Remove sidecars superseded by key (those of the same grid before it last changed), then remove least
+    recently used sidecars while the cache is over budget
+    Sidecars of key are always kept. Sidecars that can't be removed (e.g. memory-mapped on Windows) are left
+
+    Args:
+        key (Optional[str], optional): Cache key of grid just cached. Defaults to None
+    """
+    if not cache_enabled:
+        return
+
+    try:
+        names = os.listdir(cache_dir)
+    except OSError:
+        return
+
+    # Size, last use and files of each cache entry, files of an entry share the name before their extension
+    entries = {}
+    for name in names:
+        if name.endswith(".tmp"):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entry = entries.setdefault(name.split(".")[0], {"size": 0, "used": 0, "paths": []})
+        entry["size"] += stat.st_size
+        entry["used"] = max(entry["used"], stat.st_mtime_ns)
+        entry["paths"].append(path)
+
+    source = key.split("_")[0] + "_" if key is not None else None
+    size = sum(entry["size"] for entry in entries.values())
+    for entry_key in sorted(entries, key=lambda entry_key: entries[entry_key]["used"]):
+        superseded = source is not None and entry_key.startswith(source) and entry_key != key
+        over_budget = cache_budget is not None and size > cache_budget and entry_key != key
+        if superseded or over_budget:
+            for path in entries[entry_key]["paths"]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            size -= entries[entry_key]["size"]
+
+
+def read_cache(key: str) -> Optional[Tuple[Dict[str, Union[int, float]], np.ndarray]]:
+    """ Read header and memory-map body of cached grid
+
+    Args:
+        key (str): Cache key of grid
+
+    Returns:
+        Optional[Tuple[Dict[str, Union[int, float]], np.ndarray]]: Header and read-only body, None if grid
+            isn't cached or the cache is disabled
+    """
+    if not cache_enabled:
+        return None
+
+    body_path, header_path = get_cache_paths(key)
+    try:
+        with open(header_path) as f:
+            header = json.load(f)
+        body = np.load(body_path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+
+    touch_sidecar(header_path)
+    return header, body
+
+
+def write_cache(key: str, header: Dict[str, Union[int, float]], body: np.ndarray) -> None:
+    """ Write sidecars of parsed grid
+    Header is written last so only complete sidecars are read. Grids that can't be cached (e.g. cache
+    directory is read-only) are parsed again next time. The cache is then pruned
+
+    Args:
+        key (str): Cache key of grid
+        header (Dict[str, Union[int, float]]): Header values of grid
+        body (np.ndarray): Body of grid
+    """
+    body_path, header_path = get_cache_paths(key)
+    try:
+        write_sidecar(body_path, lambda f: np.save(f, body))
+        write_sidecar(header_path, lambda f: f.write(json.dumps(header).encode()))
+    except OSError:
+        pass
+
+    prune_cache(key)
+
+
+def describe_bad_row(block: bytes, n_cols: int, row: int) -> str:
+    """ Describe first line of a block of grid body that isn't a row of values, for errors raised when parsing
+
+    Args:
+        block (bytes): Lines of grid body
+        n_cols (int): Number of columns given by header
+        row (int): Row of grid the block starts at
+
+    Returns:
+        str: Error message
+    """
+    # Blank lines are skipped by loadtxt, so aren't rows
+    for line in filter(bytes.strip, block.splitlines()):
+        tokens = line.split()
+        if len(tokens) != n_cols:
+            return f"Row {row} of ASCII grid body has {len(tokens)} values, header gives {n_cols}"
+        try:
+            np.array(tokens, dtype=raster_dtype)
+        except ValueError:
+            return f"Row {row} of ASCII grid body has values that aren't numbers"
+        row += 1
+
+    return f"ASCII grid body couldn't be parsed from row {row}"
+
+
+def parse_rows(f: BinaryIO, body: np.ndarray, nodata_value: float, first_row: int = 0, size: int = -1) -> int:
+    """ Parse lines of grid body into rows of an array, in blocks of whole lines
+    Rows go straight into the array, so neither the body text nor a growing copy of the body is held.
+    loadtxt's tokenizer parses each block in C
+
+    Args:
+        f (BinaryIO): Grid positioned at first line
+        body (np.ndarray): Body to fill, NODATA cells are given NaN
+        nodata_value (float): NODATA value of grid
+        first_row (int, optional): Row of body the first line is parsed into. Defaults to 0
+        size (int, optional): Bytes of grid to parse. Defaults to -1 (rest of grid)
+
+    Returns:
+        int: Row after last row parsed
+
+    Raises:
+        ValueError: Lines don't have one value per column, or there are more lines than rows
+    """
+    n_rows, n_cols = body.shape
+    row = first_row
+    remainder = b""
+    while True:
+        chunk = f.read(parse_chunk_size if size < 0 else min(parse_chunk_size, size))
+        size -= len(chunk)
+        block = remainder + chunk
+        if chunk:
+            end = block.rfind(b"\n") + 1
+            block, remainder = block[:end], block[end:]
+
+        if block.strip():
+            try:
+                values = np.loadtxt(io.BytesIO(block), dtype=raster_dtype, ndmin=2)
+            except ValueError:
+                values = None
+            if values is None or values.shape[1] != n_cols:
+                raise ValueError(describe_bad_row(block, n_cols, row))
+            if row + len(values) > n_rows:
+                raise ValueError(f"ASCII grid body has more than {n_rows} rows")
+            values[values == nodata_value] = np.nan
+            body[row:row + len(values)] = values
+            row += len(values)
+
+        if not chunk:
+            return row
+
+
+class SharedBody():
+    """
+    Body array in a block of shared memory, which is closed once the array and all views of it are gone
+    Arrays made with np.asarray(shared_body) have it as their base. The array holds only the address of the
+    block rather than a buffer exported by it, so the block can be closed when the last array is freed
+    """
+    def __init__(self, memory: shared_memory.SharedMemory, shape: Tuple[int, int]) -> None:
+        self.memory = memory
+        self.__array_interface__ = np.ndarray(shape, dtype=raster_dtype, buffer=memory.buf).__array_interface__
+
+    def __del__(self) -> None:
+        self.memory.close()
+
+
+def parse_range(fname: str, memory_name: str, shape: Tuple[int, int], first_row: int, last_row: int, start: int,
+                stop: int, nodata_value: float) -> bool:
+    """ Parse range of rows of grid body into a body array in shared memory
+    Run in worker processes, each parsing its own rows
+
+    Args:
+        fname (str): Filename of ASCII grid
+        memory_name (str): Name of shared memory holding body
+        shape (Tuple[int, int]): Shape of body
+        first_row (int): First row of range
+        last_row (int): Row after last row of range
+        start (int): Byte offset of first row
+        stop (int): Byte offset of end of last row
+        nodata_value (float): NODATA value of grid
+
+    Returns:
+        bool: Whether range held one line per row
+
+    Raises:
+        ValueError: Lines don't have one value per column, rows are numbered from the start of the body
+    """
+    memory = shared_memory.SharedMemory(name=memory_name)
+    try:
+        body = np.ndarray(shape, dtype=raster_dtype, buffer=memory.buf)
+        with open(fname, "rb") as f:
+            f.seek(start)
+            row = parse_rows(f, body, nodata_value, first_row, stop - start)
+
+        # Body must be released before shared memory is closed
+        del body
+    finally:
+        memory.close()
+
+    return row == last_row
+
+
+def parse_body_parallel(fname: str, header: Dict[str, Union[int, float]], body_start: int,
+                        workers: int) -> Optional[np.ndarray]:
+    """ Parse body of ASCII grid in a pool of processes
+    Body is split into ranges of whole rows of about equal size, found from the row index, and each process
+    parses its rows straight into one body array in shared memory. The array is returned in place rather than
+    copied out, and holds the shared memory until it's freed
+
+    Args:
+        fname (str): Filename of ASCII grid
+        header (Dict[str, Union[int, float]]): Header values of grid
+        body_start (int): Byte offset of first row
+        workers (int): Number of processes
+
+    Returns:
+        Optional[np.ndarray]: Body, None if it couldn't be parsed in parallel (e.g. rows wrapped over several
+            lines or shared memory unavailable), in which case it should be parsed in one process
+
+    Raises:
+        ValueError: Lines don't have one value per column
+    """
+    shape = (header["n_rows"], header["n_cols"])
+    row_offsets = index_rows(fname, body_start, header["n_rows"])
+    if row_offsets is None:
+        return None
+
+    bounds = np.unique(np.searchsorted(row_offsets, np.linspace(row_offsets[0], row_offsets[-1], workers + 1)))
+
+    try:
+        memory = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * np.dtype(raster_dtype).itemsize, 1))
+    except OSError:
+        return None
+
+    complete = False
+    try:
+        # Processes are spawned rather than forked, forking a process running Qt threads can deadlock
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            parsed = [pool.submit(parse_range, fname, memory.name, shape, first_row, last_row,
+                                  row_offsets[first_row], row_offsets[last_row], header["nodata_value"])
+                      for first_row, last_row in zip(bounds[:-1], bounds[1:]) if last_row > first_row]
+            complete = all([future.result() for future in parsed])
+    except BrokenProcessPool:
+        pass
+    finally:
+        # Block outlives its name for as long as it's mapped
+        memory.unlink()
+        if not complete:
+            memory.close()
+
+    return np.asarray(SharedBody(memory, shape)) if complete else None
+
+
+def parse_grid(fname: str, workers: Optional[int] = None) -> Tuple[Dict[str, Union[int, float]], np.ndarray, int]:
+    """ Parse header and body of ASCII grid
+    Bodies of large plain grids are parsed in parallel, compressed grids are parsed as they're decompressed
+
+    Args:
+        fname (str): Filename of ASCII grid
+        workers (Optional[int], optional): Processes large bodies are parsed in. Defaults to None (one per CPU)
+
+    Returns:
+        Tuple[Dict[str, Union[int, float]], np.ndarray, int]: Header and body, with NaN in NODATA cells, and
+            bytes of grid parsed, after decompression
+
+    Raises:
+        ValueError: Body doesn't have the number of rows and columns given by header
+    """
+    workers = workers or os.cpu_count() or 1
+    compressed = get_compression(fname) is not None
+
+    with open_grid(fname) as f:
+        header = read_header(f)
+        body_start = f.tell()
+
+        body = None
+        size = os.path.getsize(fname)
+        if workers > 1 and not compressed and size - body_start > parallel_parse_size:
+            body = parse_body_parallel(fname, header, body_start, workers)
+
+        if body is None:
+            f.seek(body_start)
+            body = np.empty((header["n_rows"], header["n_cols"]), dtype=raster_dtype)
+            rows = parse_rows(f, body, header["nodata_value"])
+            if rows != header["n_rows"]:
+                raise ValueError(f"ASCII grid body has {rows} rows, header gives {header['n_rows']}")
+
+            # Compressed grids are at the end of their decompressed text
+            size = f.tell()
+
+    return header, body, size
+
+
+def index_rows(fname: str, body_start: int, n_rows: int) -> Optional[np.ndarray]:
+    """ Find byte offsets of rows in body of ASCII grid, without parsing values
+
+    Args:
+        fname (str): Filename of ASCII grid
+        body_start (int): Byte offset of first row
+        n_rows (int): Number of rows given by header
+
+    Returns:
+        Optional[np.ndarray]: Offset of the start of each row, then of the end of the last row. None if rows
+            don't each take one line (e.g. rows wrapped over several lines)
+    """
+    newlines = []
+    with open(fname, "rb") as f:
+        f.seek(body_start)
+        position = body_start
+        while chunk := f.read(index_chunk_size):
+            newlines.append(np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == ord("\n")) + position)
+            position += len(chunk)
+
+        # Lines start after each newline, the last ends at the end of the file
+        offsets = np.concatenate([[body_start]] + [lines + 1 for lines in newlines]).astype(np.int64)
+        offsets = np.append(offsets[offsets < position], position)
+
+        # Blank lines at the end of the file aren't rows
+        if len(offsets) - 1 > n_rows:
+            f.seek(offsets[n_rows])
+            if f.read().strip():
+                return None
+            offsets = offsets[:n_rows + 1]
+
+    return offsets if len(offsets) - 1 == n_rows else None
+
+
+class LazyRaster():
+    """
+    Raster of an ASCII grid that is read on demand rather than held in memory
+    Supports the indexing used when sampling, raster[y_indexes, x_indexes], by seeking to and parsing only
+    the rows that are sampled. The index of row offsets is built on first use, or read from the cache
+    """
+    def __init__(self, fname: str, use_cache: bool = True) -> None:
+        self.fname = fname
+        self.use_cache = use_cache
+        self.header = None
+        self.row_offsets = None
+
+    def index(self) -> bool:
+        """ Read header and find row offsets of grid, if not already done
+
+        Returns:
+            bool: Whether grid can be read lazily
+        """
+        if self.row_offsets is None:
+            # Compressed grids can't be read from row offsets
+            if get_compression(self.fname) is not None:
+                return False
+
+            with open(self.fname, "rb") as f:
+                self.header = read_header(f)
+                body_start = f.tell()
+
+            key = get_cache_key(self.fname)
+            use_cache = self.use_cache and cache_enabled
+            try:
+                if use_cache:
+                    self.row_offsets = np.load(get_row_index_path(key))
+                    touch_sidecar(get_row_index_path(key))
+            except (OSError, ValueError):
+                pass
+
+            if self.row_offsets is None:
+                self.row_offsets = index_rows(self.fname, body_start, self.header["n_rows"])
+                if self.row_offsets is None:
+                    return False
+                if use_cache:
+                    try:
+                        write_sidecar(get_row_index_path(key), lambda f: np.save(f, self.row_offsets))
+                    except OSError:
+                        pass
+                    prune_cache(key)
+
+        return True
+
+    def __getitem__(self, indexes: Tuple[np.ndarray, np.ndarray]) -> np.ndarray:
+        """ Values at pairs of row and column indexes, with NaN in NODATA cells
+        """
+        if not self.index():
+            raise ValueError(f"Rows of ASCII grid {self.fname} don't each take one line")
+
+        y_indexes, x_indexes = np.broadcast_arrays(*indexes)
+        values = np.empty(y_indexes.shape, dtype=raster_dtype)
+
+        # Each row is read once for all of its indexes
+        order = np.argsort(y_indexes, axis=None, kind="stable")
+        rows, starts = np.unique(y_indexes.ravel()[order], return_index=True)
+        with open(self.fname, "rb") as f:
+            for row, positions in zip(rows, np.split(order, starts[1:])):
+                f.seek(self.row_offsets[row])
+                row_values = np.array(f.read(self.row_offsets[row + 1] - self.row_offsets[row]).split(),
+                                      dtype=raster_dtype)
+                if len(row_values) != self.header["n_cols"]:
+                    raise ValueError(f"Row {row} of ASCII grid {self.fname} has {len(row_values)} values, "
+                                     f"header gives {self.header['n_cols']}")
+                values.flat[positions] = row_values[x_indexes.ravel()[positions]]
+
+        values[values == self.header["nodata_value"]] = np.nan
+        return values
+
+    def to_dict(self) -> Dict[str, Any]:
+        """ Reference to grid saved in appraisal files in place of its values
+        """
+        return {"lazy_fname": self.fname}
+
+
+def cache_grid(fname: str, directory: str, budget: Optional[int]) -> float:
+    """ Parse ASCII grid into the raster cache
+    Run in worker processes during upload, parsed bodies reach the uploading process through the cache
+    sidecars rather than being pickled
+
+    Args:
+        fname (str): Filename of ASCII grid
+        directory (str): Cache directory of uploading process
+        budget (Optional[int]): Cache budget of uploading process (bytes)
+
+    Returns:
+        float: Speed grid was parsed at (MB/s), or read at if already cached
+    """
+    global cache_dir, cache_budget
+    cache_dir = directory
+    cache_budget = budget
+
+    # Grids are already parsed in parallel, one per process
+    return AsciiGrid(fname, workers=1).throughput
+
+
+class CachedRaster():
+    """
+    Raster held in raster_cache rather than by the data handler
+    Supports the indexing used when sampling, raster[y_indexes, x_indexes]. Evicted rasters are read again from
+    their cache sidecar, or parsed from their ASCII grid if the sidecar has gone
+    """
+    def __init__(self, fname: str, key: str) -> None:
+        self.fname = fname
+        self.key = key
+
+    def read(self) -> np.ndarray:
+        """ Read raster into memory
+        """
+        cached = read_cache(self.key)
+        if cached is not None:
+            return np.array(cached[1])
+
+        header, body, _ = parse_grid(self.fname)
+        write_cache(self.key, header, body)
+        return body
+
+    def load(self) -> np.ndarray:
+        """ Get raster from raster_cache, reading it if evicted
+        """
+        return raster_cache.get(self.key, self.read)
+
+    def __getitem__(self, indexes: Tuple[np.ndarray, np.ndarray]) -> np.ndarray:
+        return self.load()[indexes]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """ Reference to grid saved in appraisal files in place of its values
+        """
+        return {"cached_fname": self.fname, "cache_key": self.key}
+
+
+class AsciiGrid():
+    """
+    ESRI ASCII grid read from file, with its header values and body as a 2D single precision array
+    NODATA cells hold NaN. Lazy grids have a LazyRaster body instead, unless their rows can't be indexed
+    """
+    def __init__(self, fname: str, use_cache: bool = True, lazy: bool = False, workers: Optional[int] = None) -> None:
+        """
+        Args:
+            fname (str): Filename of ASCII grid
+            use_cache (bool, optional): Read and write cache sidecars. Defaults to True
+            lazy (bool, optional): Read only sampled rows. Defaults to False
+            workers (Optional[int], optional): Processes large bodies are parsed in. Defaults to None (one per CPU)
+        """
+        start = time.perf_counter()
+        self.cache_key = get_cache_key(fname)
+        self.cached = False
+
+        # Lazy grids are indexed, cached grids are memory-mapped, others are parsed then cached
+        body = LazyRaster(fname, use_cache) if lazy else None
+        if body is not None and body.index():
+            header = body.header
+            read_size = os.path.getsize(fname)
+        else:
+            cached = read_cache(self.cache_key) if use_cache else None
+            self.cached = cached is not None
+            if self.cached:
+                header, body = cached
+                read_size = body.nbytes
+            else:
+                header, body, read_size = parse_grid(fname, workers)
+                if use_cache:
+                    write_cache(self.cache_key, header, body)
+
+        self.fname = fname
+        self.n_cols = header["n_cols"]
+        self.n_rows = header["n_rows"]
+        self.x_corner = header["x_corner"]
+        self.y_corner = header["y_corner"]
+        self.cellsize = header["cellsize"]
+        self.nodata_value = header["nodata_value"]
+        self.body = body
+
+        # Read speed, reported to user during upload. Compressed grids are measured by their decompressed size
+        self.read_time = time.perf_counter() - start
+        self.throughput = read_size / 2**20 / max(self.read_time, 1e-9)
+
+
+def load_raster(key: Optional[str], points: Any) -> Union[np.ndarray, LazyRaster, CachedRaster]:
+    """ Restore raster of grid saved in an appraisal file
+    Grid's cached body is memory-mapped when still available, otherwise the saved values are converted.
+    Lazy grids and grids uploaded with a memory budget are read again when sampled
+
+    Args:
+        key (Optional[str]): Cache key of grid when uploaded, None for files saved before grids were cached
+        points (Any): Saved raster values, with None or NaN in NODATA cells, or reference to lazy or cached grid
+
+    Returns:
+        Union[np.ndarray, LazyRaster, CachedRaster]: Raster of grid
+    """
+    if isinstance(points, dict):
+        if "lazy_fname" in points:
+            return LazyRaster(points["lazy_fname"])
+        return CachedRaster(points["cached_fname"], points["cache_key"])
+
+    cached = read_cache(key) if key is not None else None
+    if cached is not None and cached[1].shape == (len(points), len(points[0]) if len(points) else 0):
+        return cached[1]
+    return np.array(points, dtype=raster_dtype)
+
+
+def get_elevations(values: np.ndarray) -> np.ndarray:
+    """ Convert raster values to double precision, keeping the shortest decimal that rounds to each (e.g.
+    12.345 rather than 12.345000267 at single precision). NODATA cells give NaN
+    """
+    return np.asarray(values).astype(str).astype(float)
+
+
+def sample_rasters(eastings: np.ndarray, northings: np.ndarray, x_corners: List[float], y_corners: List[float],
+                   cellsizes: List[float], n_cols: List[int], n_rows: List[int],
+                   rasters: Iterable[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """ Sample rasters at the nearest measured point to each location
+    Locations are sorted by easting once, so the candidates of each grid are found by binary search rather
+    than testing every location against every grid. Where grids overlap, the later grid is sampled
+
+    Args:
+        eastings (np.ndarray): Eastings of locations
+        northings (np.ndarray): Northings of locations
+        x_corners (List[float]): Lower left x coordinate of each grid
+        y_corners (List[float]): Lower left y coordinate of each grid
+        cellsizes (List[float]): Cellsize of each grid
+        n_cols (List[int]): Number of columns in each grid
+        n_rows (List[int]): Number of rows in each grid
+        rasters (Iterable[np.ndarray]): Body of each grid, as an array, LazyRaster or CachedRaster
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Sampled value at each location (NaN in NODATA cells), and mask of
+            locations inside at least one grid
+    """
+    eastings = np.asarray(eastings, dtype=float)
+    northings = np.asarray(northings, dtype=float)
+    values = np.full(len(eastings), np.nan)
+    inside = np.zeros(len(eastings), dtype=bool)
+
+    # Extent index of locations
+    order = np.argsort(eastings, kind="stable")
+    sorted_eastings = eastings[order]
+
+    for x_start, y_start, cellsize, cols, rows, raster in zip(
+            x_corners, y_corners, cellsizes, n_cols, n_rows, rasters):
+        x_stop = x_start + cols * cellsize
+        y_stop = y_start + rows * cellsize
+
+        # Locations strictly inside grid
+        candidates = order[np.searchsorted(sorted_eastings, x_start, side="right"):
+                           np.searchsorted(sorted_eastings, x_stop, side="left")]
+        candidates = candidates[(northings[candidates] > y_start) & (northings[candidates] < y_stop)]
+        if not len(candidates):
+            continue
+
+        # Round x and y to the nearest multiple of cellsize, this finds the nearest measured point in the grid
+        round_x = np.trunc(cellsize * np.round(eastings[candidates] / cellsize))
+        round_y = np.trunc(cellsize * np.round(northings[candidates] / cellsize))
+
+        # Indexes at top edges of grids are rounded down
+        x_indexes = np.minimum(np.trunc((round_x - x_start) / cellsize).astype(np.intp), cols - 1)
+        y_indexes = np.minimum(np.trunc(rows - ((round_y - y_start) / cellsize)).astype(np.intp), rows - 1)
+
+        values[candidates] = get_elevations(raster[y_indexes, x_indexes])
+        inside[candidates] = True
+
+    return values, inside
+
+
+def get_catalog_path(directory: str) -> str:
+    """ Location of persisted extent index of tile directory
+    """
+    key = hashlib.sha1(f"{cache_version}|{os.path.abspath(directory)}".encode()).hexdigest()
+    return os.path.join(cache_dir, f"catalog_{key}.json")
+
+
+class TileCatalog():
+    """
+    Extent index of a directory of ASCII grid tiles (e.g. national LIDAR), built from tile headers alone
+    The index is persisted in the cache directory, so only headers of new or modified tiles are read when
+    the directory is catalogued again. Tiles are only opened when sampled locations fall inside them
+    """
+    def __init__(self, directory: str, progress: Callable[[float], None] = None) -> None:
+        """
+        Args:
+            directory (str): Directory searched (including subdirectories) for .asc, .asc.gz and .asc.bz2 tiles
+            progress (Callable[[float], None], optional): Called with fraction of tiles indexed. Defaults to None
+        """
+        self.directory = directory
+
+        previous = {}
+        try:
+            if cache_enabled:
+                with open(get_catalog_path(directory)) as f:
+                    previous = {entry["fname"]: entry for entry in json.load(f)}
+        except (OSError, ValueError):
+            pass
+
+        fnames = sorted(os.path.relpath(os.path.join(root, fname), directory)
+                        for root, _, files in os.walk(directory)
+                        for fname in files if fname.lower().endswith(grid_extensions))
+
+        # Files that aren't valid grids are skipped rather than failing the whole directory
+        entries = []
+        self.skipped = []
+        for i, fname in enumerate(fnames):
+            path = os.path.join(directory, fname)
+            try:
+                stat = os.stat(path)
+                entry = previous.get(fname)
+                if entry is None or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+                    with open_grid(path) as f:
+                        entry = {"fname": fname, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                                 **read_header(f)}
+                entries.append(entry)
+            except (OSError, EOFError, ValueError):
+                self.skipped.append(path)
+
+            if progress is not None:
+                progress(i/len(fnames))
+
+        try:
+            write_sidecar(get_catalog_path(directory), lambda f: f.write(json.dumps(entries).encode()))
+        except OSError:
+            pass
+        prune_cache()
+
+        self.fnames = [os.path.join(directory, entry["fname"]) for entry in entries]
+        self.x_corners, self.y_corners, self.cellsizes, self.n_cols, self.n_rows = (
+            np.array([entry[field] for entry in entries], dtype=float)
+            for field in ["x_corner", "y_corner", "cellsize", "n_cols", "n_rows"])
+
+    def __len__(self) -> int:
+        return len(self.fnames)
+
+    def get_tiles(self, eastings: np.ndarray, northings: np.ndarray) -> np.ndarray:
+        """ Find tiles containing at least one location
+
+        Args:
+            eastings (np.ndarray): Eastings of locations
+            northings (np.ndarray): Northings of locations
+
+        Returns:
+            np.ndarray: Indexes of tiles, in catalog order
+        """
+        eastings = np.asarray(eastings, dtype=float)
+        northings = np.asarray(northings, dtype=float)
+
+        # Candidates of every tile by binary search on sorted eastings, as in sample_rasters
+        order = np.argsort(eastings, kind="stable")
+        sorted_eastings = eastings[order]
+        starts = np.searchsorted(sorted_eastings, self.x_corners, side="right")
+        stops = np.searchsorted(sorted_eastings, self.x_corners + self.n_cols * self.cellsizes, side="left")
+        y_stops = self.y_corners + self.n_rows * self.cellsizes
+
+        contains = np.zeros(len(self), dtype=bool)
+        for tile in np.flatnonzero(stops > starts):
+            candidates = northings[order[starts[tile]:stops[tile]]]
+            contains[tile] = np.any((candidates > self.y_corners[tile]) & (candidates < y_stops[tile]))
+
+        return np.flatnonzero(contains)
+
+    def sample(self, eastings: np.ndarray, northings: np.ndarray, lazy: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """ Sample tiles at the nearest measured point to each location, opening only tiles containing locations
+        Tiles are opened one at a time (through the raster cache) and released once sampled
+
+        Args:
+            eastings (np.ndarray): Eastings of locations
+            northings (np.ndarray): Northings of locations
+            lazy (bool, optional): Read only sampled rows of tiles. Defaults to False
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Sampled value at each location, and mask of locations inside a tile
+        """
+        tiles = self.get_tiles(eastings, northings)
+        return sample_rasters(eastings, northings, self.x_corners[tiles], self.y_corners[tiles],
+                              self.cellsizes[tiles], self.n_cols[tiles].astype(int), self.n_rows[tiles].astype(int),
+                              (AsciiGrid(self.fnames[tile], lazy=lazy).body for tile in tiles))
+
+
+def get_tile_catalog(directory: str) -> TileCatalog:
+    """ Catalog of tile directory, built once per session
+    """
+    key = os.path.abspath(directory)
+    if key not in tile_catalogs:
+        tile_catalogs[key] = TileCatalog(directory)
+    return tile_catalogs[key]
+
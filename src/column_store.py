@@ -0,0 +1,359 @@
+"""
+Columnar storage for uploaded properties and nodes
+Each field is held in its own typed array (or packed text buffer) rather than a Python list,
+so that bulk appends, masked deletes and edits are vectorised and memory is a few bytes per value
+"""
+
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+
+# Row selection accepted by ColumnStore.delete / ColumnStore.edit
+# A single index, a sequence of indexes or a boolean mask over all rows
+Rows = Union[int, Sequence[int], np.ndarray]
+
+
+class ArrayColumn():
+    """
+    Typed numeric column backed by a numpy array with spare capacity
+    Rows may be scalars or fixed width vectors (e.g. node depths at each return period)
+    """
+    def __init__(self, dtype: str) -> None:
+        self.dtype = np.dtype(dtype)
+        self.data = np.empty(0, dtype=self.dtype)
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def values(self) -> np.ndarray:
+        """ View of the occupied rows, writes to the view update the column
+        """
+        return self.data[:self.count]
+
+    def reserve(self, count: int) -> None:
+        """ Grow capacity (by half again) so that at least count rows fit
+        """
+        if count <= len(self.data):
+            return
+
+        capacity = max(count, 3 * len(self.data) // 2, 16)
+        data = np.empty((capacity,) + self.data.shape[1:], dtype=self.dtype)
+        data[:self.count] = self.values
+        self.data = data
+
+    def fit_width(self, width: int) -> None:
+        """ Reshape vector rows to hold width values, padding missing values with NaN
+        Widths set by earlier uploads are never reduced so no values are dropped
+        """
+        if self.count == 0:
+            if self.data.ndim != 2 or self.data.shape[1] != width:
+                self.data = np.empty((len(self.data), width), dtype=self.dtype)
+            return
+
+        if self.data.ndim == 2 and width <= self.data.shape[1]:
+            return
+
+        old = self.values.reshape(self.count, -1)
+        data = np.full((len(self.data), width), np.nan, dtype=self.dtype)
+        data[:self.count, :old.shape[1]] = old
+        self.data = data
+
+    def append(self, values: Sequence) -> None:
+        """ Add rows to the end of the column
+        """
+        # Empty rows have no width, so would not fit vector columns
+        if len(values) == 0:
+            return
+
+        if isinstance(values[0], (list, tuple)):
+            # Vector rows may be ragged, pad short rows with NaN
+            rows = np.full((len(values), max(len(row) for row in values)), np.nan, dtype=self.dtype)
+            for i, row in enumerate(values):
+                rows[i, :len(row)] = row
+        else:
+            rows = np.asarray(values, dtype=self.dtype)
+
+        if rows.ndim == 2:
+            self.fit_width(rows.shape[1])
+            if rows.shape[1] < self.data.shape[1]:
+                rows = np.pad(rows, ((0, 0), (0, self.data.shape[1] - rows.shape[1])),
+                              constant_values=np.nan)
+
+        self.reserve(self.count + len(rows))
+        self.data[self.count:self.count + len(rows)] = rows
+        self.count += len(rows)
+
+    def keep(self, indexes: np.ndarray) -> None:
+        """ Keep only the rows at indexes (in order), discarding the rest
+        """
+        kept = self.values[indexes]
+        self.count = len(kept)
+        self.data[:self.count] = kept
+
+    def set(self, indexes: np.ndarray, values: Any) -> None:
+        """ Overwrite the rows at indexes
+        """
+        self.values[indexes] = values
+
+    def __getitem__(self, index: int) -> Any:
+        return self.values[index]
+
+    def tolist(self) -> List:
+        return self.values.tolist()
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes
+
+
+class TextColumn():
+    """
+    String column packed into a single UTF-8 byte buffer
+    Each row stores the start and length of its bytes; edited rows are written to the end of the
+    buffer and the buffer is compacted once more than half of it is unreferenced
+    """
+    def __init__(self) -> None:
+        self.buffer = np.empty(0, dtype=np.uint8)
+        self.size = 0
+        self.starts = ArrayColumn("i8")
+        self.lengths = ArrayColumn("i4")
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, index: int) -> str:
+        start = self.starts[index]
+        return self.buffer[start:start + self.lengths[index]].tobytes().decode()
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def write(self, values: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """ Write encoded values to the end of the buffer
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Start and length of each value in the buffer
+        """
+        encoded = [str(value).encode() for value in values]
+        lengths = np.fromiter((len(e) for e in encoded), dtype=np.int64, count=len(encoded))
+        starts = self.size + np.cumsum(lengths) - lengths
+        total = int(lengths.sum())
+
+        if self.size + total > len(self.buffer):
+            buffer = np.empty(max(self.size + total, 3 * len(self.buffer) // 2, 256), dtype=np.uint8)
+            buffer[:self.size] = self.buffer[:self.size]
+            self.buffer = buffer
+
+        self.buffer[self.size:self.size + total] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        self.size += total
+        return starts, lengths
+
+    def append(self, values: Sequence[str]) -> None:
+        starts, lengths = self.write(values)
+        self.starts.append(starts)
+        self.lengths.append(lengths)
+
+    def keep(self, indexes: np.ndarray) -> None:
+        self.starts.keep(indexes)
+        self.lengths.keep(indexes)
+        self.compact()
+
+    def set(self, indexes: np.ndarray, values: Union[str, Sequence[str]]) -> None:
+        if isinstance(values, str):
+            values = [values] * len(indexes)
+        starts, lengths = self.write(values)
+        self.starts.set(indexes, starts)
+        self.lengths.set(indexes, lengths)
+        self.compact()
+
+    def compact(self) -> None:
+        """ Rewrite the buffer without unreferenced bytes if they make up most of it
+        """
+        used = int(self.lengths.values.sum())
+        if self.size <= 2 * used + 256:
+            return
+
+        values = self.tolist()
+        self.size = 0
+        self.starts.set(slice(None), self.write(values)[0])
+
+    def tolist(self) -> List[str]:
+        return list(self)
+
+    @property
+    def nbytes(self) -> int:
+        return self.buffer.nbytes + self.starts.nbytes + self.lengths.nbytes
+
+
+class CategoryColumn():
+    """
+    String column for values repeated across many rows (e.g. towns and postcodes)
+    Rows store an integer code into a list of distinct values
+    """
+    def __init__(self) -> None:
+        self.codes = ArrayColumn("i4")
+        self.categories = []
+        self.lookup = {}
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index: int) -> str:
+        return self.categories[self.codes[index]]
+
+    def __iter__(self):
+        return (self.categories[code] for code in self.codes.values)
+
+    def encode(self, values: Sequence[str]) -> List[int]:
+        """ Get code of each value, adding new categories where required
+        """
+        codes = []
+        for value in values:
+            value = str(value)
+            if value not in self.lookup:
+                self.lookup[value] = len(self.categories)
+                self.categories.append(value)
+            codes.append(self.lookup[value])
+        return codes
+
+    def append(self, values: Sequence[str]) -> None:
+        self.codes.append(self.encode(values))
+
+    def keep(self, indexes: np.ndarray) -> None:
+        self.codes.keep(indexes)
+
+    def set(self, indexes: np.ndarray, values: Union[str, Sequence[str]]) -> None:
+        if isinstance(values, str):
+            values = [values] * len(indexes)
+        self.codes.set(indexes, self.encode(values))
+
+    def tolist(self) -> List[str]:
+        return list(self)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + sum(len(c) + 49 for c in self.categories)
+
+
+def make_column(kind: str) -> Union[ArrayColumn, TextColumn, CategoryColumn]:
+    """ Create an empty column of the given kind
+    Kinds are "text", "category" or a numpy dtype string
+    """
+    if kind == "text":
+        return TextColumn()
+    if kind == "category":
+        return CategoryColumn()
+    return ArrayColumn(kind)
+
+
+class ColumnStore():
+    """
+    Table of rows held as one column per field, with a stable ID for every row
+    IDs are assigned in increasing order and never reused, so they stay sorted after deletions
+    """
+    def __init__(self, kinds: Dict[str, str]) -> None:
+        """
+        Args:
+            kinds (Dict[str, str]): Kind of each column, "text", "category" or a numpy dtype string
+        """
+        self.kinds = dict(kinds)
+        self.columns = {name: make_column(kind) for name, kind in self.kinds.items()}
+        self.row_ids = ArrayColumn("i8")
+        self.next_id = 0
+
+    def __len__(self) -> int:
+        return len(self.row_ids)
+
+    def column(self, name: str) -> Union[np.ndarray, TextColumn, CategoryColumn]:
+        """ Get column by name, numeric columns are returned as writable array views
+        """
+        column = self.columns[name]
+        return column.values if isinstance(column, ArrayColumn) else column
+
+    def get_rows(self, rows: Rows) -> np.ndarray:
+        """ Convert an index, sequence of indexes or boolean mask into an array of indexes
+        """
+        return np.arange(len(self))[rows].reshape(-1)
+
+    def get_indexes(self, row_ids: Sequence[int]) -> np.ndarray:
+        """ Get current index of each row ID
+
+        Raises:
+            KeyError: If any row ID is not in the store
+        """
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        ids = self.row_ids.values
+        if len(row_ids) == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        indexes = np.minimum(np.searchsorted(ids, row_ids), max(len(ids) - 1, 0))
+        if len(ids) == 0 or np.any(ids[indexes] != row_ids):
+            raise KeyError("Row ID not found in store")
+        return indexes
+
+    def append(self, **values: Sequence) -> np.ndarray:
+        """ Add rows to the end of the store, every column must be given the same number of values
+
+        Returns:
+            np.ndarray: IDs of the new rows
+        """
+        if set(values) != set(self.columns):
+            raise ValueError(f"Values must be given for columns {sorted(self.columns)}")
+
+        count = len(next(iter(values.values())))
+        if any(len(v) != count for v in values.values()):
+            raise ValueError("All columns must be given the same number of values")
+
+        for name, column in self.columns.items():
+            column.append(values[name])
+
+        row_ids = np.arange(self.next_id, self.next_id + count, dtype=np.int64)
+        self.row_ids.append(row_ids)
+        self.next_id += count
+        return row_ids
+
+    def delete(self, rows: Rows) -> None:
+        """ Remove rows from the store, remaining rows keep their order and IDs
+        """
+        keep = np.ones(len(self), dtype=bool)
+        keep[self.get_rows(rows)] = False
+        indexes = np.flatnonzero(keep)
+
+        for column in self.columns.values():
+            column.keep(indexes)
+        self.row_ids.keep(indexes)
+
+    def edit(self, rows: Rows, **values: Any) -> None:
+        """ Overwrite values of the given columns in the selected rows
+        A single value is applied to every selected row
+        """
+        indexes = self.get_rows(rows)
+        for name, value in values.items():
+            self.columns[name].set(indexes, value)
+
+    @property
+    def nbytes(self) -> int:
+        """ Memory used by the store in bytes
+        """
+        return self.row_ids.nbytes + sum(column.nbytes for column in self.columns.values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """ Convert store to JSON serialisable dict
+        """
+        return {
+            "row_ids": self.row_ids.tolist(),
+            "next_id": self.next_id,
+            "columns": {name: column.tolist() for name, column in self.columns.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, kinds: Dict[str, str], state: Dict[str, Any]) -> "ColumnStore":
+        """ Rebuild store saved with to_dict
+        """
+        store = cls(kinds)
+        store.append(**{name: state["columns"][name] for name in kinds})
+        store.row_ids.set(slice(None), state["row_ids"])
+        store.next_id = state["next_id"]
+        return store
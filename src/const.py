@@ -152,7 +152,7 @@ damage_per_res_prop = csv_to_list(
 
 # Table D - Average Annual Damage per non-res property
 damage_per_non_res_prop = csv_to_list(
-    get_resource_path("tables/Non_Res_damage_Per_Property.csv"))
+    get_resource_path("tables/Non_Res_Damage_Per_Property.csv"))
 
 # Table F1 - AEPS before
 intangible_aeps_before = [0, 0.8, 1, 4/3, 2, 10/3, 5, 10, 100, 10**10]
@@ -1,10 +1,18 @@
-from typing import List
+from typing import Any, Dict, List
 import csv
 import xlsxwriter
 
 class DataHandler():
     def __init__(self):
         return
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        """ Restore appraisal from the contents of a saved file
+
+        Args:
+            state (Dict[str, Any]): Handler attributes loaded from file
+        """
+        self.__dict__ = state
         
     """
     FILE WRITING AND READING        
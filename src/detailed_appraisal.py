@@ -3,6 +3,7 @@ import os
 from functools import partial
 from typing import List, Tuple
 
+import numpy as np
 from PyQt5.QtCore import QObject, Qt, QThread, pyqtSignal
 from PyQt5.QtGui import QDoubleValidator, QIntValidator
 from PyQt5.QtWidgets import (QAbstractItemView, QCheckBox, QComboBox, QDialog,
@@ -192,10 +193,12 @@ class UploadTab(QWidget):
 
         # Multithreading fields
         self.ascii_upload_btn = QPushButton("Upload Dataset")
+        self.ascii_catalog_btn = QPushButton("Upload Tile Directory")
         self.ascii_progress_label = QLabel()
         self.upload_prop_dataset_btn = QPushButton("Upload Dataset")
         self.prop_progress_label = QLabel()
         self.node_upload_btn = QPushButton("Upload Flood Event Shapefiles")
+        self.flood_grid_btn = QPushButton("Upload Flood Depth Grids")
         self.node_progress_label = QLabel()
 
         # Update labels
@@ -230,6 +233,7 @@ class UploadTab(QWidget):
         # ASCII Grid Upload Groupbox
         ascii_upload_group = QGroupBox("Upload ASCII Grids")
         self.ascii_upload_btn.clicked.connect(self.upload_ascii)
+        self.ascii_catalog_btn.clicked.connect(self.upload_ascii_catalog)
         self.ascii_count_label.setAlignment(Qt.AlignCenter)
         self.ascii_progress_label.setAlignment(Qt.AlignCenter)
         self.ascii_progress_label.hide()
@@ -237,6 +241,7 @@ class UploadTab(QWidget):
         ascii_upload_lyt.addStretch()
         ascii_upload_lyt.addWidget(self.ascii_count_label)
         ascii_upload_lyt.addLayout(utils.centered_hbox(self.ascii_upload_btn))
+        ascii_upload_lyt.addLayout(utils.centered_hbox(self.ascii_catalog_btn))
         ascii_upload_lyt.addWidget(self.ascii_progress_label)
         ascii_upload_lyt.addStretch()
         ascii_upload_group.setLayout(ascii_upload_lyt)
@@ -244,6 +249,7 @@ class UploadTab(QWidget):
         # Flood shapefile Upload Groupbox
         node_upload_group = QGroupBox("Upload Flood Event Shapefiles")
         self.node_upload_btn.clicked.connect(self.upload_node_dataset)
+        self.flood_grid_btn.clicked.connect(self.upload_flood_grids)
         self.node_count_label.setAlignment(Qt.AlignCenter)
         self.node_progress_label.setAlignment(Qt.AlignCenter)
         self.node_progress_label.hide()
@@ -251,6 +257,7 @@ class UploadTab(QWidget):
         node_upload_lyt.addStretch()
         node_upload_lyt.addWidget(self.node_count_label)
         node_upload_lyt.addLayout(utils.centered_hbox(self.node_upload_btn))
+        node_upload_lyt.addLayout(utils.centered_hbox(self.flood_grid_btn))
         node_upload_lyt.addWidget(self.node_progress_label)
         node_upload_group.setLayout(node_upload_lyt)
         node_upload_lyt.addStretch()
@@ -309,8 +316,14 @@ class UploadTab(QWidget):
             f"Non-Residential Properties Uploaded: {self.db.non_res_count}")
         self.ascii_count_label.setText(
             f"ASCII Grids Uploaded: {self.db.ascii_count}")
+        if self.db.ascii_catalogs:
+            self.ascii_count_label.setText(
+                f"ASCII Grids Uploaded: {self.db.ascii_count} (+{len(self.db.ascii_catalogs)} tile directories)")
         self.node_count_label.setText(
             f"Flood Shapefile Datapoints Uploaded: {self.db.node_count}")
+        if self.db.use_flood_grids():
+            self.node_count_label.setText(
+                f"Flood Depth Grids Uploaded: {len(self.db.flood_grids)} of {len(self.db.return_periods)} events")
 
     def upload_prop_manual(self) -> None:
         """ Instantiate manual upload widget and add entries to data handler
@@ -410,7 +423,7 @@ class UploadTab(QWidget):
         Returns:
             List[str]: Selected filenames
         """
-        file_types = "ASCII Grids (*.asc)"
+        file_types = "ASCII Grids (*.asc *.asc.gz *.asc.bz2)"
 
         # Discard file type
         return QFileDialog.getOpenFileNames(self, "Select ASCII Grids", "", file_types)[0]
@@ -447,6 +460,42 @@ class UploadTab(QWidget):
         self.thread.finished.connect(self.update_upload_counts)
         self.thread.finished.connect(self.parent.ascii_tab.display_asciis)
 
+    def upload_ascii_catalog(self) -> None:
+        """ Get directory of ASCII grid tiles and catalog it in database
+        """
+        directory = QFileDialog.getExistingDirectory(self, "Select Directory of ASCII Grid Tiles")
+        if not directory:
+            return
+
+        # Instantiate thread and worker
+        self.thread = QThread()
+        worker = AsciiCatalogWorker(self, directory)
+        worker.moveToThread(self.thread)
+
+        # Connect signals
+        self.thread.started.connect(worker.run)
+        worker.finished.connect(self.thread.quit)
+        worker.finished.connect(worker.deleteLater)
+        self.thread.finished.connect(self.thread.deleteLater)
+        worker.progress.connect(self.ascii_catalog_progress_update)
+        worker.error.connect(self.ascii_upload_error)
+
+        # Start self.thread
+        self.thread.start()
+
+        # Resets
+        self.ascii_upload_btn.setDisabled(True)
+        self.ascii_catalog_btn.setDisabled(True)
+        self.ascii_progress_label.show()
+        self.thread.finished.connect(
+            lambda: self.ascii_upload_btn.setEnabled(True))
+        self.thread.finished.connect(
+            lambda: self.ascii_catalog_btn.setEnabled(True))
+        self.thread.finished.connect(self.ascii_progress_label.hide)
+
+        # Reload displays
+        self.thread.finished.connect(self.update_upload_counts)
+
     def ascii_upload_error(self, e: Exception, fname: str) -> None:
         """ Display traceback of error incurred during uplaod of ASCII grid
 
@@ -465,14 +514,52 @@ class UploadTab(QWidget):
         msgbox.setDefaultButton(QMessageBox.Ok)
         msgbox.exec_()
 
-    def ascii_progress_update(self, progress_pct: float) -> None:
+    def ascii_progress_update(self, progress_pct: float, throughput: float) -> None:
         """ Update user on progress of long-running ASCII-upload task
 
         Args:
             progress_pct (float): Percentage of task completed
+            throughput (float): Speed last ASCII grid was read at (MB/s)
         """
         self.ascii_progress_label.setText(
-            f"Upload progress: {round(progress_pct*100)}%")
+            f"Upload progress: {round(progress_pct*100)}% ({round(throughput)} MB/s)")
+
+    def ascii_catalog_progress_update(self, progress_pct: float) -> None:
+        """ Update user on progress of cataloguing ASCII grid tiles
+
+        Args:
+            progress_pct (float): Percentage of tiles indexed
+        """
+        self.ascii_progress_label.setText(
+            f"Indexing tiles: {round(progress_pct*100)}%")
+
+    def upload_flood_grids(self) -> None:
+        """ Get ASCII grids of flood depths for each return period, used instead of flood shapefiles
+        """
+        file_types = "ASCII Grids (*.asc *.asc.gz *.asc.bz2)"
+
+        flood_grids = {}
+        for rp in self.db.return_periods:
+            fnames = QFileDialog.getOpenFileNames(
+                self, f"Select Flood Grids of 1 in {rp} Year Event", "", file_types)[0]
+            if not fnames:
+                return
+            flood_grids[rp] = fnames
+
+        # Grids may hold water levels, which are converted to depths using ground levels
+        msgbox = QMessageBox(self)
+        msgbox.setWindowModality(Qt.WindowModal)
+        msgbox.setIcon(QMessageBox.Question)
+        msgbox.setText("Do the grids hold depths above ground level?")
+        msgbox.setInformativeText("Select No if they hold water levels")
+        msgbox.setStandardButtons(QMessageBox.No | QMessageBox.Yes)
+        msgbox.setEscapeButton(QMessageBox.No)
+        msgbox.setDefaultButton(QMessageBox.Yes)
+        self.db.flood_grid_depths = msgbox.exec_() == QMessageBox.Yes
+
+        for rp, fnames in flood_grids.items():
+            self.db.set_flood_grids(rp, fnames)
+        self.update_upload_counts()
 
     def upload_node_dataset(self) -> None:
         """ Get property dataset file from user and run node upload widget 
@@ -680,7 +767,7 @@ class ResidentialTab(QWidget):
         town = self.db.res_towns[index]
         postcode = self.db.res_postcodes[index]
         mcm = self.db.res_mcms[index]
-        ground_level = self.db.res_ground_levels[index]
+        ground_level = utils.nan_to_none(self.db.res_ground_levels[index])
 
         # Update labels
         self.easting_labels[index].setText(f"Easting: {easting}")
@@ -720,7 +807,7 @@ class ResidentialTab(QWidget):
         self.address_labels = [QLabel(f"Address: {i}") for i in addresses]
         self.town_labels = [QLabel(f"Town: {towns[i]} - {postcodes[i]}") for i in range(prop_count)]
         self.mcm_labels = [QLabel(f"MCM Code: {mcm} - {const.res_mcm[mcm]}") for mcm in mcms]
-        self.ground_level_labels = [QLabel(f"Ground Level: {i}") for i in ground_levels]
+        self.ground_level_labels = [QLabel(f"Ground Level: {utils.nan_to_none(i)}") for i in ground_levels]
 
         # Write over other widgets
         self.edit_btns = [QPushButton("Edit") for _ in range(prop_count)]
@@ -766,7 +853,7 @@ class ResidentialTab(QWidget):
         """
         for i in range(self.db.res_count):
             self.ground_level_labels[i].setText(
-                "Ground Level: {}".format(self.db.res_ground_levels[i]))
+                "Ground Level: {}".format(utils.nan_to_none(self.db.res_ground_levels[i])))
 
     def build_temp(self) -> None:
         """ Add label if no properties are uploaded 
@@ -851,7 +938,7 @@ class ResidentialTab(QWidget):
             self.db.get_res_elevations()
 
             # Display warning of properties not covered by ASCIIs
-            none_count = sum([x is None for x in self.db.res_ground_levels])
+            none_count = int(np.isnan(self.db.res_ground_levels).sum())
             if none_count != 0:
                 msgbox_2 = QMessageBox(self)
                 msgbox_2.setWindowModality(Qt.WindowModal)
@@ -876,9 +963,10 @@ class ResidentialTab(QWidget):
 
     def get_checks(self) -> None:
         """ Find checked residential properties with valid ground levels
+        Ground levels aren't needed when properties are flooded from depth grids
         """
         checked_props = [group.isChecked() for group in self.groups]
-        valid_gls = [gl is not None for gl in self.db.res_ground_levels]
+        valid_gls = (~np.isnan(self.db.res_ground_levels) | (not self.db.uses_ground_levels())).tolist()
 
         self.db.res_checks = [checked_props[i] and valid_gls[i]
                               for i in range(len(checked_props))]
@@ -980,7 +1068,7 @@ class NonResidentialTab(QWidget):
         postcode = self.db.non_res_postcodes[index]
         mcm = self.db.non_res_mcms[index]
         floor_area = self.db.non_res_floor_areas[index]
-        ground_level = self.db.non_res_ground_levels[index]
+        ground_level = utils.nan_to_none(self.db.non_res_ground_levels[index])
 
         # Update labels
         self.easting_labels[index].setText(f"Easting: {easting}")
@@ -1023,7 +1111,7 @@ class NonResidentialTab(QWidget):
         self.town_labels = [QLabel(f"Town: {towns[i]} - {postcodes[i]}") for i in range(prop_count)]
         self.mcm_labels = [QLabel(f"MCM Code: {i} - {const.non_res_mcm[i]}") for i in mcms]
         self.floor_area_labels = [QLabel(f"Floor Area: {i}") for i in floor_areas]
-        self.ground_level_labels = [QLabel(f"Ground Level: {i}") for i in ground_levels]
+        self.ground_level_labels = [QLabel(f"Ground Level: {utils.nan_to_none(i)}") for i in ground_levels]
 
         # Write over other widgets
         self.edit_btns = [QPushButton("Edit") for _ in range(prop_count)]
@@ -1073,7 +1161,7 @@ class NonResidentialTab(QWidget):
         """
         for i in range(self.db.non_res_count):
             self.ground_level_labels[i].setText(
-                "Ground Level: {}".format(self.db.non_res_ground_levels[i]))
+                "Ground Level: {}".format(utils.nan_to_none(self.db.non_res_ground_levels[i])))
 
     def build_temp(self) -> None:
         """ Add label if no properties are uploaded
@@ -1158,8 +1246,7 @@ class NonResidentialTab(QWidget):
             self.db.get_non_res_elevations()
 
             # DIsplay warning of properties not covered by ASCIIs
-            none_count = sum(
-                [x is None for x in self.db.non_res_ground_levels])
+            none_count = int(np.isnan(self.db.non_res_ground_levels).sum())
             if none_count != 0:
                 msgbox_2 = QMessageBox(self)
                 msgbox_2.setWindowModality(Qt.WindowModal)
@@ -1186,9 +1273,10 @@ class NonResidentialTab(QWidget):
 
     def get_checks(self) -> None:
         """ Find checked non-residential properties with valid ground level entries
+        Ground levels aren't needed when properties are flooded from depth grids
         """
         checked_props = [group.isChecked() for group in self.groups]
-        valid_gls = [gl is not None for gl in self.db.non_res_ground_levels]
+        valid_gls = (~np.isnan(self.db.non_res_ground_levels) | (not self.db.uses_ground_levels())).tolist()
 
         self.db.non_res_checks = [checked_props[i] and valid_gls[i]
                                   for i in range(len(checked_props))]
@@ -1449,10 +1537,10 @@ class NodeTab(QWidget):
         depths = self.db.node_depths[index]
 
         # Update labels
-        self.eastings_labels[index].setText("Easting: {}".format(easting))
-        self.northing_labels[index].setText("Northing: {}".format(northing))
+        self.eastings_labels[index].setText("Easting: {}".format(utils.nan_to_none(easting)))
+        self.northing_labels[index].setText("Northing: {}".format(utils.nan_to_none(northing)))
         for i in range(len(rps)):
-            self.depth_labels[index][i].setText(str(depths[i]))
+            self.depth_labels[index][i].setText(str(utils.nan_to_none(depths[i])))
 
     def display_nodes(self) -> None:
         """ Reload displays of all uploaded nodes in scroll ares
@@ -1478,13 +1566,13 @@ class NodeTab(QWidget):
 
         # Write over old labels
         self.eastings_labels = [
-            QLabel("Easting: {}".format(i)) for i in eastings]
+            QLabel("Easting: {}".format(utils.nan_to_none(i))) for i in eastings]
         self.northing_labels = [
-            QLabel("Norting: {}".format(i)) for i in northings]
+            QLabel("Norting: {}".format(utils.nan_to_none(i))) for i in northings]
         self.rp_labels = [[QLabel("{} year FE depth:".format(rp))
                            for rp in rps] for _ in range(node_count)]
         self.depth_labels = [
-            [QLabel(str(depth)) for depth in sub_depth] for sub_depth in depths]
+            [QLabel(str(utils.nan_to_none(depth))) for depth in sub_depth] for sub_depth in depths]
 
         # Write over other widgets
         self.edit_btns = [QPushButton("Edit") for _ in range(node_count)]
@@ -1751,13 +1839,13 @@ class ResultsTab(QWidget):
             if retval == QMessageBox.No:
                 return
 
-        if self.db.node_count == 0:
-            # No nodes uploaded
+        if self.db.node_count == 0 and not self.db.use_flood_grids():
+            # No nodes or flood depth grids uploaded
             msgbox = QMessageBox(self)
             msgbox.setWindowModality(Qt.WindowModal)
             msgbox.setIcon(QMessageBox.Warning)
             msgbox.setText("Results could not be calculated")
-            msgbox.setInformativeText("No flood nodes have been uploaded")
+            msgbox.setInformativeText("No flood nodes or flood depth grids have been uploaded")
             msgbox.setStandardButtons(QMessageBox.Ok)
             msgbox.setDefaultButton(QMessageBox.Ok)
             msgbox.setEscapeButton(QMessageBox.Ok)
@@ -1765,8 +1853,8 @@ class ResultsTab(QWidget):
             return
 
         # Update results fields
-        self.db.get_damages()
-        self.db.get_benefits()
+        # Only properties edited since the last calculation are recalculated where possible
+        self.db.update_results()
 
         # Update displays
         self.update_table()
@@ -2482,7 +2570,7 @@ class EditResPropDetails(QDialog):
         self.entries[3].setText(self.db.res_towns[self.index])
         self.entries[4].setText(self.db.res_postcodes[self.index])
         self.entries[5].setText(str(self.db.res_ground_levels[self.index])
-                                if self.db.res_ground_levels[self.index] else None)
+                                if not np.isnan(self.db.res_ground_levels[self.index]) else None)
         self.mcm_entry.setCurrentIndex(
             list(const.res_mcm.keys()).index(self.db.res_mcms[self.index]))
 
@@ -2628,7 +2716,7 @@ class EditNonResPropDetails(QDialog):
         self.entries[4].setText(self.db.non_res_postcodes[self.index])
         self.entries[5].setText(str(self.db.non_res_floor_areas[self.index]))
         self.entries[6].setText(str(self.db.non_res_ground_levels[self.index])
-                                if self.db.non_res_ground_levels[self.index] else None)
+                                if not np.isnan(self.db.non_res_ground_levels[self.index]) else None)
         self.mcm_entry.setCurrentIndex(
             list(const.non_res_mcm.keys()).index(self.db.non_res_mcms[self.index]))
 
@@ -2876,13 +2964,14 @@ class EditNodeDetails(QDialog):
         # Set entries to current data values
         # All datapoints cast to str for testing as bool(0) == False
         # bool('0') == True however
-        self.entries[0].setText(str(self.db.node_eastings[self.index]) if str(
+        # Missing values are stored as NaN
+        self.entries[0].setText(str(self.db.node_eastings[self.index]) if not np.isnan(
             self.db.node_eastings[self.index]) else None)
-        self.entries[1].setText(str(self.db.node_northings[self.index]) if str(
+        self.entries[1].setText(str(self.db.node_northings[self.index]) if not np.isnan(
             self.db.node_northings[self.index]) else None)
         for i in range(len(self.db.return_periods)):
             self.entries[i+2].setText(str(self.db.node_depths[self.index][i])
-                                      if str(self.db.node_depths[self.index][i]) else None)
+                                      if not np.isnan(self.db.node_depths[self.index][i]) else None)
 
         # Validators
         float_validator = QDoubleValidator(-10000000.0, 10000000.0, 5)
@@ -1,45 +1,111 @@
+import copy
 import json
 import os
-import re
-from linecache import getline
-from typing import List
+from typing import Any, Callable, Dict, List, Tuple, Union
 
 import numpy as np
 from PyQt5.QtWidgets import QTableWidget
 from datahandler import DataHandler
 
+import ascii_grid
+import monte_carlo
 import utils 
+from ascii_grid import (AsciiGrid, CachedRaster, LazyRaster, TileCatalog, get_tile_catalog, load_raster, raster_cache,
+                        sample_rasters, tile_catalogs)
+from column_store import ColumnStore
+
+# Column kinds of each uploaded dataset
+# Missing ground levels, coordinates and depths are stored as NaN
+res_columns = {
+    "eastings": "f8",
+    "northings": "f8",
+    "addresses": "text",
+    "towns": "category",
+    "postcodes": "category",
+    "mcms": "i2",
+    "ground_levels": "f8"
+}
+
+non_res_columns = {
+    "eastings": "f8",
+    "northings": "f8",
+    "addresses": "text",
+    "towns": "category",
+    "postcodes": "category",
+    "mcms": "i2",
+    "floor_areas": "f8",
+    "ground_levels": "f8"
+}
+
+node_columns = {
+    "eastings": "f8",
+    "northings": "f8",
+    "depths": "f8"
+}
+
+# Depth of properties outside every flood grid, below the lowest depth of any damage curve
+dry_depth = -10.0
+
+# Attribute prefix and column kinds of each store
+stores = {
+    "res_store": ("res_", res_columns),
+    "non_res_store": ("non_res_", non_res_columns),
+    "node_store": ("node_", node_columns)
+}
+
+
+def store_column(store: str, column: str) -> property:
+    """ Read-only attribute giving a column of one of the handler's stores
+    """
+    return property(lambda self: getattr(self, store).column(column))
+
+
+def store_count(store: str) -> property:
+    """ Read-only attribute giving the row count of one of the handler's stores
+    """
+    return property(lambda self: len(getattr(self, store)))
+
 
 class DetailedDataHandler(DataHandler):
     """
     Methods for the upload / storage / deletion / editing / processing and saving of
     data used in Detailed Appraisals
     """
+    # Residential information
+    res_eastings = store_column("res_store", "eastings")
+    res_northings = store_column("res_store", "northings")
+    res_addresses = store_column("res_store", "addresses")
+    res_postcodes = store_column("res_store", "postcodes")
+    res_towns = store_column("res_store", "towns")
+    res_mcms = store_column("res_store", "mcms")
+    res_ground_levels = store_column("res_store", "ground_levels")
+
+    # Non-Residential information
+    non_res_eastings = store_column("non_res_store", "eastings")
+    non_res_northings = store_column("non_res_store", "northings")
+    non_res_addresses = store_column("non_res_store", "addresses")
+    non_res_postcodes = store_column("non_res_store", "postcodes")
+    non_res_towns = store_column("non_res_store", "towns")
+    non_res_mcms = store_column("non_res_store", "mcms")
+    non_res_floor_areas = store_column("non_res_store", "floor_areas")
+    non_res_ground_levels = store_column("non_res_store", "ground_levels")
+
+    # Node information
+    node_eastings = store_column("node_store", "eastings")
+    node_northings = store_column("node_store", "northings")
+    node_depths = store_column("node_store", "depths")
+
+    # Upload counts
+    res_count = store_count("res_store")
+    non_res_count = store_count("non_res_store")
+    node_count = store_count("node_store")
+
     def __init__(self) -> None:
         super().__init__()
-        # Residential information
-        self.res_eastings = []
-        self.res_northings = []
-        self.res_addresses = []
-        self.res_postcodes = []
-        self.res_towns = []
-        self.res_mcms = []
-        self.res_ground_levels = []
-
-        # Non-Residential information
-        self.non_res_eastings = []
-        self.non_res_northings = []
-        self.non_res_addresses = []
-        self.non_res_postcodes = []
-        self.non_res_towns = []
-        self.non_res_mcms = []
-        self.non_res_floor_areas = []
-        self.non_res_ground_levels = []
-
-        # Node information
-        self.node_eastings = []
-        self.node_northings = []
-        self.node_depths = []
+        # Uploaded properties and nodes, one typed column per field
+        self.res_store = ColumnStore(res_columns)
+        self.non_res_store = ColumnStore(non_res_columns)
+        self.node_store = ColumnStore(node_columns)
 
         # ASCII information
         self.ascii_fnames = []
@@ -50,11 +116,33 @@ class DetailedDataHandler(DataHandler):
         self.cellsizes = []
         self.nodata_values = []
         self.raster_points = []
+        self.raster_keys = []
+
+        # Read ASCII grids on demand when sampling ground levels, rather than holding every raster in memory
+        self.lazy_rasters = False
+
+        # Memory (MB) rasters of uploaded grids may use, least recently used rasters are released and read again
+        # when needed. None keeps every raster in memory
+        self.raster_memory_budget = None
+
+        # Parsed grids are cached on disk so they're read quickly later, least recently used grids are removed once
+        # the cache uses more than raster_disk_cache_budget (MB, None for no limit)
+        self.raster_disk_cache = True
+        self.raster_disk_cache_budget = 2048
+
+        # Processes ASCII grids are parsed in during upload, None for one per CPU
+        # Several grids are parsed one per process, a single large grid is split into ranges of rows
+        self.ascii_upload_workers = None
+
+        # Directories of catalogued ASCII grid tiles, sampled before individually uploaded grids
+        self.ascii_catalogs = []
+
+        # ASCII grids and tile directories of flood depths at each return period, used instead of nodes when given
+        # Grids hold water levels rather than depths if flood_grid_depths is False
+        self.flood_grids = {}
+        self.flood_grid_depths = True
 
         # Upload counts
-        self.res_count = 0
-        self.non_res_count = 0
-        self.node_count = 0
         self.ascii_count = 0
 
         # General flood info
@@ -71,6 +159,16 @@ class DetailedDataHandler(DataHandler):
         self.non_res_cap = 260000
         self.return_periods = [5, 10, 25, 50, 100, 150, 1000]
 
+        # SOPs included in the benefits by SOP table as well as the return periods
+        self.extra_sops = []
+
+        # Store per-property results as float32 arrays rather than lists of floats, for very large appraisals
+        # Stored values differ from full precision results by at most 2^-24 (about 6e-8) relative. Totals are
+        # summed in float64 before values are stored. Benefits are found from stored values, so differ by at most
+        # 2^-24 of the benefit. Post-intervention damages (total less benefit) therefore differ by at most 2^-24 of
+        # the pre-intervention total, which can be far more than 2^-24 of the post-intervention damage itself
+        self.compact_results = False
+
         # Checks
         self.res_checks = []
         self.non_res_checks = []
@@ -99,6 +197,24 @@ class DetailedDataHandler(DataHandler):
         self.clean_node_d = []
         self.clean_node_count = 0
 
+        # Nearest node to each clean property
+        self.res_node_indexes = []
+        self.non_res_node_indexes = []
+
+        # Flood grid values at each clean property during each flood event, NaN outside the grids
+        self.res_flood_levels = []
+        self.non_res_flood_levels = []
+
+        # Row IDs and flood details used by the last full results calculation
+        self.clean_res_ids = []
+        self.clean_non_res_ids = []
+        self.clean_node_ids = []
+        self.results_state = None
+
+        # Row IDs of properties edited since results were last calculated
+        self.dirty_res_ids = []
+        self.dirty_non_res_ids = []
+
         # Residential results fields
         self.res_depths = []
         self.capped_res_depths = []
@@ -236,28 +352,39 @@ class DetailedDataHandler(DataHandler):
         
         Args: prop_details (List[str]): Easting, northing, primary address, secondary address, town, postcode, MCM code of property to be uploaded
         """
-        if utils.is_valid_res(prop_details):
-            self.res_eastings.append(float(prop_details[0]))
-            self.res_northings.append(float(prop_details[1]))
-            self.res_addresses.append(f"{prop_details[2]} {prop_details[3]}")
-            self.res_towns.append(prop_details[4])
-            self.res_postcodes.append(prop_details[5])
-            self.res_mcms.append(int(prop_details[7]))
-
-            self.res_count += 1
-            self.res_ground_levels.append(None)
-
-        elif utils.is_valid_non_res(prop_details):
-            self.non_res_eastings.append(float(prop_details[0]))
-            self.non_res_northings.append(float(prop_details[1]))
-            self.non_res_addresses.append(f"{prop_details[2]} {prop_details[3]}")
-            self.non_res_towns.append(prop_details[4])
-            self.non_res_postcodes.append(prop_details[5])
-            self.non_res_floor_areas.append(float(prop_details[6]))
-            self.non_res_mcms.append(int(prop_details[7]))
-
-            self.non_res_count += 1
-            self.non_res_ground_levels.append(None)
+        self.add_props([prop_details])
+
+    def add_props(self, props: List[List[str]]) -> None:
+        """ Add details of many properties (if valid) to data handler in one append per store
+
+        Args:
+            props (List[List[str]]): Easting, northing, primary address, secondary address, town, postcode, floor area, MCM code of each property
+        """
+        is_res = [utils.is_valid_res(prop) for prop in props]
+        res = [prop for prop, valid in zip(props, is_res) if valid]
+        non_res = [prop for prop, valid in zip(props, is_res)
+                   if not valid and utils.is_valid_non_res(prop)]
+
+        if res:
+            self.res_store.append(
+                eastings=[float(prop[0]) for prop in res],
+                northings=[float(prop[1]) for prop in res],
+                addresses=[f"{prop[2]} {prop[3]}" for prop in res],
+                towns=[prop[4] for prop in res],
+                postcodes=[prop[5] for prop in res],
+                mcms=[int(prop[7]) for prop in res],
+                ground_levels=np.full(len(res), np.nan))
+
+        if non_res:
+            self.non_res_store.append(
+                eastings=[float(prop[0]) for prop in non_res],
+                northings=[float(prop[1]) for prop in non_res],
+                addresses=[f"{prop[2]} {prop[3]}" for prop in non_res],
+                towns=[prop[4] for prop in non_res],
+                postcodes=[prop[5] for prop in non_res],
+                mcms=[int(prop[7]) for prop in non_res],
+                floor_areas=[float(prop[6]) for prop in non_res],
+                ground_levels=np.full(len(non_res), np.nan))
 
     def add_node(self, node_details: List[str]) -> None:
         """ Add node details (if valid) to data handler
@@ -265,52 +392,136 @@ class DetailedDataHandler(DataHandler):
         Args:
             node_details (List[str]): Easting, northing, depths at various return periods
         """
-        if utils.is_valid_node(node_details):
-            self.node_eastings.append(None if self.is_blank(node_details[0]) else float(node_details[0])) 
-            self.node_northings.append(None if self.is_blank(node_details[1]) else float(node_details[1]))
-
+        self.add_nodes([node_details])
 
-            depths = node_details[2::]
-            clean_depths = [None if self.is_blank(
-                depth) else float(depth) for depth in depths]
+    def add_nodes(self, nodes: List[List[str]]) -> None:
+        """ Add details of many nodes (if valid) to data handler in one append
 
-            self.node_depths.append(clean_depths)
+        Args:
+            nodes (List[List[str]]): Easting, northing, depths at various return periods of each node
+        """
+        nodes = [[np.nan if self.is_blank(datapoint) else float(datapoint) for datapoint in node]
+                 for node in nodes if utils.is_valid_node(node)]
 
-            self.node_count += 1
+        if nodes:
+            self.node_store.append(
+                eastings=[node[0] for node in nodes],
+                northings=[node[1] for node in nodes],
+                depths=[node[2:] for node in nodes])
 
-    def add_ascii(self, fname: str) -> None:
+    def add_ascii(self, fname: str) -> float:
         """ Add ASCII grid information to data handler
 
         Args:
             fname (str): Filename of ASCII grid to be added
-        """
-        # Get and clean headers
-        header = [getline(fname, i+1) for i in range(6)]
-        header_clean = [int(re.search(r'-?\d+', datapoint).group())
-                        for datapoint in header]
 
-        # Get body
-        body = np.loadtxt(fname, skiprows=6)
+        Returns:
+            float: Speed grid was read at (MB/s)
+        """
+        self.apply_raster_cache_settings()
+        grid = AsciiGrid(fname, lazy=self.lazy_rasters, workers=self.ascii_upload_workers)
 
-        # Filter NODATAs
-        body = np.where(body == header_clean[-1], None, body)
+        # Rasters under a memory budget are held by the raster cache
+        raster = grid.body
+        if self.raster_memory_budget is not None and not isinstance(raster, LazyRaster):
+            raster_cache.put(grid.cache_key, raster)
+            raster = CachedRaster(fname, grid.cache_key)
 
         # Add to master lists
         self.ascii_fnames.append(fname)
 
-        self.n_rows.append(len(body))
-        self.n_cols.append(len(body[0]))
+        self.n_rows.append(grid.n_rows)
+        self.n_cols.append(grid.n_cols)
 
-        self.x_corners.append(header_clean[2])
-        self.y_corners.append(header_clean[3])
-        self.cellsizes.append(header_clean[4])
-        self.nodata_values.append(header_clean[5])
+        self.x_corners.append(grid.x_corner)
+        self.y_corners.append(grid.y_corner)
+        self.cellsizes.append(grid.cellsize)
+        self.nodata_values.append(grid.nodata_value)
 
-        self.raster_points.append(body)
+        # NODATAs are stored as NaN
+        self.raster_points.append(raster)
+        self.raster_keys.append(grid.cache_key)
 
         # Update counts
         self.ascii_count += 1
 
+        return grid.throughput
+
+    def add_ascii_catalog(self, directory: str, progress: Callable[[float], None] = None) -> TileCatalog:
+        """ Add directory of ASCII grid tiles to data handler, only tile headers are read
+
+        Args:
+            directory (str): Directory of tiles
+            progress (Callable[[float], None], optional): Called with fraction of tiles indexed. Defaults to None
+
+        Returns:
+            TileCatalog: Catalog of directory
+        """
+        # Directory is catalogued again in case tiles have been added or changed
+        self.apply_raster_cache_settings()
+        catalog = TileCatalog(directory, progress)
+        tile_catalogs[os.path.abspath(directory)] = catalog
+
+        if directory not in self.ascii_catalogs:
+            self.ascii_catalogs.append(directory)
+
+        return catalog
+
+    def set_flood_grids(self, return_period: int, paths: List[str]) -> None:
+        """ Set ASCII grids or directories of grid tiles giving flood depths during a flood event
+        Properties are flooded from flood grids rather than nodes once grids are set
+
+        Args:
+            return_period (int): Return period of flood event
+            paths (List[str]): Grids and tile directories, later paths take priority where they overlap
+        """
+        if paths:
+            self.flood_grids[return_period] = list(paths)
+        else:
+            self.flood_grids.pop(return_period, None)
+        self.invalidate_results()
+
+    def use_flood_grids(self) -> bool:
+        """ Test whether properties are flooded from flood grids rather than nodes
+        """
+        return bool(self.flood_grids)
+
+    def uses_ground_levels(self) -> bool:
+        """ Test whether property depths are found from ground levels, rather than given by flood depth grids
+        """
+        return not (self.use_flood_grids() and self.flood_grid_depths)
+
+    def sample_flood_grids(self, eastings: np.ndarray, northings: np.ndarray) -> np.ndarray:
+        """ Sample flood grids of every return period at the nearest measured point to each location
+
+        Args:
+            eastings (np.ndarray): Eastings of locations
+            northings (np.ndarray): Northings of locations
+
+        Returns:
+            np.ndarray: Value at each location during each flood event, NaN outside the grids
+        """
+        eastings = np.asarray(eastings, dtype=float)
+        northings = np.asarray(northings, dtype=float)
+
+        self.apply_raster_cache_settings()
+
+        levels = np.full((len(eastings), len(self.return_periods)), np.nan)
+        for event, return_period in enumerate(self.return_periods):
+            if return_period not in self.flood_grids:
+                raise ValueError(f"No flood grids given for 1 in {return_period} year event")
+
+            for path in self.flood_grids[return_period]:
+                if os.path.isdir(path):
+                    values, inside = get_tile_catalog(path).sample(eastings, northings, self.lazy_rasters)
+                else:
+                    grid = AsciiGrid(path, lazy=self.lazy_rasters)
+                    values, inside = sample_rasters(eastings, northings, [grid.x_corner], [grid.y_corner],
+                                                    [grid.cellsize], [grid.n_cols], [grid.n_rows], [grid.body])
+                levels[inside, event] = values[inside]
+
+        return levels
+
     def add_props_from_table(self, columns: List[int], table: QTableWidget) -> None:
         """ Add properties found in a QTableWidget to data hander
 
@@ -319,8 +530,7 @@ class DetailedDataHandler(DataHandler):
             table (QTableWidget): Table containing property information
         """
         all_props = utils.read_table_with_columns(columns, table)
-        for prop in all_props:
-            self.add_prop(prop)
+        self.add_props(all_props)
 
     def add_nodes_from_table(self, columns: List[int], table: QTableWidget) -> None:
         """ Add nodes found in a QTableWidget to data handler
@@ -330,8 +540,7 @@ class DetailedDataHandler(DataHandler):
             table (QTableWidget): Table containing node information
         """
         nodes_found = utils.read_table_with_columns(columns, table)
-        for node in nodes_found:
-            self.add_node(node)
+        self.add_nodes(nodes_found)
 
     def edit_res(self, prop_details: List[str], gl: str, index: int) -> None:
         """ Edit details of residential property found in data handler
@@ -341,14 +550,18 @@ class DetailedDataHandler(DataHandler):
             gl (str): New ground level value
             index (int): Index of property to be edited
         """
-        self.res_eastings[index] = float(prop_details[0])
-        self.res_northings[index] = float(prop_details[1])
-        self.res_addresses[index] = prop_details[2]
-        self.res_towns[index] = prop_details[3]
-        self.res_postcodes[index] = prop_details[4]
-        self.res_mcms[index] = int(prop_details[5])
-        
-        self.res_ground_levels[index] = float(gl) if bool(gl and gl.strip()) else None
+        self.res_store.edit(
+            index,
+            eastings=float(prop_details[0]),
+            northings=float(prop_details[1]),
+            addresses=prop_details[2],
+            towns=prop_details[3],
+            postcodes=prop_details[4],
+            mcms=int(prop_details[5]),
+            ground_levels=float(gl) if bool(gl and gl.strip()) else np.nan)
+
+        # Only edited properties need recalculating
+        self.dirty_res_ids.append(int(self.res_store.row_ids[index]))
 
     def edit_non_res(self, prop_details: List[str], gl: str, index: int) -> None:
         """ Edit details of non-residential property found in data handler
@@ -358,16 +571,20 @@ class DetailedDataHandler(DataHandler):
             gl (str): New ground level value
             index (int): Index of property to be edited
         """
-        self.non_res_eastings[index] = float(prop_details[0])
-        self.non_res_northings[index] = float(prop_details[1])
-        self.non_res_addresses[index] = prop_details[2]
-        self.non_res_towns[index] = prop_details[3]
-        self.non_res_postcodes[index] = prop_details[4]
-        self.non_res_floor_areas[index] = float(prop_details[5])
-        self.non_res_mcms[index] = int(prop_details[6])
-
-        # Check ground level is not blank        
-        self.non_res_ground_levels[index] = float(gl) if bool(gl and gl.strip()) else None
+        # Blank ground levels are stored as NaN
+        self.non_res_store.edit(
+            index,
+            eastings=float(prop_details[0]),
+            northings=float(prop_details[1]),
+            addresses=prop_details[2],
+            towns=prop_details[3],
+            postcodes=prop_details[4],
+            floor_areas=float(prop_details[5]),
+            mcms=int(prop_details[6]),
+            ground_levels=float(gl) if bool(gl and gl.strip()) else np.nan)
+
+        # Only edited properties need recalculating
+        self.dirty_non_res_ids.append(int(self.non_res_store.row_ids[index]))
 
     def edit_node(self, node_details: List[str], index: int) -> None:
         """ Edit details of node found in data handler
@@ -376,13 +593,16 @@ class DetailedDataHandler(DataHandler):
             node_details (List[str]): New easting, northing, and depths at various return periods values
             index (int): Index of node to be edited 
         """
-        self.node_eastings[index] = None if self.is_blank(
-            node_details[0]) else float(node_details[0])
-        self.node_northings[index] = None if self.is_blank(
-            node_details[1]) else float(node_details[1])
-        for j in range(len(self.return_periods)):
-            self.node_depths[index][j] = None if self.is_blank(
-                node_details[j+2]) else float(node_details[j+2])
+        node_details = [np.nan if self.is_blank(datapoint) else float(datapoint)
+                        for datapoint in node_details]
+        self.node_store.edit(
+            index,
+            eastings=node_details[0],
+            northings=node_details[1])
+        self.node_depths[index, :len(self.return_periods)] = node_details[2:len(self.return_periods)+2]
+
+        # Node depths are shared by many properties
+        self.invalidate_results()
 
     def edit_ascii(self, ascii_details: List[str], index: int) -> None:
         """ Edit selected details of ASCII grid found in data handler
@@ -405,46 +625,25 @@ class DetailedDataHandler(DataHandler):
         """ Remove residential property from data handler
 
         Args:
-            index (int): Index of property to be removed
+            index (int): Index, list of indexes or boolean mask of properties to be removed
         """ 
-        del self.res_eastings[index]
-        del self.res_northings[index]
-        del self.res_addresses[index]
-        del self.res_towns[index]
-        del self.res_postcodes[index]
-        del self.res_mcms[index]
-        del self.res_ground_levels[index]
-
-        self.res_count -= 1
+        self.res_store.delete(index)
 
     def delete_non_res(self, index: int) -> None:
         """ Remove non-residential property from data handler
 
         Args:
-            index (int): Index of property to be removed
+            index (int): Index, list of indexes or boolean mask of properties to be removed
         """
-        del self.non_res_eastings[index]
-        del self.non_res_northings[index]
-        del self.non_res_addresses[index]
-        del self.non_res_towns[index]
-        del self.non_res_postcodes[index]
-        del self.non_res_mcms[index]
-        del self.non_res_floor_areas[index]
-        del self.non_res_ground_levels[index]
-
-        self.non_res_count -= 1
+        self.non_res_store.delete(index)
 
     def delete_node(self, index: int) -> None:
         """ Remove node from data handler
 
         Args:
-            index (int): Index of node to be removed
+            index (int): Index, list of indexes or boolean mask of nodes to be removed
         """
-        del self.node_eastings[index]
-        del self.node_northings[index]
-        del self.node_depths[index]
-
-        self.node_count -= 1
+        self.node_store.delete(index)
 
     def delete_ascii(self, index: int) -> None: 
         """ Remove ASCII grid from data handler
@@ -459,81 +658,63 @@ class DetailedDataHandler(DataHandler):
         del self.y_corners[index]
         del self.cellsizes[index]
         del self.nodata_values[index]
+        if isinstance(self.raster_points[index], CachedRaster):
+            raster_cache.discard(self.raster_keys[index])
         del self.raster_points[index]
+        del self.raster_keys[index]
 
         self.ascii_count -= 1
 
     def get_res_elevations(self) -> None:
         """ Calculate ground level of residential properties from ASCII grids
         """
-        for i in range(self.res_count):
-            x = self.res_eastings[i]
-            y = self.res_northings[i]
-
-            for j in range(self.ascii_count):
-                x_start = self.x_corners[j]
-                x_stop = x_start + (self.n_cols[j] * self.cellsizes[j])
-                y_start = self.y_corners[j]
-                y_stop = y_start + (self.n_rows[j] * self.cellsizes[j])
-
-                # Res is located in ASCII grid
-                if x > x_start and x < x_stop and y > y_start and y < y_stop:
-
-                    # Round x and y to the nearest multiple of ASCII cellsize
-                    # This finds the nearest measured point in the grid to (x,y)
-                    round_x = int(self.cellsizes[j]
-                                  * round(x/self.cellsizes[j]))
-                    round_y = int(self.cellsizes[j]
-                                  * round(y/self.cellsizes[j]))
-
-                    x_index = int((round_x - x_start) / self.cellsizes[j])
-                    y_index = int(
-                        self.n_rows[j] - ((round_y - y_start) / self.cellsizes[j]))
-
-                    # Indexes at top edges of ASCII grids need to be rounded down
-                    if x_index == self.n_cols[j]:
-                        x_index -= 1
-
-                    if y_index == self.n_rows[j]:
-                        y_index -= 1
-
-                    self.res_ground_levels[i] = self.raster_points[j][y_index][x_index]
+        self.invalidate_results()
+        ground_levels, inside = self.sample_rasters(self.res_eastings, self.res_northings)
+        self.res_ground_levels[inside] = ground_levels[inside]
 
     def get_non_res_elevations(self) -> None:
         """ Calculate ground level of non-residential properties from ASCII grids
         """
-        for i in range(self.non_res_count):
-            x = self.non_res_eastings[i]
-            y = self.non_res_northings[i]
+        self.invalidate_results()
+        ground_levels, inside = self.sample_rasters(self.non_res_eastings, self.non_res_northings)
+        self.non_res_ground_levels[inside] = ground_levels[inside]
 
-            for j in range(self.ascii_count):
-                x_start = self.x_corners[j]
-                x_stop = x_start + (self.n_cols[j] * self.cellsizes[j])
-                y_start = self.y_corners[j]
-                y_stop = y_start + (self.n_rows[j] * self.cellsizes[j])
+    def apply_raster_cache_settings(self) -> None:
+        """ Apply raster memory budget and disk cache settings to the ASCII grid reader
+        """
+        if self.raster_memory_budget is not None:
+            raster_cache.budget = self.raster_memory_budget * 2**20
 
-                # Non res is located in ASCII grid
-                if x > x_start and x < x_stop and y > y_start and y < y_stop:
+        ascii_grid.cache_enabled = self.raster_disk_cache
+        ascii_grid.cache_budget = None if self.raster_disk_cache_budget is None \
+            else self.raster_disk_cache_budget * 2**20
 
-                    # Round x and y to the nearest multiple of ASCII cellsize
-                    # This finds the nearest measured point in the grid to (x,y)
-                    round_x = int(self.cellsizes[j]
-                                  * round(x/self.cellsizes[j]))
-                    round_y = int(self.cellsizes[j]
-                                  * round(y/self.cellsizes[j]))
+    def sample_rasters(self, eastings: np.ndarray, northings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """ Sample ASCII grids at the nearest measured point to each location
+        Catalogued tiles are sampled first, in the order directories were added, then uploaded grids. Later
+        grids take priority
 
-                    x_index = int((round_x - x_start) / self.cellsizes[j])
-                    y_index = int(
-                        self.n_rows[j] - ((round_y - y_start) / self.cellsizes[j]))
+        Args:
+            eastings (np.ndarray): Eastings of locations
+            northings (np.ndarray): Northings of locations
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Sampled value at each location, and mask of locations inside a grid
+        """
+        self.apply_raster_cache_settings()
 
-                    # Indexes at top edges of ASCII grids need to be rounded own
-                    if x_index == self.n_cols[j]:
-                        x_index -= 1
+        values = np.full(len(eastings), np.nan)
+        inside = np.zeros(len(eastings), dtype=bool)
+        for directory in self.ascii_catalogs:
+            tile_values, in_tiles = get_tile_catalog(directory).sample(eastings, northings, self.lazy_rasters)
+            values[in_tiles] = tile_values[in_tiles]
+            inside |= in_tiles
 
-                    if y_index == self.n_rows[j]:
-                        y_index -= 1
+        grid_values, in_grids = sample_rasters(eastings, northings, self.x_corners, self.y_corners, self.cellsizes,
+                                               self.n_cols, self.n_rows, self.raster_points)
+        values[in_grids] = grid_values[in_grids]
 
-                    self.non_res_ground_levels[i] = self.raster_points[j][y_index][x_index]
+        return values, inside | in_grids
 
     def is_blank(self, s: str) -> bool:
         """
@@ -541,6 +722,18 @@ class DetailedDataHandler(DataHandler):
         """
         return not (s and s.strip())
 
+    def get_event_matrix(self, datapoints: List[List[float]]) -> np.ndarray:
+        """ Convert per-node or per-property lists of values at each flood event into a 2D array
+
+        Args:
+            datapoints (List[List[float]]): One list of values per node or property
+
+        Returns:
+            np.ndarray: Values with one row per node or property and one column per flood event
+        """
+        return np.array(datapoints, dtype=float).reshape(
+            len(datapoints), len(self.return_periods))
+
     def get_major_datapoints(self) -> None:
         """ Get 2D list of major datapoints to be displayed in summary tables
         """
@@ -602,270 +795,440 @@ class DetailedDataHandler(DataHandler):
         self.clean_node_d = utils.apply_checks(
             self.node_checks, self.node_depths)
 
+        # Record what results are calculated from so later edits can be applied incrementally
+        self.clean_res_ids = utils.apply_checks(
+            self.res_checks, self.res_store.row_ids.values)
+        self.clean_non_res_ids = utils.apply_checks(
+            self.non_res_checks, self.non_res_store.row_ids.values)
+        self.clean_node_ids = utils.apply_checks(
+            self.node_checks, self.node_store.row_ids.values)
+        self.results_state = self.get_results_state()
+        self.dirty_res_ids = []
+        self.dirty_non_res_ids = []
+
+        # Sample flood grids at each property, or assign each property to its nearest node
+        # Index is built once and shared by residential and non-residential properties
+        if self.use_flood_grids():
+            self.res_flood_levels = self.sample_flood_grids(self.clean_res_e, self.clean_res_n)
+            self.non_res_flood_levels = self.sample_flood_grids(self.clean_non_res_e, self.clean_non_res_n)
+            self.res_node_indexes = []
+            self.non_res_node_indexes = []
+        else:
+            node_index = utils.NodeIndex(self.clean_node_e, self.clean_node_n)
+            self.res_node_indexes = node_index.query(
+                self.clean_res_e, self.clean_res_n)
+            self.non_res_node_indexes = node_index.query(
+                self.clean_non_res_e, self.clean_non_res_n)
+            self.res_flood_levels = []
+            self.non_res_flood_levels = []
+
         # Update damages fields
-        self.get_residential_damages()
-        self.get_intangible_damages()
-        self.get_mental_health_damages()
-        self.get_vehicular_damages()
-        self.get_evac_damages()
+        # Capped depths are passed on at full precision so compact results don't move step function bands
+        capped_res_depths = self.get_residential_damages()
+        self.get_res_event_damages(capped_res_depths=capped_res_depths)
         self.get_non_residential_damages()
         self.get_disruption_damages()
         self.get_infrastructure_damages()
         self.get_emergency_services_damages()
         self.get_total_damages()
 
-    def get_residential_damages(self) -> None:
-        """ Calculate damages occuring to residential properties 
+    def get_results_state(self) -> Dict[str, Any]:
+        """ Get flood details that all results depend on
+        Results can only be updated incrementally if these are unchanged since the last full calculation
         """
-        # Access flood information
-        event_damages = utils.get_res_event_damages(self.event_type)
-
-        # Get indexes of nearest nodes
-        node_indexes = [utils.get_nearest_node(
-            self.clean_res_e[i],
-            self.clean_res_n[i],
-            zip(self.clean_node_e, self.clean_node_n)) for i in range(self.clean_res_count)]
-
-        # Depths at each property during each flood event
-        self.res_depths = [[depth - self.clean_res_gl[i]
-                            for depth in self.clean_node_d[node_indexes[i]]] for i in range(self.clean_res_count)]
-
-        # Access direct damages per property based on MCM code
-        res_direct_damages = [event_damages[self.clean_res_m[i]]
-                              for i in range(self.clean_res_count)]
-
-        # Interpolate to find damages
-        self.res_damages = [utils.interpolate_res_damages(
-            res_direct_damages[i],
-            self.res_depths[i]) for i in range(self.clean_res_count)]
+        return {
+            "event_type": self.event_type,
+            "evac_cost_category": self.evac_cost_category,
+            "location": self.location,
+            "scheme_lifetime": self.scheme_lifetime,
+            "sop": self.sop,
+            "cellar": self.cellar,
+            "caps_enabled": self.caps_enabled,
+            "res_cap": self.res_cap,
+            "non_res_cap": self.non_res_cap,
+            "return_periods": list(self.return_periods),
+            "compact_results": self.compact_results,
+            "flood_grids": sorted([int(rp), list(paths)] for rp, paths in self.flood_grids.items()),
+            "flood_grid_depths": self.flood_grid_depths
+        }
+
+    def invalidate_results(self) -> None:
+        """ Force the next results update to recalculate every property
+        """
+        self.results_state = None
 
-        # Apply trapezium rule
-        self.average_annual_damage_per_res = [utils.get_average_annual(
-            self.return_periods, self.res_damages[i]) for i in range(self.clean_res_count)]
+    def can_update_results(self) -> bool:
+        """ Test whether edited properties can be recalculated without recalculating all properties
+        Requires the same flood details and the same selected properties and nodes as the last full calculation
+        """
+        return self.results_state == self.get_results_state() \
+            and np.array_equal(self.clean_res_ids, utils.apply_checks(
+                self.res_checks, self.res_store.row_ids.values)) \
+            and np.array_equal(self.clean_non_res_ids, utils.apply_checks(
+                self.non_res_checks, self.non_res_store.row_ids.values)) \
+            and np.array_equal(self.clean_node_ids, utils.apply_checks(
+                self.node_checks, self.node_store.row_ids.values))
+
+    def update_results(self) -> None:
+        """ Calculate damages and benefits, recalculating only properties edited since the last calculation
+        where possible. Totals are patched by the change in the edited properties' values
+        """
+        if not self.can_update_results():
+            self.get_damages()
+            self.get_benefits()
+            return
+
+        # Refresh clean fields of edited properties and find their positions in results fields
+        # Moved properties sample flood grids again, or find their nearest node again
+        if self.use_flood_grids():
+            locate = self.sample_flood_grids
+            res_locations, non_res_locations = self.res_flood_levels, self.non_res_flood_levels
+        else:
+            locate = utils.NodeIndex(self.clean_node_e, self.clean_node_n).query
+            res_locations, non_res_locations = self.res_node_indexes, self.non_res_node_indexes
+
+        res_rows, res_indexes = self.get_dirty_rows(
+            self.res_store, self.clean_res_ids, self.dirty_res_ids)
+        for row, index in zip(res_rows, res_indexes):
+            self.clean_res_e[row] = self.res_eastings[index]
+            self.clean_res_n[row] = self.res_northings[index]
+            self.clean_res_m[row] = self.res_mcms[index]
+            self.clean_res_gl[row] = self.res_ground_levels[index]
+            self.clean_res_a[row] = self.res_addresses[index]
+        for row, location in zip(res_rows, locate(
+                self.res_eastings[res_indexes], self.res_northings[res_indexes])):
+            res_locations[row] = location
+
+        non_res_rows, non_res_indexes = self.get_dirty_rows(
+            self.non_res_store, self.clean_non_res_ids, self.dirty_non_res_ids)
+        for row, index in zip(non_res_rows, non_res_indexes):
+            self.clean_non_res_e[row] = self.non_res_eastings[index]
+            self.clean_non_res_n[row] = self.non_res_northings[index]
+            self.clean_non_res_m[row] = self.non_res_mcms[index]
+            self.clean_non_res_gl[row] = self.non_res_ground_levels[index]
+            self.clean_non_res_a[row] = self.non_res_addresses[index]
+            self.clean_non_res_fa[row] = self.non_res_floor_areas[index]
+        for row, location in zip(non_res_rows, locate(
+                self.non_res_eastings[non_res_indexes], self.non_res_northings[non_res_indexes])):
+            non_res_locations[row] = location
+
+        self.dirty_res_ids = []
+        self.dirty_non_res_ids = []
+
+        # Recalculate edited properties
+        if len(res_rows):
+            capped_res_depths = self.get_residential_damages(res_rows)
+            self.get_res_event_damages(res_rows, capped_res_depths)
+        if len(non_res_rows):
+            self.get_non_residential_damages(non_res_rows)
+
+        # Totals derived from other totals are cheap to recalculate in full
+        self.get_disruption_damages()
+        self.get_infrastructure_damages()
+        self.get_emergency_services_damages()
+        self.get_total_damages()
 
-        # Apply cumulative discount factor
-        self.lifetime_damage_per_res = [
-            (damage * self.df) for damage in self.average_annual_damage_per_res]
+        self.get_residential_benefits(res_rows)
+        self.get_intangible_benefits(res_rows)
+        self.get_mental_health_benefits(res_rows)
+        self.get_vehicular_benefits(res_rows)
+        self.get_evac_benefits(res_rows)
+        self.get_non_residential_benefits(non_res_rows)
+        self.get_disruption_benefits()
+        self.get_infrastructure_benefits()
+        self.get_emergency_services_benefits()
+        self.get_total_benefits()
 
-        # Sums
-        self.total_average_res_damage = sum(self.average_annual_damage_per_res)
-        self.total_lifetime_res_damage = sum(self.lifetime_damage_per_res)
+    def get_dirty_rows(self, store: ColumnStore, clean_ids: List[int], dirty_ids: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """ Find edited properties that are included in results
 
-        # Capped depths set equal to uncapped depths
-        # Then written over if capping is enabled
-        self.capped_res_depths = self.res_depths.copy()
+        Args:
+            store (ColumnStore): Store holding the properties
+            clean_ids (List[int]): Row IDs of properties included in results
+            dirty_ids (List[int]): Row IDs of edited properties
 
-        # Capped damages set equal to uncapped damages
-        # Then written over if capping is enabled
-        self.capped_res_damages = self.res_damages.copy()
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Position of each edited property in results fields and its index in store
+        """
+        # Row IDs stay sorted so positions are found by binary search
+        clean_ids = np.asarray(clean_ids, dtype=np.int64)
+        dirty_ids = np.unique(np.asarray(dirty_ids, dtype=np.int64))
+        rows = np.minimum(np.searchsorted(clean_ids, dirty_ids), max(len(clean_ids) - 1, 0))
+        included = clean_ids[rows] == dirty_ids if len(clean_ids) else np.zeros(len(dirty_ids), dtype=bool)
+        return rows[included], store.get_indexes(dirty_ids[included])
+
+    def select_rows(self, values: List, rows: Union[np.ndarray, None]) -> List:
+        """ Get values of the clean properties at rows, or all values if rows is None
+        """
+        if rows is None:
+            return values
+        if isinstance(values, np.ndarray):
+            return values[rows]
+        return [values[row] for row in rows]
 
-        if self.caps_enabled:
-            # Compare lifetime damages and user-entered cap
-            self.capped_lifetime_damage_per_res = [
-                min(self.res_cap, self.lifetime_damage_per_res[i]) for i in range(self.clean_res_count)]
-
-            self.capped_average_annual_damage_per_res = [
-                (damage/self.df) for damage in self.capped_lifetime_damage_per_res]
-
-            # Update sums
-            self.total_average_res_damage = sum(
-                self.capped_average_annual_damage_per_res)
-            self.total_lifetime_res_damage = sum(
-                self.capped_lifetime_damage_per_res)
-
-            # Find capping depths for each property
-            # Cap all depths higher than it
-            for prop in range(self.clean_res_count):
-                cap = utils.get_capping_depth(
-                    self.return_periods,
-                    self.res_depths[prop],
-                    self.res_damages[prop],
-                    self.res_cap,
-                    self.df)
-
-                # Update capped depths and damages
-                depths = self.res_depths[prop]
-                damages = self.res_damages[prop]
-                if cap is not None:
-                    self.capped_res_depths[prop] = [
-                        min(depth, cap) for depth in depths]
-                    self.capped_res_damages[prop] = [min(
-                        damage, self.capped_average_annual_damage_per_res[prop]) for damage in damages]
-
-    def get_intangible_damages(self) -> None:
-        """ Calculate intangible damages arising from flood event
-        """
-        self.current_sops = [utils.get_current_sop(
-            self.return_periods, self.capped_res_depths[i]) for i in range(self.clean_res_count)]
-
-        # Interpolate to find average annual
-        self.average_annual_intangible_damages = [
-            utils.get_intangible_damage(sop) for sop in self.current_sops]
-
-        # Apply cumulative health discount factor
-        self.lifetime_intangible_damages = [
-            (damage * self.health_df) for damage in self.average_annual_intangible_damages]
-
-        # Sums
-        self.total_average_intangible_damage = sum(
-            self.average_annual_intangible_damages)
-        self.total_lifetime_intangible_damage = sum(
-            self.lifetime_intangible_damages)
-
-    def get_mental_health_damages(self) -> None:
-        """ Calculate mental health costs arising from flood event
-        """
-        self.mh_costs = [utils.get_mh_costs(
-            self.capped_res_depths[i], self.clean_res_m[i]) for i in range(self.clean_res_count)]
+    def set_results(self, rows: Union[np.ndarray, None], fields: Dict[str, Any], totals: Dict[str, str] = {}) -> None:
+        """ Write per-property results fields and the totals summed from them
+        If rows is None every property is written and totals are summed in full,
+        otherwise only the properties at rows are written and totals are patched by the change in their values
 
-        # Apply trapezium rule
-        self.average_annual_mh_costs = [utils.get_average_annual(
-            self.return_periods, self.mh_costs[i]) for i in range(self.clean_res_count)]
-
-        # Apply cumulative discount factor
-        self.lifetime_mh_costs = [(damage * self.health_df)
-                                  for damage in self.average_annual_mh_costs]
+        Args:
+            rows (Union[np.ndarray, None]): Positions of recalculated properties in results fields
+            fields (Dict[str, Any]): New values of each results field, one row per recalculated property
+            totals (Dict[str, str]): Field summed into each total
+        """
+        for total, field in totals.items():
+            values = np.asarray(fields[field], dtype=float)
+            if rows is None:
+                value = np.sum(values, axis=0)
+            else:
+                old_values = np.asarray(self.select_rows(getattr(self, field), rows), dtype=float).reshape(values.shape)
+                value = np.asarray(getattr(self, total)) + np.sum(values - old_values, axis=0)
+
+            # Totals per flood event are stored as lists
+            setattr(self, total, value.tolist() if np.ndim(value) else value)
+
+        for field, values in fields.items():
+            # Numeric results are kept as float32 arrays in compact mode, otherwise as lists
+            if self.compact_results and isinstance(values, np.ndarray) and values.dtype.kind == "f":
+                values = values.astype(np.float32)
+            else:
+                values = values.tolist() if isinstance(values, np.ndarray) else list(values)
+
+            current = getattr(self, field)
+            if rows is None:
+                setattr(self, field, values)
+            elif isinstance(current, np.ndarray):
+                current[rows] = values
+            else:
+                for row, value in zip(rows, values):
+                    current[row] = value
+
+    def get_property_depths(self, node_indexes: List[int], flood_levels: List[List[float]], ground_levels: List[float],
+                            rows: np.ndarray = None) -> np.ndarray:
+        """ Get depth at each property during each flood event, from flood grids if given or its nearest node
 
-        # Sums
-        self.total_average_mh_costs = sum(self.average_annual_mh_costs)
-        self.total_lifetime_mh_costs = sum(self.lifetime_mh_costs)
+        Args:
+            node_indexes (List[int]): Nearest node to each clean property
+            flood_levels (List[List[float]]): Flood grid values at each clean property
+            ground_levels (List[float]): Ground level of each clean property
+            rows (np.ndarray, optional): Only get properties at these positions. Defaults to all properties
 
-    def get_vehicular_damages(self) -> None:
-        """ Calcuate vehicular damages arising from flood event
+        Returns:
+            np.ndarray: Depth at each property during each flood event
         """
-        # Find weighting from event type
-        weighting = 0.75
-        if self.event_type in [
-            "Short Duration Major Flood Storm No Warning",
-            "Long Duration Major Flood Storm No Warning",
-                "Extra-Long Duration Major Flood Storm No Warning"]:
-            weighting = 1
+        ground_levels = np.array(self.select_rows(ground_levels, rows), dtype=float)
+        if not self.use_flood_grids():
+            node_depths = self.get_event_matrix(
+                self.select_rows(self.clean_node_d, self.select_rows(node_indexes, rows)))
+            return node_depths - ground_levels[:, None]
 
-        # utils functions adjusts for internal property threshold
-        # 0.15m addition is NOT required
-        self.vehicular_damages = [utils.get_vehicle_damages(
-            depths, weighting) for depths in self.capped_res_depths]
+        levels = self.get_event_matrix(self.select_rows(flood_levels, rows))
+        depths = levels if self.flood_grid_depths else levels - ground_levels[:, None]
 
-        # Apply trapezium rule
-        self.average_annual_vehicular_damages = [utils.get_average_annual(
-            self.return_periods, self.vehicular_damages[i]) for i in range(self.clean_res_count)]
+        # Properties outside the grids or at NODATA cells are dry
+        depths[np.isnan(levels)] = dry_depth
+        return depths
 
-        # Apply cumulative discount factor
-        self.lifetime_vehicular_damages = [
-            (damage * self.df) for damage in self.average_annual_vehicular_damages]
+    def get_residential_damages(self, rows: np.ndarray = None) -> np.ndarray:
+        """ Calculate damages occuring to residential properties 
 
-        # Sums
-        self.total_average_vehicular_damages = sum(
-            self.average_annual_vehicular_damages)
-        self.total_lifetime_vehicular_damages = sum(
-            self.lifetime_vehicular_damages)
+        Args:
+            rows (np.ndarray, optional): Only recalculate properties at these positions. Defaults to all properties
 
-    def get_evac_damages(self) -> None:
-        """ Calculate evacuation costs arising from flood event
+        Returns:
+            np.ndarray: Capped depths of recalculated properties, at full precision
         """
-        # Get direct evac costs based on event type
-        direct_costs = utils.get_evac_category_costs(self.evac_cost_category)
+        # Access flood information
+        damage_curves = utils.get_res_damage_curves(self.event_type)
 
-        res_direct_costs = [direct_costs[mcm] for mcm in self.clean_res_m]
+        # Depths at each property during each flood event
+        res_depths = self.get_property_depths(
+            self.res_node_indexes, self.res_flood_levels, self.clean_res_gl, rows)
 
-        # Interpolate to find damages
-        self.evac_costs = [utils.get_evac_costs(
-            res_direct_costs[i], self.capped_res_depths[i]) for i in range(self.clean_res_count)]
+        # Interpolate along each property's MCM curve to find damages
+        res_damages = damage_curves.interpolate(
+            self.select_rows(self.clean_res_m, rows), res_depths)
 
         # Apply trapezium rule
-        self.average_annual_evac_costs = [utils.get_average_annual(
-            self.return_periods, self.evac_costs[i]) for i in range(self.clean_res_count)]
+        average_annual_damages = utils.get_average_annual_matrix(
+            self.return_periods, res_damages)
+
+        # Apply cumulative discount factor
+        lifetime_damages = average_annual_damages * self.df
 
-        # Applt cumulative discount factor
-        self.lifetime_evac_costs = [(damage * self.df)
-                                    for damage in self.average_annual_evac_costs]
+        # Capped depths and damages set equal to uncapped values
+        # Then written over if capping is enabled
+        capped_res_depths = res_depths
+        capped_res_damages = res_damages
+        fields = {}
+        totals = {
+            "total_average_res_damage": "average_annual_damage_per_res",
+            "total_lifetime_res_damage": "lifetime_damage_per_res"
+        }
 
-        # Sums
-        self.total_average_evac_costs = sum(self.average_annual_evac_costs)
-        self.total_lifetime_evac_costs = sum(self.lifetime_evac_costs)
+        if self.caps_enabled:
+            # Compare lifetime damages and user-entered cap
+            capped_lifetime_damages = np.minimum(self.res_cap, lifetime_damages)
+            capped_average_annual_damages = capped_lifetime_damages / self.df
+
+            fields["capped_lifetime_damage_per_res"] = capped_lifetime_damages
+            fields["capped_average_annual_damage_per_res"] = capped_average_annual_damages
+
+            # Sums are of capped damages
+            totals = {
+                "total_average_res_damage": "capped_average_annual_damage_per_res",
+                "total_lifetime_res_damage": "capped_lifetime_damage_per_res"
+            }
+
+            # Find capping depths for all properties
+            # Cap all depths and damages higher than it
+            capping_depths = utils.get_capping_depths(
+                self.return_periods, res_depths, res_damages, self.res_cap, self.df)
+            capped = ~np.isnan(capping_depths)[:, None]
+
+            capped_res_depths = np.where(
+                capped, np.minimum(res_depths, capping_depths[:, None]), res_depths)
+            capped_res_damages = np.where(
+                capped, np.minimum(res_damages, capped_average_annual_damages[:, None]), res_damages)
+
+        # Per-property lists read by breakdowns and exports
+        fields.update({
+            "res_depths": res_depths,
+            "res_damages": res_damages,
+            "average_annual_damage_per_res": average_annual_damages,
+            "lifetime_damage_per_res": lifetime_damages,
+            "capped_res_depths": capped_res_depths,
+            "capped_res_damages": capped_res_damages
+        })
+        self.set_results(rows, fields, totals)
+
+        return capped_res_depths
+
+    def get_res_event_damages(self, rows: np.ndarray = None, capped_res_depths: np.ndarray = None) -> None:
+        """ Calculate intangible damages, mental health costs, vehicular damages and evacuation costs arising
+        from flood event in a single stage, reading capped residential depths once
 
-    def get_non_residential_damages(self) -> None:
+        Args:
+            rows (np.ndarray, optional): Only recalculate properties at these positions. Defaults to all properties
+            capped_res_depths (np.ndarray, optional): Capped depths of properties at rows, as returned by
+                get_residential_damages. Defaults to reading stored capped depths
+        """
+        if capped_res_depths is None:
+            capped_res_depths = self.get_event_matrix(self.select_rows(self.capped_res_depths, rows))
+
+        current_sops, event_damages = utils.get_res_event_damages(
+            self.return_periods, capped_res_depths,
+            self.select_rows(self.clean_res_m, rows), self.event_type, self.evac_cost_category)
+        mh_costs, vehicular_damages, evac_costs = event_damages
+
+        # Interpolate intangible table to find average annual
+        average_annual_intangible = utils.get_intangible_damages(current_sops)
+
+        # Apply trapezium rule to all other damage types at once
+        average_annual_mh, average_annual_vehicular, average_annual_evac = utils.get_average_annual_matrix(
+            self.return_periods, event_damages)
+
+        # Properties with no damage at any flood event have no current SOP
+        stored_sops = current_sops.astype(object)
+        stored_sops[np.isnan(current_sops)] = None
+
+        # Apply cumulative discount factors
+        self.set_results(rows, {
+            "current_sops": stored_sops,
+            "average_annual_intangible_damages": average_annual_intangible,
+            "lifetime_intangible_damages": average_annual_intangible * self.health_df,
+            "mh_costs": mh_costs,
+            "average_annual_mh_costs": average_annual_mh,
+            "lifetime_mh_costs": average_annual_mh * self.health_df,
+            "vehicular_damages": vehicular_damages,
+            "average_annual_vehicular_damages": average_annual_vehicular,
+            "lifetime_vehicular_damages": average_annual_vehicular * self.df,
+            "evac_costs": evac_costs,
+            "average_annual_evac_costs": average_annual_evac,
+            "lifetime_evac_costs": average_annual_evac * self.df
+        }, {
+            "total_average_intangible_damage": "average_annual_intangible_damages",
+            "total_lifetime_intangible_damage": "lifetime_intangible_damages",
+            "total_average_mh_costs": "average_annual_mh_costs",
+            "total_lifetime_mh_costs": "lifetime_mh_costs",
+            "total_average_vehicular_damages": "average_annual_vehicular_damages",
+            "total_lifetime_vehicular_damages": "lifetime_vehicular_damages",
+            "total_average_evac_costs": "average_annual_evac_costs",
+            "total_lifetime_evac_costs": "lifetime_evac_costs"
+        })
+
+    def get_non_residential_damages(self, rows: np.ndarray = None) -> None:
         """ Calculate damages occuring to non-residential properties
+
+        Args:
+            rows (np.ndarray, optional): Only recalculate properties at these positions. Defaults to all properties
         """
         # Access flood information
-        event_damages = utils.get_non_res_event_damages(
+        damage_curves = utils.get_non_res_damage_curves(
             self.event_type, self.cellar)
 
-        # Get indexes of nearest nodes
-        node_indexes = [utils.get_nearest_node(
-            self.clean_non_res_e[i],
-            self.clean_non_res_n[i],
-            zip(self.clean_node_e, self.clean_node_n)) for i in range(self.clean_non_res_count)]
-
         # Depths at each property during each flood event
-        self.non_res_depths = [[depth - self.clean_non_res_gl[i]
-                                for depth in self.clean_node_d[node_indexes[i]]] for i in range(self.clean_non_res_count)]
-
-        # Access direct damages per property based on MCM code
-        non_res_direct_damages = [
-            event_damages[self.clean_non_res_m[i]] for i in range(self.clean_non_res_count)]
+        non_res_depths = self.get_property_depths(
+            self.non_res_node_indexes, self.non_res_flood_levels, self.clean_non_res_gl, rows)
 
-        # Interpolate to find damages
-        non_res_damages_per_metre = [utils.interpolate_non_res_damages(
-            non_res_direct_damages[i],
-            self.non_res_depths[i]) for i in range(self.clean_non_res_count)]
-
-        # Multiply damages by area of each property
-        self.non_res_damages = [[damage * self.clean_non_res_fa[i]
-                                 for damage in non_res_damages_per_metre[i]] for i in range(self.clean_non_res_count)]
+        # Interpolate along each property's MCM curve to find damages per m²
+        # Then multiply by floor area of each property
+        floor_areas = np.array(self.select_rows(self.clean_non_res_fa, rows), dtype=float)
+        non_res_damages = damage_curves.interpolate(
+            self.select_rows(self.clean_non_res_m, rows), non_res_depths) * floor_areas[:, None]
 
         # Apply trapezium rule
-        self.average_annual_damage_per_non_res = [utils.get_average_annual(
-            self.return_periods, self.non_res_damages[i]) for i in range(self.clean_non_res_count)]
+        average_annual_damages = utils.get_average_annual_matrix(
+            self.return_periods, non_res_damages)
 
         # Apply cumulative discount factor
-        self.lifetime_damage_per_non_res = [
-            (damage * self.df) for damage in self.average_annual_damage_per_non_res]
-
-        # Sums
-        self.total_average_non_res_damage = sum(
-            self.average_annual_damage_per_non_res)
-        self.total_lifetime_non_res_damage = sum(
-            self.lifetime_damage_per_non_res)
+        lifetime_damages = average_annual_damages * self.df
 
-        # Capped depths set equal to uncapped depths
-        # Then written over if capping is enabled
-        self.capped_non_res_depths = self.non_res_depths.copy()
-
-        # Capped damages set equal to uncapped damages
+        # Capped depths and damages set equal to uncapped values
         # Then written over if capping is enabled
+        capped_non_res_depths = non_res_depths
+        capped_non_res_damages = non_res_damages
+        fields = {}
+        totals = {
+            "total_average_non_res_damage": "average_annual_damage_per_non_res",
+            "total_lifetime_non_res_damage": "lifetime_damage_per_non_res"
+        }
 
         if self.caps_enabled:
             # Compare lifetime damages and user-entered cap
-            self.capped_lifetime_damage_per_non_res = [min(
-                self.non_res_cap, self.lifetime_damage_per_non_res[i]) for i in range(self.clean_non_res_count)]
-
-            self.capped_average_annual_damage_per_non_res = [
-                (damage/self.df) for damage in self.capped_lifetime_damage_per_non_res]
-
-            # Update sums
-            self.total_average_non_res_damage = sum(
-                self.capped_average_annual_damage_per_non_res)
-            self.total_lifetime_non_res_damage = sum(
-                self.capped_lifetime_damage_per_non_res)
-
-            # Find capping depths for each property
-            # Cap all depths higher than it
-            for prop in range(self.clean_non_res_count):
-                cap = utils.get_capping_depth(
-                    self.return_periods,
-                    self.non_res_depths[prop],
-                    self.non_res_damages[prop],
-                    self.non_res_cap,
-                    self.df)
-
-                depths = self.non_res_depths[prop]
-                damages = self.non_res_damages[prop]
-                if cap is not None:
-                    self.capped_non_res_depths[prop] = [
-                        min(depth, cap) for depth in depths]
-                    self.capped_non_res_damages = [min(
-                        damage, self.capped_average_annual_damage_per_non_res[prop]) for damage in damages]
+            capped_lifetime_damages = np.minimum(self.non_res_cap, lifetime_damages)
+            capped_average_annual_damages = capped_lifetime_damages / self.df
+
+            fields["capped_lifetime_damage_per_non_res"] = capped_lifetime_damages
+            fields["capped_average_annual_damage_per_non_res"] = capped_average_annual_damages
+
+            # Sums are of capped damages
+            totals = {
+                "total_average_non_res_damage": "capped_average_annual_damage_per_non_res",
+                "total_lifetime_non_res_damage": "capped_lifetime_damage_per_non_res"
+            }
+
+            # Find capping depths for all properties
+            # Cap all depths and damages higher than it
+            capping_depths = utils.get_capping_depths(
+                self.return_periods, non_res_depths, non_res_damages, self.non_res_cap, self.df)
+            capped = ~np.isnan(capping_depths)[:, None]
+
+            capped_non_res_depths = np.where(
+                capped, np.minimum(non_res_depths, capping_depths[:, None]), non_res_depths)
+            capped_non_res_damages = np.where(
+                capped, np.minimum(non_res_damages, capped_average_annual_damages[:, None]), non_res_damages)
+
+        # Per-property lists read by breakdowns and exports
+        fields.update({
+            "non_res_depths": non_res_depths,
+            "non_res_damages": non_res_damages,
+            "average_annual_damage_per_non_res": average_annual_damages,
+            "lifetime_damage_per_non_res": lifetime_damages,
+            "capped_non_res_depths": capped_non_res_depths,
+            "capped_non_res_damages": capped_non_res_damages
+        })
+        self.set_results(rows, fields, totals)
 
     def get_disruption_damages(self) -> None:
         """ Calculate business disruption damages arising from flood event 
@@ -947,21 +1310,24 @@ class DetailedDataHandler(DataHandler):
         self.get_emergency_services_benefits()
         self.get_total_benefits()
 
-    def get_residential_benefits(self) -> None:
+    def get_residential_benefits(self, rows: np.ndarray = None) -> None:
         """ Calculate benefits to residential properties
+
+        Args:
+            rows (np.ndarray, optional): Only recalculate properties at these positions. Defaults to all properties
         """
         # Apply trapezium rule
-        self.res_benefits = [utils.get_benefits(
-            self.return_periods, self.res_damages[i]) for i in range(self.clean_res_count)]
+        damages = self.get_event_matrix(self.select_rows(self.res_damages, rows))
+        res_benefits = utils.get_benefits_matrix(self.return_periods, damages)
 
         # Compare with cap if needed
         if self.caps_enabled:
-            self.res_benefits = [[min(self.capped_average_annual_damage_per_res[i], self.res_benefits[i][j]) for j in range(
-                len(self.return_periods) - 1)] for i in range(self.clean_res_count)]
+            capped_damages = np.array(self.select_rows(
+                self.capped_average_annual_damage_per_res, rows), dtype=float)
+            res_benefits = np.minimum(capped_damages[:, None], res_benefits)
 
         # Sum
-        self.total_res_benefits = [sum([self.res_benefits[i][j] for i in range(
-            self.clean_res_count)]) for j in range(len(self.return_periods)-1)]
+        self.set_results(rows, {"res_benefits": res_benefits}, {"total_res_benefits": "res_benefits"})
 
         # Find current benefit
         self.current_annual_res_benefit = utils.get_current_benefit(
@@ -976,22 +1342,27 @@ class DetailedDataHandler(DataHandler):
         self.lifetime_res_damage_after = self.total_lifetime_res_damage - \
             self.current_lifetime_res_benefit
 
-    def get_intangible_benefits(self) -> None:
+    def get_intangible_benefits(self, rows: np.ndarray = None) -> None:
         """ Calculate intangible benefits
+
+        Args:
+            rows (np.ndarray, optional): Only recalculate properties at these positions. Defaults to all properties
         """
         # Bilinear interpolation
-        self.annual_intangible_benefits = [utils.get_intangible_benefit(
-            aep, 100/self.sop) for aep in self.current_sops]
+        current_sops = np.array(self.select_rows(self.current_sops, rows), dtype=float)
+        annual_benefits = utils.get_intangible_benefits(current_sops, 100/self.sop)
 
         # Apply cumulative discount factor
-        self.lifetime_intangible_benefits = [
-            (benefit*self.health_df) for benefit in self.annual_intangible_benefits]
+        lifetime_benefits = annual_benefits * self.health_df
 
         # Totals
-        self.current_annual_intangible_benefit = sum(
-            self.annual_intangible_benefits)
-        self.current_lifetime_intangible_benefit = sum(
-            self.lifetime_intangible_benefits)
+        self.set_results(rows, {
+            "annual_intangible_benefits": annual_benefits,
+            "lifetime_intangible_benefits": lifetime_benefits
+        }, {
+            "current_annual_intangible_benefit": "annual_intangible_benefits",
+            "current_lifetime_intangible_benefit": "lifetime_intangible_benefits"
+        })
 
         # Calculate post-intervention damages
         self.annual_intangible_damage_after = self.total_average_intangible_damage - \
@@ -999,16 +1370,18 @@ class DetailedDataHandler(DataHandler):
         self.lifetime_intangible_damage_after = self.total_lifetime_intangible_damage - \
             self.current_lifetime_intangible_benefit
 
-    def get_mental_health_benefits(self) -> None:
+    def get_mental_health_benefits(self, rows: np.ndarray = None) -> None:
         """ Calculate mental health benefits
+
+        Args:
+            rows (np.ndarray, optional): Only recalculate properties at these positions. Defaults to all properties
         """
         # Apply trapezium rule
-        self.mh_benefits = [utils.get_benefits(
-            self.return_periods, self.mh_costs[i]) for i in range(self.clean_res_count)]
+        mh_benefits = utils.get_benefits_matrix(
+            self.return_periods, self.get_event_matrix(self.select_rows(self.mh_costs, rows)))
 
         # Sum
-        self.total_mh_benefits = [sum([self.mh_benefits[i][j] for i in range(
-            self.clean_res_count)]) for j in range(len(self.return_periods)-1)]
+        self.set_results(rows, {"mh_benefits": mh_benefits}, {"total_mh_benefits": "mh_benefits"})
 
         # Find current benefit
         self.current_annual_mh_benefit = utils.get_current_benefit(
@@ -1023,16 +1396,19 @@ class DetailedDataHandler(DataHandler):
         self.lifetime_mh_damage_after = self.total_lifetime_mh_costs - \
             self.current_lifetime_mh_benefit
 
-    def get_vehicular_benefits(self) -> None:
+    def get_vehicular_benefits(self, rows: np.ndarray = None) -> None:
         """ Calculate vehicle benefits 
+
+        Args:
+            rows (np.ndarray, optional): Only recalculate properties at these positions. Defaults to all properties
         """
         # Apply trapezium rule
-        self.vehicular_benefits = [utils.get_benefits(
-            self.return_periods, self.vehicular_damages[i]) for i in range(self.clean_res_count)]
+        vehicular_benefits = utils.get_benefits_matrix(
+            self.return_periods, self.get_event_matrix(self.select_rows(self.vehicular_damages, rows)))
 
         # Sum
-        self.total_vehicular_benefits = [sum([self.vehicular_benefits[i][j] for i in range(
-            self.clean_res_count)]) for j in range(len(self.return_periods)-1)]
+        self.set_results(rows, {"vehicular_benefits": vehicular_benefits},
+                         {"total_vehicular_benefits": "vehicular_benefits"})
 
         # Find current benefit
         self.current_annual_vehicle_benefit = utils.get_current_benefit(
@@ -1047,16 +1423,18 @@ class DetailedDataHandler(DataHandler):
         self.lifetime_vehicle_damage_after = self.total_lifetime_vehicular_damages - \
             self.current_lifetime_vehicle_benefit
 
-    def get_evac_benefits(self) -> None:
+    def get_evac_benefits(self, rows: np.ndarray = None) -> None:
         """ Calculate evacuation benefits
+
+        Args:
+            rows (np.ndarray, optional): Only recalculate properties at these positions. Defaults to all properties
         """
         # Apply trapezium rule
-        self.evac_benefits = [utils.get_benefits(
-            self.return_periods, self.evac_costs[i]) for i in range(self.clean_res_count)]
+        evac_benefits = utils.get_benefits_matrix(
+            self.return_periods, self.get_event_matrix(self.select_rows(self.evac_costs, rows)))
 
         # Sum
-        self.total_evac_benefits = [sum([self.evac_benefits[i][j] for i in range(
-            self.clean_res_count)]) for j in range(len(self.return_periods)-1)]
+        self.set_results(rows, {"evac_benefits": evac_benefits}, {"total_evac_benefits": "evac_benefits"})
 
         # Find current benefit
         self.current_annual_evac_benefit = utils.get_current_benefit(
@@ -1071,21 +1449,25 @@ class DetailedDataHandler(DataHandler):
         self.lifetime_evac_damage_after = self.total_lifetime_evac_costs - \
             self.current_lifetime_evac_benefit
 
-    def get_non_residential_benefits(self) -> None:
+    def get_non_residential_benefits(self, rows: np.ndarray = None) -> None:
         """ Calculate benefits to non-residential properties
+
+        Args:
+            rows (np.ndarray, optional): Only recalculate properties at these positions. Defaults to all properties
         """
         # Apply trapezium rule
-        self.non_res_benefits = [utils.get_benefits(
-            self.return_periods, self.non_res_damages[i]) for i in range(self.clean_non_res_count)]
+        damages = self.get_event_matrix(self.select_rows(self.non_res_damages, rows))
+        non_res_benefits = utils.get_benefits_matrix(self.return_periods, damages)
 
         # Compare with caps if needed
         if self.caps_enabled:
-            self.non_res_benefits = [[min(self.capped_average_annual_damage_per_non_res[i], self.non_res_benefits[i][j]) for j in range(
-                len(self.return_periods) - 1)] for i in range(self.clean_non_res_count)]
+            capped_damages = np.array(self.select_rows(
+                self.capped_average_annual_damage_per_non_res, rows), dtype=float)
+            non_res_benefits = np.minimum(capped_damages[:, None], non_res_benefits)
 
         # Sum
-        self.total_non_res_benefits = [sum([self.non_res_benefits[i][j] for i in range(
-            self.clean_non_res_count)]) for j in range(len(self.return_periods)-1)]
+        self.set_results(rows, {"non_res_benefits": non_res_benefits},
+                         {"total_non_res_benefits": "non_res_benefits"})
 
         # Find current benefit
         self.current_annual_non_res_benefit = utils.get_current_benefit(
@@ -1206,6 +1588,217 @@ class DetailedDataHandler(DataHandler):
         ]
         self.total_current_lifetime_benefit = sum(lifetime_benefits)
 
+    def get_sop_sweep(self) -> List[List[float]]:
+        """ Calculate benefits of every damage type for schemes of each return period and each extra SOP
+        All SOPs are evaluated in one pass over the per-property results of the last calculation
+        Benefits for SOPs between return periods are interpolated in the same way as the trapezium rule
+
+        Returns:
+            List[List[float]]: One row per SOP holding the SOP, then annual and lifetime benefits of each
+            damage type in the order of get_major_datapoints
+        """
+        sops = sorted(set(self.return_periods) | set(self.extra_sops))
+
+        # Residential and non-residential benefits are capped per property
+        res_benefits = utils.get_benefits_at_sops(
+            self.return_periods, self.get_event_matrix(self.res_damages), sops)
+        non_res_benefits = utils.get_benefits_at_sops(
+            self.return_periods, self.get_event_matrix(self.non_res_damages), sops)
+        if self.caps_enabled:
+            res_benefits = np.minimum(np.array(
+                self.capped_average_annual_damage_per_res, dtype=float)[:, None], res_benefits)
+            non_res_benefits = np.minimum(np.array(
+                self.capped_average_annual_damage_per_non_res, dtype=float)[:, None], non_res_benefits)
+        res_benefits = res_benefits.sum(axis=0)
+        non_res_benefits = non_res_benefits.sum(axis=0)
+
+        # Other damage types are uncapped so benefits of the summed damages are used
+        mh_benefits, vehicle_benefits, evac_benefits = [utils.get_benefits_at_sops(
+            self.return_periods, self.get_event_matrix(damages).sum(axis=0), sops)
+            for damages in [self.mh_costs, self.vehicular_damages, self.evac_costs]]
+
+        intangible_benefits = utils.get_intangible_benefits(
+            np.array(self.current_sops, dtype=float), 100/np.array(sops, dtype=float)).sum(axis=-1)
+
+        disruption_benefits = non_res_benefits * 0.03
+
+        # Post-intervention damages needed for infrastructure and emergency services benefits
+        res_after = self.total_average_res_damage - res_benefits
+        non_res_after = self.total_average_non_res_damage - non_res_benefits
+        infrastructure_after = (res_after + non_res_after) * 0.1
+        infrastructure_benefits = self.total_average_infrastructure_damage - infrastructure_after
+
+        location_weight = utils.get_location_weight(self.location)
+        all_after = res_after + non_res_after + non_res_after * 0.03 + \
+            (self.total_average_intangible_damage - intangible_benefits) + \
+            (self.total_average_mh_costs - mh_benefits) + \
+            (self.total_average_vehicular_damages - vehicle_benefits) + \
+            (self.total_average_evac_costs - evac_benefits)
+        emergency_services_benefits = self.total_average_emergency_services_costs - \
+            all_after * (location_weight - 1)
+
+        # Annual benefits and discount factor of each damage type
+        annual_benefits = [
+            (res_benefits, self.df),
+            (intangible_benefits, self.health_df),
+            (mh_benefits, self.health_df),
+            (vehicle_benefits, self.df),
+            (evac_benefits, self.df),
+            (non_res_benefits, self.df),
+            (disruption_benefits, self.df),
+            (infrastructure_benefits, self.df),
+            (emergency_services_benefits, self.health_df)
+        ]
+        columns = []
+        for benefits, df in annual_benefits:
+            columns += [benefits, benefits * df]
+
+        # Totals
+        columns += [sum(columns[0::2]), sum(columns[1::2])]
+
+        return np.column_stack([sops] + columns).tolist()
+
+    def get_uncertainty_inputs(self, gl_sd: float, depth_sd: float) -> Dict[str, Any]:
+        """ Collect arrays and flood details needed to evaluate Monte Carlo samples
+        Inputs are plain arrays so they can be sent to worker processes
+
+        Args:
+            gl_sd (float): Standard deviation of ground level errors (m)
+            depth_sd (float): Standard deviation of node depth errors (m)
+
+        Returns:
+            Dict[str, Any]: Inputs of monte_carlo.run_samples
+        """
+        res_count = len(self.clean_res_m)
+        non_res_count = len(self.clean_non_res_m)
+        if self.use_flood_grids():
+            # Each property's depth is sampled separately so has its own depth error, like a node of its own
+            node_count = res_count + non_res_count
+            res_node_indexes = np.arange(res_count)
+            non_res_node_indexes = res_count + np.arange(non_res_count)
+        else:
+            node_count = len(self.clean_node_d)
+            res_node_indexes = np.array(self.res_node_indexes, dtype=int)
+            non_res_node_indexes = np.array(self.non_res_node_indexes, dtype=int)
+
+        return {
+            "return_periods": list(self.return_periods),
+            "sop": self.sop,
+            "df": self.df,
+            "health_df": self.health_df,
+            "event_type": self.event_type,
+            "evac_cost_category": self.evac_cost_category,
+            "cellar": self.cellar,
+            "caps_enabled": self.caps_enabled,
+            "res_cap": self.res_cap,
+            "non_res_cap": self.non_res_cap,
+            "gl_sd": gl_sd,
+            "depth_sd": depth_sd,
+            "node_count": node_count,
+            "res_node_indexes": res_node_indexes,
+            "res_mcms": np.array(self.clean_res_m, dtype=int),
+            "res_depths": self.get_property_depths(self.res_node_indexes, self.res_flood_levels, self.clean_res_gl),
+            "non_res_node_indexes": non_res_node_indexes,
+            "non_res_mcms": np.array(self.clean_non_res_m, dtype=int),
+            "non_res_floor_areas": np.array(self.clean_non_res_fa, dtype=float),
+            "non_res_depths": self.get_property_depths(
+                self.non_res_node_indexes, self.non_res_flood_levels, self.clean_non_res_gl)
+        }
+
+    def get_uncertainty(self, samples: int = 1000, gl_sd: float = 0.1, depth_sd: float = 0.1,
+                        percentiles: List[float] = [5, 50, 95], workers: int = 1, seed: int = None) -> List[List[List[float]]]:
+        """ Estimate uncertainty of results by Monte Carlo sampling of errors in ground levels and node depths
+        Each sample adds a normally distributed error to every clean ground level and one to every node
+        (applied at all flood events), then recalculates all damages and benefits
+
+        Args:
+            samples (int, optional): Number of samples. Defaults to 1000
+            gl_sd (float, optional): Standard deviation of ground level errors (m). Defaults to 0.1
+            depth_sd (float, optional): Standard deviation of node depth errors (m). Defaults to 0.1
+            percentiles (List[float], optional): Percentiles to report. Defaults to [5, 50, 95]
+            workers (int, optional): Number of processes to spread samples over. Defaults to 1
+            seed (int, optional): Seed of random errors. Defaults to None (unseeded)
+
+        Returns:
+            List[List[List[float]]]: Each percentile of each value of get_major_datapoints
+        """
+        self.update_results()
+        totals = monte_carlo.run_samples(
+            self.get_uncertainty_inputs(gl_sd, depth_sd), samples, workers, seed)
+
+        # Totals derived from other totals are calculated for all samples at once by the usual methods
+        sample = copy.copy(self)
+        sample.__dict__.update(totals)
+        sample.get_disruption_damages()
+        sample.get_infrastructure_damages()
+        sample.get_emergency_services_damages()
+        sample.get_total_damages()
+        sample.get_disruption_benefits()
+        sample.get_infrastructure_benefits()
+        sample.get_emergency_services_benefits()
+        sample.get_total_benefits()
+
+        datapoints = np.array([[np.broadcast_to(value, (samples,)) for value in row]
+                               for row in sample.get_major_datapoints()], dtype=float)
+        return np.moveaxis(np.percentile(datapoints, percentiles, axis=-1), 0, -1).tolist()
+
+    def get_event_type_matrix(self) -> List[List[Any]]:
+        """ Calculate residential, non-residential, vehicular and evacuation damages for every event type
+        and cellar variant in one pass
+        Depths and node assignments of the last calculation are shared by every scenario, and each depth's
+        curve segment is found once for all event types
+
+        Returns:
+            List[List[Any]]: One row per event type and cellar variant holding the event type, cellar variant,
+            then annual and lifetime damages of each damage type
+        """
+        event_types = list(utils.res_damage_curves)
+        res_depths = self.get_event_matrix(self.res_depths)
+        non_res_depths = self.get_event_matrix(self.non_res_depths)
+        floor_areas = np.array(self.clean_non_res_fa, dtype=float)
+
+        # Residential damages with one leading entry per event type
+        res_damages = utils.interpolate_curve_sets(
+            [utils.get_res_damage_curves(event_type) for event_type in event_types], self.clean_res_m, res_depths)
+        capped_res_depths = np.broadcast_to(res_depths, res_damages.shape).copy()
+        if self.caps_enabled:
+            res_average = utils.apply_damage_cap(
+                self.return_periods, capped_res_depths, res_damages, self.res_cap, self.df)
+        else:
+            res_average = utils.get_average_annual_matrix(self.return_periods, res_damages)
+
+        # Vehicle and evacuation damages use capped depths of each event type
+        weightings = np.array([utils.get_vehicle_weighting(event_type) for event_type in event_types])
+        vehicle_average = utils.get_average_annual_matrix(self.return_periods, utils.get_vehicle_damages_matrix(
+            capped_res_depths, weightings[:, None, None]))
+        evac_average = utils.get_average_annual_matrix(
+            self.return_periods, utils.get_evac_cost_curves(self.evac_cost_category).interpolate(
+                self.clean_res_m, capped_res_depths))
+
+        # Non-residential damages of each distinct curve set, several event types share warning curves
+        codes = list(utils.non_res_damage_curves)
+        non_res_damages = utils.interpolate_curve_sets(
+            list(utils.non_res_damage_curves.values()), self.clean_non_res_m, non_res_depths) * floor_areas[:, None]
+        if self.caps_enabled:
+            non_res_average = utils.apply_damage_cap(
+                self.return_periods, np.broadcast_to(non_res_depths, non_res_damages.shape).copy(),
+                non_res_damages, self.non_res_cap, self.df)
+        else:
+            non_res_average = utils.get_average_annual_matrix(self.return_periods, non_res_damages)
+        non_res_average = non_res_average.sum(axis=-1)
+
+        matrix = []
+        for cellar in [False, True]:
+            for i, event_type in enumerate(event_types):
+                non_res = non_res_average[codes.index(
+                    utils.non_res_event_codes[event_type] + ("c" if cellar else "nc"))]
+                row = [event_type, cellar]
+                for average in [res_average[i].sum(), non_res, vehicle_average[i].sum(), evac_average[i].sum()]:
+                    row += [float(average), float(average * self.df)]
+                matrix.append(row)
+
+        return matrix
+
     """
     RESULTS EXPORTING
     """
@@ -1224,6 +1817,8 @@ class DetailedDataHandler(DataHandler):
 
         # Write summary
         self.write_summary(fname, file_formats)
+        self.write_sop_sweep(fname, file_formats)
+        self.write_event_type_matrix(fname, file_formats)
 
         damages_funcs = [
             self.write_res_damages,
@@ -1314,6 +1909,70 @@ class DetailedDataHandler(DataHandler):
             utils.list_to_xlsx(dataset, os.path.join(
                 fname, "XLSXs/Results Summary.xlsx"))
 
+    def write_sop_sweep(self, fname: str, file_formats: List[bool]) -> None:
+        """ Write table of benefits for schemes of each return period and extra SOP
+
+        Args:
+            fname (str): Location of results folders
+            file_formats (List[bool]): File formats for results to be written in
+        """
+        # Table headings
+        damage_types = [
+            "Residential",
+            "Intangible",
+            "Mental Health",
+            "Vehicular",
+            "Evacuation",
+            "Non-Residential",
+            "Business Disruption",
+            "Infrastructure",
+            "Emergeny Services and Recovery",
+            "Total"
+        ]
+        dataset = [["SOP (years)"]]
+        for damage_type in damage_types:
+            dataset[0] += [f"{damage_type} Annual Benefits (£)", f"{damage_type} Lifetime Benefits (£)"]
+
+        # Main data
+        dataset += self.get_sop_sweep()
+
+        if file_formats[0]:
+            # Write .csv
+            utils.list_to_csv(dataset, os.path.join(
+                fname, "CSVs/Benefits By SOP.csv"))
+
+        if file_formats[1]:
+            # Write .xlsx
+            utils.list_to_xlsx(dataset, os.path.join(
+                fname, "XLSXs/Benefits By SOP.xlsx"))
+
+    def write_event_type_matrix(self, fname: str, file_formats: List[bool]) -> None:
+        """ Write table of damages for every event type and cellar variant
+
+        Args:
+            fname (str): Location of results folders
+            file_formats (List[bool]): File formats for results to be written in
+        """
+        # Table headings
+        damage_types = ["Residential", "Non-Residential", "Vehicular", "Evacuation"]
+        dataset = [["Event Type", "Non-Residential Cellars"]]
+        for damage_type in damage_types:
+            dataset[0] += [f"{damage_type} Annual Damages (£)", f"{damage_type} Lifetime Damages (£)"]
+
+        # Main data
+        for row in self.get_event_type_matrix():
+            dataset.append([row[0], "Enabled" if row[1] else "Disabled"] + row[2:])
+
+        if file_formats[0]:
+            # Write .csv
+            utils.list_to_csv(dataset, os.path.join(
+                fname, "CSVs/Damages By Event Type.csv"))
+
+        if file_formats[1]:
+            # Write .xlsx
+            utils.list_to_xlsx(dataset, os.path.join(
+                fname, "XLSXs/Damages By Event Type.xlsx"))
+
     def write_res_damages(self, fname: str, file_formats: List[bool]) -> None:
         """ Write files containing breakdown of residential damages
 
@@ -1338,7 +1997,7 @@ class DetailedDataHandler(DataHandler):
                 # Add cap-related data if required
                 row += [self.capped_average_annual_damage_per_res[i],
                         self.capped_lifetime_damage_per_res[i]]
-            row += self.res_damages[i]
+            row += list(self.res_damages[i])
 
             dataset.append(row)
 
@@ -1389,7 +2048,7 @@ class DetailedDataHandler(DataHandler):
         for i in range(self.clean_res_count):
             row = [self.clean_res_a[i], self.average_annual_mh_costs[i],
                    self.lifetime_mh_costs[i]]
-            row += self.mh_costs[i]
+            row += list(self.mh_costs[i])
 
             dataset.append(row)
 
@@ -1417,7 +2076,7 @@ class DetailedDataHandler(DataHandler):
         for i in range(self.clean_res_count):
             row = [self.clean_res_a[i], self.average_annual_vehicular_damages[i],
                    self.lifetime_vehicular_damages[i]]
-            row += self.vehicular_damages[i]
+            row += list(self.vehicular_damages[i])
 
             dataset.append(row)
 
@@ -1445,7 +2104,7 @@ class DetailedDataHandler(DataHandler):
         for i in range(self.clean_res_count):
             row = [self.clean_res_a[i], self.average_annual_evac_costs[i],
                    self.lifetime_evac_costs[i]]
-            row += self.evac_costs[i]
+            row += list(self.evac_costs[i])
 
             dataset.append(row)
 
@@ -1483,7 +2142,7 @@ class DetailedDataHandler(DataHandler):
                 # Add cap-related data if required
                 row += [self.capped_average_annual_damage_per_non_res[i],
                         self.capped_lifetime_damage_per_non_res[i]]
-            row += self.non_res_damages[i]
+            row += list(self.non_res_damages[i])
 
             dataset.append(row)
 
@@ -1509,7 +2168,7 @@ class DetailedDataHandler(DataHandler):
 
         # Main data
         for i in range(self.clean_res_count):
-            row = [self.clean_res_a[i]] + self.res_benefits[i]
+            row = [self.clean_res_a[i]] + list(self.res_benefits[i])
             dataset.append(row)
 
         # Totals
@@ -1570,7 +2229,7 @@ class DetailedDataHandler(DataHandler):
 
         # Main data
         for i in range(self.clean_res_count):
-            row = [self.clean_res_a[i]] + self.mh_benefits[i]
+            row = [self.clean_res_a[i]] + list(self.mh_benefits[i])
             dataset.append(row)
 
         # Totals
@@ -1599,7 +2258,7 @@ class DetailedDataHandler(DataHandler):
 
         # Main data
         for i in range(self.clean_res_count):
-            row = [self.clean_res_a[i]] + self.mh_benefits[i]
+            row = [self.clean_res_a[i]] + list(self.mh_benefits[i])
             dataset.append(row)
 
         # Totals
@@ -1628,7 +2287,7 @@ class DetailedDataHandler(DataHandler):
 
         # Main data
         for i in range(self.clean_res_count):
-            row = [self.clean_res_a[i]] + self.evac_benefits[i]
+            row = [self.clean_res_a[i]] + list(self.evac_benefits[i])
             dataset.append(row)
 
         # Totals
@@ -1657,7 +2316,7 @@ class DetailedDataHandler(DataHandler):
 
         # Main data
         for i in range(self.clean_non_res_count):
-            row = [self.clean_non_res_a[i]] + self.non_res_benefits[i]
+            row = [self.clean_non_res_a[i]] + list(self.non_res_benefits[i])
             dataset.append(row)
 
         # Totals
@@ -1686,4 +2345,38 @@ class DetailedDataHandler(DataHandler):
             fname (str): Filename of file to be written
         """
         with open(f"{fname}.Stix", "w") as f:
-            json.dump(self.__dict__, f, cls=utils.NumpyEncoder)
\ No newline at end of file
+            json.dump(self.__dict__, f, cls=utils.NumpyEncoder)
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        """ Restore appraisal from the contents of a .Stix file
+        Files saved before the columnar stores were introduced hold one list per field, these are
+        converted into stores
+
+        Args:
+            state (Dict[str, Any]): Handler attributes loaded from file
+        """
+        for store, (prefix, columns) in stores.items():
+            if store in state:
+                state[store] = ColumnStore.from_dict(columns, state[store])
+            else:
+                values = {name: state.pop(prefix + name, []) for name in columns}
+                state.pop(prefix + "count", None)
+                state[store] = ColumnStore(columns)
+                state[store].append(**values)
+
+        # Fields added since the file was saved keep their defaults
+        self.__init__()
+        self.__dict__.update(state)
+
+        # Rasters are memory-mapped from the raster cache where possible, older files have no cache keys
+        self.apply_raster_cache_settings()
+        if len(self.raster_keys) != len(self.raster_points):
+            self.raster_keys = [None] * len(self.raster_points)
+        self.raster_points = [load_raster(key, points) for key, points in zip(self.raster_keys, self.raster_points)]
+
+        # Return periods are saved as text keys
+        self.flood_grids = {int(rp): paths for rp, paths in self.flood_grids.items()}
+
+        # Compact results are saved as lists, so are recalculated in full to restore float32 arrays
+        if self.compact_results:
+            self.results_state = None
@@ -164,7 +164,8 @@ required information by hand. \n\n- All information can be edited after \
 upload by selecting the Edit buttons under the Residential and \
 Non-Residential tabs. \n\n- Select the Upload Dataset button in the Upload \
 ASCII Grids box and select ASCII grid(s) covering the catchment. Stix \
-supports the upload of .asc files. \n\n- Uploaded grids can now be viewed \
+supports the upload of .asc files, and gzip or bz2 compressed .asc.gz \
+and .asc.bz2 files. \n\n- Uploaded grids can now be viewed \
 under the ASCII Grids tab. \n\n- You can upload datasets as many times as \
 needed. \n\n- Select the Upload Dataset button in the Upload Flood Event \
 Shapefiles box. Stix supports the upload of .csv and .dbf files. \n\n- \
@@ -0,0 +1,182 @@
+"""
+Monte Carlo estimates of uncertainty in detailed appraisal results
+Ground levels and node depths are perturbed by random survey and model errors, then the damages and
+benefits of many samples are evaluated at once as arrays with a leading sample axis
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+import utils
+
+# Approximate number of values (samples x properties x flood events) in each array of a batch
+# Keeps peak memory of a batch to a few hundred MB however many properties are uploaded
+batch_values = 2 ** 21
+
+# Handler attributes holding the totals of each damage type, in the order
+# annual damage, lifetime damage, annual benefit, lifetime benefit, annual damage after, lifetime damage after
+result_names = {
+    "res": ["total_average_res_damage", "total_lifetime_res_damage",
+            "current_annual_res_benefit", "current_lifetime_res_benefit",
+            "annual_res_damage_after", "lifetime_res_damage_after"],
+    "intangible": ["total_average_intangible_damage", "total_lifetime_intangible_damage",
+                   "current_annual_intangible_benefit", "current_lifetime_intangible_benefit",
+                   "annual_intangible_damage_after", "lifetime_intangible_damage_after"],
+    "mh": ["total_average_mh_costs", "total_lifetime_mh_costs",
+           "current_annual_mh_benefit", "current_lifetime_mh_benefit",
+           "annual_mh_damage_after", "lifetime_mh_damage_after"],
+    "vehicle": ["total_average_vehicular_damages", "total_lifetime_vehicular_damages",
+                "current_annual_vehicle_benefit", "current_lifetime_vehicle_benefit",
+                "annual_vehicle_damage_after", "lifetime_vehicle_damage_after"],
+    "evac": ["total_average_evac_costs", "total_lifetime_evac_costs",
+             "current_annual_evac_benefit", "current_lifetime_evac_benefit",
+             "annual_evac_damage_after", "lifetime_evac_damage_after"],
+    "non_res": ["total_average_non_res_damage", "total_lifetime_non_res_damage",
+                "current_annual_non_res_benefit", "current_lifetime_non_res_benefit",
+                "annual_non_res_damage_after", "lifetime_non_res_damage_after"]
+}
+
+
+def get_capped_damages(inputs: Dict[str, Any], depths: np.ndarray, damages: np.ndarray, cap: float, sop_index: int) -> Tuple[np.ndarray, np.ndarray]:
+    """ Apply damage cap to direct damages of every sample and property
+
+    Args:
+        inputs (Dict[str, Any]): Appraisal inputs from DetailedDataHandler.get_uncertainty_inputs
+        depths (np.ndarray): Depths with shape samples x properties x flood events, capped in place
+        damages (np.ndarray): Damages with the same shape as depths
+        cap (float): Lifetime damage cap of each property
+        sop_index (int): Index of SOP in benefits of each flood event, None if there is no current benefit
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Total average annual damages and total current benefit of each sample
+    """
+    return_periods, df = inputs["return_periods"], inputs["df"]
+
+    # Only the cumulative weights up to the SOP are needed for the current benefit
+    benefits = np.zeros(damages.shape[:-1])
+    if sop_index is not None:
+        benefits = damages @ utils.get_trapezium_operator(return_periods).cumulative_weights[:, sop_index]
+
+    if inputs["caps_enabled"]:
+        average_annual_damages = utils.apply_damage_cap(return_periods, depths, damages, cap, df)
+        benefits = np.minimum(average_annual_damages, benefits)
+    else:
+        average_annual_damages = utils.get_average_annual_matrix(return_periods, damages)
+
+    return average_annual_damages.sum(axis=-1), benefits.sum(axis=-1)
+
+
+def get_sample_totals(inputs: Dict[str, Any], samples: int, seed: np.random.SeedSequence) -> Dict[str, np.ndarray]:
+    """ Evaluate damage and benefit totals for a batch of samples at once
+    Each sample adds one error to every node's depths (at all flood events) and one to every ground level
+
+    Args:
+        inputs (Dict[str, Any]): Appraisal inputs from DetailedDataHandler.get_uncertainty_inputs
+        samples (int): Number of samples in batch
+        seed (np.random.SeedSequence): Seed of batch's random errors
+
+    Returns:
+        Dict[str, np.ndarray]: Value of each attribute in result_names for every sample
+    """
+    rng = np.random.default_rng(seed)
+    return_periods, df, health_df = inputs["return_periods"], inputs["df"], inputs["health_df"]
+    node_errors = rng.normal(0, inputs["depth_sd"], (samples, inputs["node_count"]))
+
+    # Depths at each property during each flood event
+    res_errors = node_errors[:, inputs["res_node_indexes"]] - rng.normal(
+        0, inputs["gl_sd"], (samples, len(inputs["res_mcms"])))
+    res_depths = inputs["res_depths"] + res_errors[..., None]
+    non_res_errors = node_errors[:, inputs["non_res_node_indexes"]] - rng.normal(
+        0, inputs["gl_sd"], (samples, len(inputs["non_res_mcms"])))
+    non_res_depths = inputs["non_res_depths"] + non_res_errors[..., None]
+
+    # Current benefit is only found when SOP matches a return period
+    sop_index = return_periods[1:].index(inputs["sop"]) if inputs["sop"] in return_periods[1:] else None
+
+    # Direct damages
+    res_curves = utils.get_res_damage_curves(inputs["event_type"])
+    res_damages = res_curves.interpolate(inputs["res_mcms"], res_depths)
+    res_average, res_benefit = get_capped_damages(
+        inputs, res_depths, res_damages, inputs["res_cap"], sop_index)
+
+    non_res_curves = utils.get_non_res_damage_curves(inputs["event_type"], inputs["cellar"])
+    non_res_damages = non_res_curves.interpolate(inputs["non_res_mcms"], non_res_depths) * \
+        inputs["non_res_floor_areas"][:, None]
+    non_res_average, non_res_benefit = get_capped_damages(
+        inputs, non_res_depths, non_res_damages, inputs["non_res_cap"], sop_index)
+
+    # Other residential damages are found together from capped depths
+    current_sops, event_damages = utils.get_res_event_damages(
+        return_periods, res_depths, inputs["res_mcms"], inputs["event_type"], inputs["evac_cost_category"])
+    intangible_average = utils.get_intangible_damages(current_sops).sum(axis=-1)
+    intangible_benefit = utils.get_intangible_benefits(current_sops, 100/inputs["sop"]).sum(axis=-1)
+
+    # They are uncapped so are summed over properties before the trapezium rule
+    event_damages = dict(zip(["mh", "vehicle", "evac"], event_damages.sum(axis=-2)))
+
+    def current_benefit(benefits: np.ndarray) -> np.ndarray:
+        return benefits[..., sop_index] if sop_index is not None else np.zeros(samples)
+
+    annual = {
+        "res": (res_average, res_benefit),
+        "intangible": (intangible_average, intangible_benefit),
+        "non_res": (non_res_average, non_res_benefit)
+    }
+    for name, damages in event_damages.items():
+        annual[name] = (utils.get_average_annual_matrix(return_periods, damages),
+                        current_benefit(utils.get_benefits_matrix(return_periods, damages)))
+
+    # Intangible and mental health damages use the health discount factor
+    totals = {}
+    for name, (average, benefit) in annual.items():
+        discount = health_df if name in ["intangible", "mh"] else df
+        totals.update(zip(result_names[name], [
+            average, average * discount, benefit, benefit * discount,
+            average - benefit, (average - benefit) * discount]))
+
+    return totals
+
+
+def get_batch_totals(inputs: Dict[str, Any], batches: List[int], seeds: List[np.random.SeedSequence]) -> Dict[str, np.ndarray]:
+    """ Evaluate several batches of samples in turn, joining their totals
+    """
+    batch_totals = [get_sample_totals(inputs, samples, seed) for samples, seed in zip(batches, seeds)]
+    return {name: np.concatenate([totals[name] for totals in batch_totals]) for name in batch_totals[0]}
+
+
+def run_samples(inputs: Dict[str, Any], samples: int, workers: int = 1, seed: int = None) -> Dict[str, np.ndarray]:
+    """ Evaluate damage and benefit totals of many samples
+    Samples are split into batches of bounded memory, and batches are split between worker processes
+    Results only depend on seed, not on the number of workers
+
+    Args:
+        inputs (Dict[str, Any]): Appraisal inputs from DetailedDataHandler.get_uncertainty_inputs
+        samples (int): Number of samples
+        workers (int, optional): Number of processes to spread batches over. Defaults to 1 (run in this process)
+        seed (int, optional): Seed of random errors. Defaults to None (unseeded)
+
+    Returns:
+        Dict[str, np.ndarray]: Value of each attribute in result_names for every sample
+    """
+    values_per_sample = (len(inputs["res_mcms"]) + len(inputs["non_res_mcms"])) * len(inputs["return_periods"])
+    batch_size = int(np.clip(batch_values // max(values_per_sample, 1), 1, samples))
+    batches = [batch_size] * (samples // batch_size) + ([samples % batch_size] if samples % batch_size else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(batches))
+
+    workers = min(workers, len(batches))
+    if workers <= 1:
+        return get_batch_totals(inputs, batches, seeds)
+
+    # Contiguous runs of batches so inputs are only sent once to each process
+    # Processes are spawned rather than forked, forking a process running Qt threads can deadlock
+    splits = np.array_split(np.arange(len(batches)), workers)
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        worker_totals = list(pool.map(
+            get_batch_totals, [inputs] * workers,
+            [[batches[i] for i in split] for split in splits],
+            [[seeds[i] for i in split] for split in splits]))
+
+    return {name: np.concatenate([totals[name] for totals in worker_totals]) for name in worker_totals[0]}
@@ -209,4 +209,7 @@ def main() -> None:
 
 
 if __name__ == "__main__":
+    # Required for worker processes (e.g. Monte Carlo samples) in frozen builds
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
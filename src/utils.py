@@ -2,7 +2,7 @@
 import csv
 import json
 import math
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Tuple, Union
 import xlsxwriter
 
 import os
@@ -13,6 +13,8 @@ from PyQt5.QtWidgets import (QFileDialog, QHBoxLayout, QItemDelegate, QLineEdit,
                              QStyledItemDelegate, QWidget)
 
 import const
+from ascii_grid import CachedRaster, LazyRaster
+from column_store import ColumnStore
 
 """
 LAYOUTS
@@ -179,6 +181,23 @@ def is_valid_ascii(ascii_details: List) -> bool:
         return False
 
 
+def nan_to_none(value: Any) -> Any:
+    """ Convert missing (NaN) values back to None for display
+    Values such as unsampled ground levels are stored as NaN in typed arrays
+
+    Args:
+        value (Any): Stored value
+
+    Returns:
+        Any: None if value is NaN, value otherwise
+    """
+    try:
+        return None if math.isnan(value) else value
+
+    except TypeError:
+        return value
+
+
 def get_resource_path(fname: str) -> str:
     """
     Translate asset paths to useable format for pyinstaller
@@ -225,433 +244,732 @@ DAMAGES
 """
 
 
-def get_discount_factor(year: int) -> float:
+class DiscountSchedule():
     """
-    Calculates df for a given year, potentially need to clean up some of the maths
+    Discount factors for every year of a scheme lifetime, precomputed once
+    Each rate applies from its step year until the next, e.g. rates [0.035, 0.03] with step years [30]
+    discounts years 0-29 at 3.5% and later years at 3%
     """
-    if year < 30:
-        return ((1/1.035)**year)
+    def __init__(self, rates: List[float], step_years: List[int], max_year: int = 100) -> None:
+        self.rates = list(rates)
+        self.step_years = list(step_years)
+        self.max_year = max_year
 
-    if year < 75:
-        return ((1/1.035)**30) * ((1/1.03)**(year-30))
+        # Years in each rate band before every year, then closed form of the geometric series
+        years = np.arange(max_year + 1)
+        starts = np.array([0] + self.step_years)
+        ends = np.array(self.step_years + [max_year])
+        band_years = np.clip(years[:, None] - starts, 0, ends - starts)
+        self.factors = np.prod((1 / (1 + np.array(self.rates))) ** band_years, axis=1)
+        self.cumulative_factors = np.cumsum(self.factors)
 
-    if year <= 100:
-        return ((1/1.035)**30) * ((1/1.03)**45) * ((1/1.025)**(year-75))
+    def lookup(self, table: np.ndarray, years: Union[int, np.ndarray]) -> Union[float, np.ndarray]:
+        """
+        Index table by year, checking years are covered by the schedule
+        """
+        if isinstance(years, (int, np.integer)):
+            in_range = 0 <= years <= self.max_year
+        else:
+            years = np.asarray(years)
+            in_range = years.size == 0 or (years.min() >= 0 and years.max() <= self.max_year)
 
+        if not in_range:
+            raise ValueError(f"Discount factors are only available for years 0 to {self.max_year}")
 
-def get_cumulative_discount_factor(year: int) -> float:
-    """
-    Sum of all dfs from 0 to year
-    """
-    return sum([get_discount_factor(y) for y in range(year+1)])
-
+        return table[years]
 
-def get_health_discount_factor(year: int) -> float:
-    """
-    Calculate "risk to health and life" discount factor for a given year
-    """
-    if year < 30:
-        return ((1/1.015)**year)
+    def factor(self, years: Union[int, np.ndarray]) -> Union[float, np.ndarray]:
+        """
+        Discount factor of a given year (or array of years)
+        """
+        return self.lookup(self.factors, years)
 
-    if year < 75:
-        return ((1/1.015)**30) * ((1/1.01286)**(year-30))
+    def cumulative_factor(self, years: Union[int, np.ndarray]) -> Union[float, np.ndarray]:
+        """
+        Sum of all discount factors from 0 to year (or each of an array of years)
+        """
+        return self.lookup(self.cumulative_factors, years)
 
-    if year <= 100:
-        return ((1/1.015)**30) * ((1/1.01286)**45) * ((1/1.01071)**(year-75))
 
+# Treasury discount rates
+discount_schedule = DiscountSchedule([0.035, 0.03, 0.025], [30, 75])
 
-def get_cumulative_health_discount_factor(year: int) -> float:
-    """
-    Sum all dfs from 0 to year
-    """
-    return sum([get_health_discount_factor(y) for y in range(year+1)])
+# "Risk to health and life" discount rates
+health_discount_schedule = DiscountSchedule([0.015, 0.01286, 0.01071], [30, 75])
 
 
-def apply_checks(checks: List[bool], datapoints: List) -> List:
+def get_discount_factor(year: int) -> float:
     """
-    Filter items in datapoints based on the state of the corresponsing check
-    Used to remove datapoints of unselected properties and nodes
+    Calculates df for a given year
     """
-    return [datapoints[i] for i in range(len(checks)) if checks[i]]
+    return discount_schedule.factor(year)
 
 
-def get_res_event_damages(event_type: str) -> Dict[int, List]:
+def get_cumulative_discount_factor(year: int) -> float:
     """
-    Return direct damages (from const.py)
+    Sum of all dfs from 0 to year
     """
-    dd = {
-        "Short Duration Major Flood Storm No Warning": const.short_duration_no_warning,
-        "Short Duration Major Flood Storm <8hr Warning": const.short_duration_less_warning,
-        "Short Duration Major Flood Storm >8hr Warning": const.short_duration_more_warning,
-        "Long Duration Major Flood Storm No Warning": const.long_duration_no_warning,
-        "Long Duration Major Flood Storm <8hr Warning": const.long_duration_less_warning,
-        "Long Duration Major Flood Storm >8hr Warning": const.long_duration_more_warning,
-        "Extra-Long Duration Major Flood Storm No Warning": const.extra_long_duration_no_warning,
-        "Extra-Long Duration Major Flood Storm <8hr Warning": const.extra_long_duration_less_warning,
-        "Extra-Long Duration Major Flood Storm >8hr Warning": const.extra_long_duration_more_warning
-    }
+    return discount_schedule.cumulative_factor(year)
 
-    return dd[event_type]
 
-
-def get_non_res_event_damages(event_type: str, cellar: bool) -> Dict[int, List[float]]:
+def get_health_discount_factor(year: int) -> float:
     """
-    Find direct damage dict based on general flood information
+    Calculate "risk to health and life" discount factor for a given year
     """
-    durations = {
-        "Short Duration Major Flood Storm No Warning": "sn",
-        "Short Duration Major Flood Storm <8hr Warning": "sw",
-        "Short Duration Major Flood Storm >8hr Warning": "sw",
-        "Long Duration Major Flood Storm No Warning": "ln",
-        "Long Duration Major Flood Storm <8hr Warning": "lw",
-        "Long Duration Major Flood Storm >8hr Warning": "lw",
-        "Extra-Long Duration Major Flood Storm No Warning": "en",
-        "Extra-Long Duration Major Flood Storm <8hr Warning": "ew",
-        "Extra-Long Duration Major Flood Storm >8hr Warning": "ew"
-    }
+    return health_discount_schedule.factor(year)
 
-    event_code = durations[event_type]
-    event_code += "c" if cellar else "nc"
 
-    direct_damages = {
-        "snc": const.short_duration_no_warning_cellar,
-        "snnc": const.short_duration_no_warning_no_cellar,
-        "swc": const.short_duration_warning_cellar,
-        "swnc": const.short_duration_warning_no_cellar,
-        "lnc": const.long_duration_no_warning_cellar,
-        "lnnc": const.long_duration_no_warning_no_cellar,
-        "lwc": const.long_duration_warning_cellar,
-        "lwnc": const.long_duration_warning_no_cellar,
-        "enc": const.extra_long_duration_no_warning_cellar,
-        "ennc": const.extra_long_duration_no_warning_no_cellar,
-        "ewc": const.extra_long_duration_warning_cellar,
-        "ewnc": const.extra_long_duration_warning_no_cellar
-    }
-
-    return direct_damages[event_code]
-
-
-def get_nearest_node(property_e: float, property_n: float, nodes: zip) -> int:
+def get_cumulative_health_discount_factor(year: int) -> float:
     """
-    Returns index of nearest node to a given property
+    Sum all dfs from 0 to year
     """
-    node_lst = list(nodes)
-    min_distance = math.sqrt(
-        (property_e - node_lst[0][0])**2 + (property_n - node_lst[0][1])**2)
-    min_index = 0
-
-    for i in range(1, len(node_lst)):
-        distance = math.sqrt(
-            (property_e - node_lst[i][0])**2 + (property_n - node_lst[i][1])**2)
-        if distance < min_distance:
-            min_distance = distance
-            min_index = i
+    return health_discount_schedule.cumulative_factor(year)
 
-    return min_index
 
-
-def interpolate_res_damages(direct_damages: List[float], depths: List[float]) -> List[float]:
+def apply_checks(checks: List[bool], datapoints: List) -> List:
     """
-    Interpolate damages based on depths
+    Filter items in datapoints based on the state of the corresponsing check
+    Used to remove datapoints of unselected properties and nodes
+    Columns stored as arrays are filtered with a boolean mask
     """
-    measured_depths = const.residential_depths
-    damages = []
+    if isinstance(datapoints, np.ndarray):
+        return datapoints[:len(checks)][np.asarray(checks, dtype=bool)]
+    return [datapoints[i] for i in range(len(checks)) if checks[i]]
 
-    for depth in depths:
-        # Depth less than -.3, no damages
-        if depth < -0.3:
-            damages.append(0)
 
-        # Depth greater than 3, max damage
-        elif depth >= 3:
-            damages.append(direct_damages[-1])
+class DamageCurves():
+    """
+    Depth-damage curves for a single flood scenario, one curve per MCM code
+    Curves are resampled onto evenly spaced depths (every measured depth lies on the grid so the
+    curves are unchanged) and stored as one flat array of segment intercepts and slopes,
+    so interpolation finds each depth's segment arithmetically rather than by binary search
+    Each curve is padded with a flat segment at either end for depths outside of measured values
+    """
+    def __init__(self, measured_depths: List[float], direct_damages: Dict[int, List[float]]) -> None:
+        measured_depths = np.array(measured_depths, dtype=float)
+        self.mcms = np.array(sorted(direct_damages))
+        measured_damages = np.array([direct_damages[mcm] for mcm in self.mcms], dtype=float)
+
+        # Grid spacing is the smallest gap between measured depths
+        self.min_depth = measured_depths[0]
+        self.step = np.diff(measured_depths).min()
+        points = int(round((measured_depths[-1] - self.min_depth) / self.step)) + 1
+        self.depths = self.min_depth + self.step * np.arange(points)
+        if not np.allclose(np.interp(measured_depths, self.depths, self.depths), measured_depths, rtol=0, atol=1e-9):
+            raise ValueError("Measured depths must lie on an evenly spaced grid")
+
+        self.damages = np.array([np.interp(self.depths, measured_depths, row) for row in measured_damages])
+
+        # Damage along each segment is intercept + depth * slope
+        # Depths below the first measured depth cause no damage, depths above the last cause max damage
+        slopes = np.diff(self.damages, axis=1) / self.step
+        intercepts = self.damages[:, :-1] - self.depths[:-1] * slopes
+        zeros = np.zeros((len(self.mcms), 1))
+        self.slopes = np.hstack((zeros, slopes, zeros)).ravel()
+        self.intercepts = np.hstack((zeros, intercepts, self.damages[:, -1:])).ravel()
+        self.segments = points + 1
+
+    def get_rows(self, mcms: List[int]) -> np.ndarray:
+        """ Find curve of each MCM code
+
+        Args:
+            mcms (List[int]): MCM codes
+
+        Returns:
+            np.ndarray: Row of self.damages holding each code's curve
+        """
+        return np.searchsorted(self.mcms, np.asarray(mcms, dtype=int))
+
+    def get_segments(self, mcms: List[int], depths: np.ndarray) -> np.ndarray:
+        """ Find segment of curve containing each depth, as an index into the flat segment arrays
+        Segments only depend on the depth grid and MCM codes so are shared by curves with the same layout
+
+        Args:
+            mcms (List[int]): MCM code of each property
+            depths (np.ndarray): Depths, last axis holds flood events and the one before it properties.
+                Any further leading axes (e.g. Monte Carlo samples) are broadcast
+
+        Returns:
+            np.ndarray: Segment indexes, same shape as depths
+        """
+        # fmax sends NaN depths to the first (flat) segment, where they still give NaN damages
+        positions = (np.asarray(depths, dtype=float) - self.min_depth) / self.step + 1
+        segments = np.fmin(np.fmax(positions, 0), self.segments - 1).astype(np.intp)
+        segments += self.get_rows(mcms)[:, None] * self.segments
+        return segments
+
+    def evaluate(self, segments: np.ndarray, depths: np.ndarray) -> np.ndarray:
+        """ Find damages at depths lying in given segments (found by get_segments)
+        """
+        return self.intercepts.take(segments) + np.asarray(depths, dtype=float) * self.slopes.take(segments)
+
+    def interpolate(self, mcms: List[int], depths: np.ndarray) -> np.ndarray:
+        """ Interpolate damages for many properties and flood events at once
+        Depths below the first measured depth cause no damage, depths above the last cause max damage
+
+        Args:
+            mcms (List[int]): MCM code of each property
+            depths (np.ndarray): Depths, last axis holds flood events and the one before it properties.
+                Any further leading axes (e.g. Monte Carlo samples) are broadcast
+
+        Returns:
+            np.ndarray: Damages, same shape as depths
+        """
+        return self.evaluate(self.get_segments(mcms, depths), depths)
+
+
+def interpolate_curve_sets(curve_sets: List[DamageCurves], mcms: List[int], depths: np.ndarray) -> np.ndarray:
+    """ Interpolate damages from several sets of curves at once, e.g. the curves of every event type
+    Each depth's segment is found once and used to look up every set
 
-        else:
-            i = 0
-            while depth >= measured_depths[i]:
-                i += 1
+    Args:
+        curve_sets (List[DamageCurves]): Curves sharing the same depth grid and MCM codes
+        mcms (List[int]): MCM code of each property
+        depths (np.ndarray): Depths, last axis holds flood events and the one before it properties
 
-            # Find damage bounds
-            total_damage_diff = direct_damages[i] - direct_damages[i-1]
+    Raises:
+        ValueError: If curve sets have different depth grids or MCM codes
 
-            # Find depth bounds and interpolate
-            actual_depth_diff = depth - measured_depths[i-1]
-            total_depth_diff = measured_depths[i] - measured_depths[i-1]
-            depth_diff_pct = actual_depth_diff / total_depth_diff
+    Returns:
+        np.ndarray: Damages with one leading entry per curve set
+    """
+    first = curve_sets[0]
+    for curves in curve_sets[1:]:
+        if not (np.array_equal(curves.depths, first.depths) and np.array_equal(curves.mcms, first.mcms)):
+            raise ValueError("Curve sets must share depth grid and MCM codes")
+
+    segments = first.get_segments(mcms, depths)
+    return np.stack([curves.evaluate(segments, depths) for curves in curve_sets])
+
+
+# Residential curves for each event type
+res_damage_curves = {
+    "Short Duration Major Flood Storm No Warning": DamageCurves(const.residential_depths, const.short_duration_no_warning),
+    "Short Duration Major Flood Storm <8hr Warning": DamageCurves(const.residential_depths, const.short_duration_less_warning),
+    "Short Duration Major Flood Storm >8hr Warning": DamageCurves(const.residential_depths, const.short_duration_more_warning),
+    "Long Duration Major Flood Storm No Warning": DamageCurves(const.residential_depths, const.long_duration_no_warning),
+    "Long Duration Major Flood Storm <8hr Warning": DamageCurves(const.residential_depths, const.long_duration_less_warning),
+    "Long Duration Major Flood Storm >8hr Warning": DamageCurves(const.residential_depths, const.long_duration_more_warning),
+    "Extra-Long Duration Major Flood Storm No Warning": DamageCurves(const.residential_depths, const.extra_long_duration_no_warning),
+    "Extra-Long Duration Major Flood Storm <8hr Warning": DamageCurves(const.residential_depths, const.extra_long_duration_less_warning),
+    "Extra-Long Duration Major Flood Storm >8hr Warning": DamageCurves(const.residential_depths, const.extra_long_duration_more_warning)
+}
+
+# Non-residential curves only distinguish between warning and no warning
+non_res_event_codes = {
+    "Short Duration Major Flood Storm No Warning": "sn",
+    "Short Duration Major Flood Storm <8hr Warning": "sw",
+    "Short Duration Major Flood Storm >8hr Warning": "sw",
+    "Long Duration Major Flood Storm No Warning": "ln",
+    "Long Duration Major Flood Storm <8hr Warning": "lw",
+    "Long Duration Major Flood Storm >8hr Warning": "lw",
+    "Extra-Long Duration Major Flood Storm No Warning": "en",
+    "Extra-Long Duration Major Flood Storm <8hr Warning": "ew",
+    "Extra-Long Duration Major Flood Storm >8hr Warning": "ew"
+}
+
+non_res_damage_curves = {
+    "snc": DamageCurves(const.non_residential_depths, const.short_duration_no_warning_cellar),
+    "snnc": DamageCurves(const.non_residential_depths, const.short_duration_no_warning_no_cellar),
+    "swc": DamageCurves(const.non_residential_depths, const.short_duration_warning_cellar),
+    "swnc": DamageCurves(const.non_residential_depths, const.short_duration_warning_no_cellar),
+    "lnc": DamageCurves(const.non_residential_depths, const.long_duration_no_warning_cellar),
+    "lnnc": DamageCurves(const.non_residential_depths, const.long_duration_no_warning_no_cellar),
+    "lwc": DamageCurves(const.non_residential_depths, const.long_duration_warning_cellar),
+    "lwnc": DamageCurves(const.non_residential_depths, const.long_duration_warning_no_cellar),
+    "enc": DamageCurves(const.non_residential_depths, const.extra_long_duration_no_warning_cellar),
+    "ennc": DamageCurves(const.non_residential_depths, const.extra_long_duration_no_warning_no_cellar),
+    "ewc": DamageCurves(const.non_residential_depths, const.extra_long_duration_warning_cellar),
+    "ewnc": DamageCurves(const.non_residential_depths, const.extra_long_duration_warning_no_cellar)
+}
+
+# Evacuation cost curves for each cost category
+evac_cost_curves = {
+    "Low": DamageCurves(const.evacuation_depths, const.low_evacuation),
+    "Mid": DamageCurves(const.evacuation_depths, const.mid_evacuation),
+    "High": DamageCurves(const.evacuation_depths, const.high_evacuation)
+}
+
+
+def get_res_damage_curves(event_type: str) -> DamageCurves:
+    """
+    Return residential depth-damage curves for event type
+    """
+    return res_damage_curves[event_type]
+
+
+def get_non_res_damage_curves(event_type: str, cellar: bool) -> DamageCurves:
+    """
+    Return non-residential depth-damage curves (per m² of floor area) based on general flood information
+    """
+    event_code = non_res_event_codes[event_type]
+    event_code += "c" if cellar else "nc"
 
-            damages.append(direct_damages[i-1] +
-                           (depth_diff_pct * total_damage_diff))
+    return non_res_damage_curves[event_code]
+
+
+class NodeIndex():
+    """
+    k-d tree over node locations, used to find the nearest node to many properties at once
+    Boxes of nodes are split at their median node until each leaf holds at most leaf_size nodes, so leaves follow
+    the local density of nodes and outlying nodes don't enlarge the leaves of clustered nodes
+    Ties are broken in favour of the node with the lowest index
+    """
+    def __init__(self, eastings: List[float], northings: List[float], leaf_size: int = 16,
+                 max_pairs: int = 2 ** 16) -> None:
+        """
+        Args:
+            eastings (List[float]): Node eastings
+            northings (List[float]): Node northings
+            leaf_size (int, optional): Most nodes held by a leaf. Defaults to 16
+            max_pairs (int, optional): Most points, or pairs of points and tree nodes, searched at once. Bounds
+                memory used by queries to about max_pairs * leaf_size candidates. Defaults to 2 ** 16
+        """
+        self.eastings = np.asarray(eastings, dtype=float)
+        self.northings = np.asarray(northings, dtype=float)
+        self.max_pairs = max_pairs
+
+        # Nodes with missing locations are never nearest
+        nodes = np.flatnonzero(np.isfinite(self.eastings) & np.isfinite(self.northings))
+        self.node_count = len(nodes)
+
+        if self.node_count == 0:
+            return
+
+        # Tree is built a level at a time, splitting every tree node of a level at once
+        # Tree nodes hold the bounding box, lowest node index and range in sorted_nodes of their nodes
+        boxes, ranges, min_indexes, children, axes, splits = [], [], [], [], [], []
+        starts, stops = np.array([0]), np.array([self.node_count])
+        level_start = 0
+        while len(starts):
+            counts = stops - starts
+            offsets = np.cumsum(counts) - counts
+            positions = np.arange(counts.sum()) - np.repeat(offsets - starts, counts)
+            x, y = self.eastings[nodes[positions]], self.northings[nodes[positions]]
+            x_min, x_max = np.minimum.reduceat(x, offsets), np.maximum.reduceat(x, offsets)
+            y_min, y_max = np.minimum.reduceat(y, offsets), np.maximum.reduceat(y, offsets)
+
+            # Split wider side of each box at its median node
+            level_axes = (y_max - y_min > x_max - x_min).astype(int)
+            coords = np.where(np.repeat(level_axes, counts) == 0, x, y)
+            order = np.lexsort((coords, np.repeat(np.arange(len(counts)), counts)))
+            nodes[positions] = nodes[positions][order]
+            middles = starts + counts // 2
+
+            split = counts > leaf_size
+            level_children = np.full((len(counts), 2), -1)
+            level_children[split] = level_start + len(counts) + np.arange(2 * split.sum()).reshape(-1, 2)
+
+            boxes.append(np.column_stack([x_min, y_min, x_max, y_max]))
+            ranges.append(np.column_stack([starts, stops]))
+            min_indexes.append(np.minimum.reduceat(nodes[positions], offsets))
+            children.append(level_children)
+            axes.append(level_axes)
+            splits.append(coords[order][offsets + counts // 2])
+
+            level_start += len(counts)
+            starts, stops = (np.column_stack([starts[split], middles[split]]).ravel(),
+                             np.column_stack([middles[split], stops[split]]).ravel())
+
+        self.sorted_nodes = nodes
+        self.boxes = np.concatenate(boxes)
+        self.ranges = np.concatenate(ranges)
+        self.min_indexes = np.concatenate(min_indexes)
+        self.children = np.concatenate(children)
+        self.axes = np.concatenate(axes)
+        self.splits = np.concatenate(splits)
+
+    def query(self, eastings: List[float], northings: List[float]) -> np.ndarray:
+        """ Find the nearest node to each point
+        Points are searched in chunks of max_pairs, so memory doesn't grow with the number of points
+
+        Args:
+            eastings (List[float]): Point eastings
+            northings (List[float]): Point northings
+
+        Returns:
+            np.ndarray: Index of nearest node to each point
+        """
+        eastings = np.asarray(eastings, dtype=float)
+        northings = np.asarray(northings, dtype=float)
+        point_count = len(eastings)
+
+        best_distances = np.full(point_count, np.inf)
+        best_indexes = np.zeros(point_count, dtype=int)
+
+        if point_count == 0:
+            return best_indexes
+
+        if self.node_count == 0:
+            raise ValueError("No nodes with valid locations to search")
+
+        # Points with missing locations are assigned the first node
+        active = np.flatnonzero(np.isfinite(eastings) & np.isfinite(northings))
+        for start in range(0, len(active), self.max_pairs):
+            self.search(eastings, northings, active[start:start + self.max_pairs], best_distances, best_indexes)
+
+        return best_indexes
+
+    def search(self, eastings: np.ndarray, northings: np.ndarray, points: np.ndarray, best_distances: np.ndarray,
+               best_indexes: np.ndarray) -> None:
+        """ Find the nearest node to points, updating their best distances and indexes
+        Each point's own leaf gives a first estimate, then only tree nodes whose boxes are within that distance
+        are searched
+
+        Args:
+            eastings (np.ndarray): Point eastings
+            northings (np.ndarray): Point northings
+            points (np.ndarray): Indexes of points to search for
+            best_distances (np.ndarray): Distance to nearest node found for each point
+            best_indexes (np.ndarray): Nearest node found for each point
+        """
+        # Descend to leaf containing each point
+        tree_nodes = np.zeros(len(points), dtype=int)
+        internal = np.flatnonzero(self.children[tree_nodes, 0] >= 0)
+        while len(internal):
+            branches = tree_nodes[internal]
+            coords = np.where(self.axes[branches] == 0, eastings[points[internal]], northings[points[internal]])
+            tree_nodes[internal] = self.children[branches, (coords >= self.splits[branches]).astype(int)]
+            internal = internal[self.children[tree_nodes[internal], 0] >= 0]
+        self.search_leaves(eastings, northings, points, tree_nodes, best_distances, best_indexes)
+
+        # Batches of (point, tree node) pairs still to search, batches are halved until no larger than max_pairs
+        pending = [(points, np.zeros(len(points), dtype=int))]
+        while pending:
+            pair_points, tree_nodes = pending.pop()
+            if len(pair_points) > self.max_pairs:
+                middle = len(pair_points) // 2
+                pending.append((pair_points[middle:], tree_nodes[middle:]))
+                pending.append((pair_points[:middle], tree_nodes[:middle]))
+                continue
+
+            # Distance to a box is never more than to any node in it, even after rounding, so tree nodes are
+            # only searched if their box is closer than the best node found, or as close with a lower node index
+            boxes = self.boxes[tree_nodes]
+            x, y = eastings[pair_points], northings[pair_points]
+            dx = np.maximum(np.maximum(boxes[:, 0] - x, x - boxes[:, 2]), 0)
+            dy = np.maximum(np.maximum(boxes[:, 1] - y, y - boxes[:, 3]), 0)
+            box_distances = np.sqrt(dx**2 + dy**2)
+            near = (box_distances < best_distances[pair_points]) | (
+                (box_distances == best_distances[pair_points]) &
+                (self.min_indexes[tree_nodes] < best_indexes[pair_points]))
+            pair_points, tree_nodes = pair_points[near], tree_nodes[near]
+
+            leaves = self.children[tree_nodes, 0] < 0
+            self.search_leaves(eastings, northings, pair_points[leaves], tree_nodes[leaves],
+                               best_distances, best_indexes)
+
+            branches = tree_nodes[~leaves]
+            if len(branches):
+                pending.append((np.tile(pair_points[~leaves], 2),
+                                np.concatenate([self.children[branches, 0], self.children[branches, 1]])))
+
+    def search_leaves(self, eastings: np.ndarray, northings: np.ndarray, points: np.ndarray, leaves: np.ndarray,
+                      best_distances: np.ndarray, best_indexes: np.ndarray) -> None:
+        """ Compare points with every node of a leaf, updating their best distances and indexes
+
+        Args:
+            eastings (np.ndarray): Point eastings
+            northings (np.ndarray): Point northings
+            points (np.ndarray): Indexes of points
+            leaves (np.ndarray): Leaf searched for each point
+            best_distances (np.ndarray): Distance to nearest node found for each point
+            best_indexes (np.ndarray): Nearest node found for each point
+        """
+        starts = self.ranges[leaves, 0]
+        counts = self.ranges[leaves, 1] - starts
+        if counts.sum() == 0:
+            return
+
+        # Expand every (point, leaf) pair into (point, node) candidates
+        candidate_points = np.repeat(points, counts)
+        positions = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        candidate_nodes = self.sorted_nodes[np.repeat(starts, counts) + positions]
+
+        distances = np.sqrt(
+            (eastings[candidate_points] - self.eastings[candidate_nodes])**2 +
+            (northings[candidate_points] - self.northings[candidate_nodes])**2)
+
+        # Closest candidate per point, lowest node index on ties
+        order = np.lexsort((candidate_nodes, distances, candidate_points))
+        candidate_points = candidate_points[order]
+        first = np.concatenate([[True], candidate_points[1:] != candidate_points[:-1]])
+        points = candidate_points[first]
+        distances = distances[order][first]
+        nodes = candidate_nodes[order][first]
+
+        closer = (distances < best_distances[points]) | (
+            (distances == best_distances[points]) & (nodes < best_indexes[points]))
+        best_distances[points[closer]] = distances[closer]
+        best_indexes[points[closer]] = nodes[closer]
+
+
+class TrapeziumOperator():
+    """
+    Trapezium rule over the AEPs of a fixed set of flood events, precomputed as weights
+    Average annual damages are a weighted sum of damages at each flood event, and the cumulative
+    trapezia up to each flood event (benefits) are a product with a matrix of cumulative weights,
+    so every row of damages is integrated with a single matrix multiply
+    """
+    def __init__(self, flood_events: List[int]) -> None:
+        """
+        Args:
+            flood_events (List[int]): Return periods, expressed as arps not aeps
+        """
+        self.aeps = 1 / np.asarray(flood_events, dtype=float)
+        widths = (self.aeps[:-1] - self.aeps[1:]) / 2
+
+        # Trapezium i adds half its width to the weights of flood events i and i+1
+        self.cumulative_weights = np.zeros((len(self.aeps), len(widths)))
+        for i, width in enumerate(widths):
+            self.cumulative_weights[i:i + 2, i:] += width
+
+        self.weights = self.cumulative_weights[:, -1].copy() if len(widths) else np.zeros(len(self.aeps))
+
+    def integrate(self, damages: np.ndarray) -> np.ndarray:
+        """ Apply trapezium rule along last axis of damages
+        """
+        return np.asarray(damages, dtype=float) @ self.weights
+
+    def cumulative_integrate(self, damages: np.ndarray) -> np.ndarray:
+        """ Apply trapezium rule along last axis of damages up to each flood event after the first
+        """
+        return np.asarray(damages, dtype=float) @ self.cumulative_weights
+
+
+# Operators are built once for each set of flood events used
+trapezium_operators = {}
+
+
+def get_trapezium_operator(flood_events: List[int]) -> TrapeziumOperator:
+    """
+    Return trapezium rule operator for flood events, building it on first use
+    """
+    key = tuple(flood_events)
+    if key not in trapezium_operators:
+        trapezium_operators[key] = TrapeziumOperator(flood_events)
 
-    return damages
+    return trapezium_operators[key]
 
 
-def interpolate_non_res_damages(direct_damages: List[float], depths: List[float]) -> List[float]:
+def get_average_annual_matrix(flood_events: List[int], event_damages: np.ndarray) -> np.ndarray:
     """
-    Interpolate damages based on depths
+    Find average annual damage of every row of event_damages at once using trapezium rule
+    flood_events should be expressed as arps not aeps
     """
-    measured_depths = const.non_residential_depths
-    damages = []
+    return get_trapezium_operator(flood_events).integrate(event_damages)
 
-    for depth in depths:
-        # Depth less than -1, no damages
-        if depth < -1:
-            damages.append(0)
-
-        # Depth greater than 3, max damage
-        elif depth >= 3:
-            damages.append(direct_damages[-1])
-
-        # Interpolation
-        else:
-            i = 0
-            while depth >= measured_depths[i]:
-                i += 1
 
-            # Find damage bounds
-            total_damage_diff = direct_damages[i] - direct_damages[i-1]
-
-            # Find depth bounds and interpolate
-            actual_depth_diff = depth - measured_depths[i-1]
-            total_depth_diff = measured_depths[i] - measured_depths[i-1]
-            depth_diff_pct = actual_depth_diff / total_depth_diff
-
-            damages.append(direct_damages[i-1] +
-                           (depth_diff_pct * total_damage_diff))
-
-    return damages
-
-
-def get_average_annual(flood_events: List[int], event_damages: List[float]) -> float:
+def get_capping_depths(flood_events: List[int], depths: np.ndarray, damages: np.ndarray, cap: float, df: float) -> np.ndarray:
     """
-    Find average annual damage using trapezium rule
-    arg lists should be same length
-    flood_events should be expressed as arps not aeps
+    Find depth at which damages exceed damage cap for every property at once
+    Each row of depths and damages holds one property's values at each flood event
+    Capping depth is NaN where damage cap is not exceeded
     """
-    aeps = [(1/event) for event in flood_events]
-    event_count = len(flood_events)
+    depths = np.asarray(depths, dtype=float)
 
-    # Apply trapezium rule
-    return sum([((event_damages[i]+event_damages[i+1]) * (aeps[i]-aeps[i+1]) / 2) for i in range(event_count-1)])
+    # Cumulative trapezia along flood event axis
+    cumulative_damages = get_trapezium_operator(flood_events).cumulative_integrate(damages)
 
-
-def get_capping_depth(flood_events: List[int], depths: List[float], damages: List[float], cap: float, df: float) -> Union[float, None]:
-    """
-    Find depth at which damages exceed damage cap
-    """
-    lifetime_damage = get_average_annual(flood_events, damages) * df
     # Damage cap not exceeded so capping depth doesn't exist
-    if lifetime_damage < cap:
-        return None
+    lifetime_damages = cumulative_damages[..., -1] * df
+    exceeded = ~(lifetime_damages < cap)
 
+    # First trapezium at which target damage is reached
     target_damage = cap / df
-    aeps = [1/event for event in flood_events]
-    event_count = len(flood_events)
+    upper = np.argmax(cumulative_damages >= target_damage, axis=-1)[..., None]
+    lower = upper - 1
 
-    trapezia = [((damages[i]+damages[i+1])*(aeps[i]-aeps[i+1])) /
-                2 for i in range(event_count-1)]
-    cumulative_damages = trapezia
-    for i in range(1, event_count-1):
-        cumulative_damages[i] += cumulative_damages[i-1]
+    # Interpolation
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lower_damages = np.take_along_axis(cumulative_damages, lower, axis=-1)
+        damage_difference = (target_damage - lower_damages) / (
+            np.take_along_axis(cumulative_damages, upper, axis=-1) - lower_damages)
+        lower_depths = np.take_along_axis(depths, lower, axis=-1)
+        depth_difference = np.take_along_axis(depths, upper, axis=-1) - lower_depths
+        capping_depths = (lower_depths + (damage_difference * depth_difference))[..., 0]
 
     # Capped damage less than first damage reading so interpolation is not possible
-    if target_damage < cumulative_damages[0]:
-        return cumulative_damages[0]
+    first_damages = cumulative_damages[..., 0]
+    capping_depths = np.where(target_damage < first_damages, first_damages, capping_depths)
 
-    # Interpolation
-    i = 0
-    while cumulative_damages[i] < target_damage:
-        i += 1
+    return np.where(exceeded, capping_depths, np.nan)
+
+def apply_damage_cap(flood_events: List[int], depths: np.ndarray, damages: np.ndarray, cap: float, df: float) -> np.ndarray:
+    """
+    Cap lifetime damages of every property at once, capping depths higher than each property's capping depth
+    depths are capped in place and may have any leading axes (e.g. event types or Monte Carlo samples)
+    Return capped average annual damages
+    """
+    average_annual_damages = get_average_annual_matrix(flood_events, damages)
+    lifetime_damages = average_annual_damages * df
 
-    damage_difference = (target_damage - cumulative_damages[i-1]) / (
-        cumulative_damages[i] - cumulative_damages[i-1])
-    depth_difference = depths[i] - depths[i-1]
+    # Capping depths are only found for properties exceeding the cap
+    exceeded = ~(lifetime_damages < cap)
+    capping_depths = get_capping_depths(flood_events, depths[exceeded], damages[exceeded], cap, df)
+    depths[exceeded] = np.fmin(depths[exceeded], capping_depths[:, None])
 
-    return depths[i-1] + (damage_difference * depth_difference)
+    return np.minimum(cap, lifetime_damages) / df
 
-# Intangible damages
+# Intangible damages tables
+# Missing table entries are NaN
+intangible_aeps_before = np.array(const.intangible_aeps_before, dtype=float)
+intangible_aeps_after = np.array(const.intangible_aeps_after, dtype=float)
+intangible_direct_damages = np.array(const.intangible_direct_damages, dtype=float)
+intangible_direct_damages_150 = np.array(const.intangible_direct_damages_150, dtype=float)
 
 
-def get_current_sop(flood_events: List[int], depths: List[float]) -> Union[float, None]:
+def get_current_sops(flood_events: List[int], depths: np.ndarray) -> np.ndarray:
     """
-    Get first flood event during which damage occurs
-    Return AEP
+    Get first flood event during which damage occurs for every row of depths
+    Return AEP, NaN where damage never occurs
     """
     # Damage occurs when depth >= -0.3
-    for i in range(len(depths)):
-        if depths[i] >= -0.3:
-            return (100/flood_events[i])
+    flooded = np.asarray(depths, dtype=float) >= -0.3
+    aeps = 100 / np.asarray(flood_events, dtype=float)
+
+    return np.where(flooded.any(axis=-1), aeps[flooded.argmax(axis=-1)], np.nan)
 
 
-def get_intangible_damage(sop: Union[int, None]) -> float:
+def get_intangible_damages(sops: np.ndarray) -> np.ndarray:
     """
-    Get intangible damages 
-    sop should be expressed as AEP *not* ARP
+    Get intangible damages for each sop
+    sops should be expressed as AEP *not* ARP
+    Table is interpolated once per distinct sop as sops can only take one value per flood event
     """
-    measured_aeps = const.intangible_aeps_before
-    direct_damages = const.intangible_direct_damages_150
+    sops = np.asarray(sops, dtype=float)
+    distinct_sops, inverse = np.unique(sops, return_inverse=True)
 
-    # If property experiences no damage at any flood event then sop will be None
-    # Intangible damages are always 0 in this case
-    if sop is None:
-        return 0
+    damages = np.interp(distinct_sops, intangible_aeps_before, intangible_direct_damages_150)
 
     # AEP higher than measured values, max damage
-    if sop >= 100:
-        return 303
-
-    # AEP lower than measured values, no damage
-    if sop <= 0:
-        return 0
-
-    # Interpolate
-    i = 0
-    while sop >= measured_aeps[i]:
-        i += 1
+    damages = np.where(distinct_sops >= 100, 303, damages)
 
-    # Find damage bounds
-    total_damage_diff = direct_damages[i] - direct_damages[i-1]
-
-    # Find aep bounds and interpolate
-    actual_aep_diff = sop - measured_aeps[i-1]
-    total_aep_diff = measured_aeps[i] - measured_aeps[i-1]
-    aep_diff_pct = actual_aep_diff / total_aep_diff
+    # AEP lower than measured values, or property experiences no damage at any flood event
+    # Intangible damages are always 0 in this case
+    damages = np.where((distinct_sops <= 0) | np.isnan(distinct_sops), 0, damages)
 
-    return direct_damages[i-1] + (aep_diff_pct * total_damage_diff)
+    return damages[inverse].reshape(sops.shape)
 
 
-def get_intangible_benefit(aep_before: float, aep_after: int) -> float:
+def get_intangible_benefits(aeps_before: np.ndarray, aeps_after: Union[float, np.ndarray]) -> np.ndarray:
     """
-    Bilinear interpolation
+    Bilinear interpolation of intangible benefits for every pair of aep before and aep after
     Both args should be expressed as aep not arp
+    Result has shape aeps_after.shape + aeps_before.shape
+    Table is interpolated once per distinct aep before and broadcast to all properties
     """
-    measured_aeps_before = const.intangible_aeps_before
-    measured_aeps_after = const.intangible_aeps_after
-    direct_damages = const.intangible_direct_damages
+    aeps_before = np.asarray(aeps_before, dtype=float)
+    aeps_after = np.asarray(aeps_after, dtype=float)[..., None]
+    distinct_aeps, inverse = np.unique(aeps_before, return_inverse=True)
 
-    if aep_before is None:
-        return 0
+    # No damage at any flood event gives no benefit
+    no_damage = np.isnan(distinct_aeps)
+    distinct_aeps = np.where(no_damage, 1, distinct_aeps)
 
-    i, j = 0, 0
+    # Indexes of first measured aeps not less than the args
+    i = np.clip(np.searchsorted(intangible_aeps_after, aeps_after), 1, len(intangible_aeps_after) - 1)
+    j = np.clip(np.searchsorted(intangible_aeps_before, distinct_aeps), 1, len(intangible_aeps_before) - 1)
 
-    while measured_aeps_after[i] < aep_after:
-        i += 1
+    top_left = intangible_direct_damages[j-1, i-1]
+    top_right = intangible_direct_damages[j-1, i]
+    bottom_left = intangible_direct_damages[j, i-1]
+    bottom_right = intangible_direct_damages[j, i]
 
-    while measured_aeps_before[j] < aep_before:
-        j += 1
+    x1 = intangible_aeps_after[i-1]
+    x2 = intangible_aeps_after[i]
+    y1 = intangible_aeps_before[j-1]
+    y2 = intangible_aeps_before[j]
 
-    top_left = direct_damages[j-1][i-1]
-    top_right = direct_damages[j-1][i]
-    bottom_left = direct_damages[j][i-1]
-    bottom_right = direct_damages[j][i]
+    coeff_1 = ((x2 - aeps_after) * (y2 - distinct_aeps)) / ((x2 - x1) * (y2 - y1))
+    coeff_2 = ((aeps_after - x1) * (y2 - distinct_aeps)) / ((x2 - x1) * (y2 - y1))
+    coeff_3 = ((x2 - aeps_after) * (distinct_aeps - y1)) / ((x2 - x1) * (y2 - y1))
+    coeff_4 = ((aeps_after - x1) * (distinct_aeps - y1)) / ((x2 - x1) * (y2 - y1))
 
-    if top_left is None or top_right is None or bottom_left is None or bottom_right is None:
-        return 0
+    benefits = (coeff_1 * top_left) + (coeff_2 * top_right) + (coeff_3 * bottom_left) + (coeff_4 * bottom_right)
 
-    x1 = measured_aeps_after[i-1]
-    x2 = measured_aeps_after[i]
-    y1 = measured_aeps_before[j-1]
-    y2 = measured_aeps_before[j]
+    # Missing table entries give no benefit
+    benefits = np.where(np.isnan(benefits) | no_damage, 0, benefits)
 
-    coeff_1 = ((x2 - aep_after) * (y2 - aep_before)) / ((x2 - x1) * (y2 - y1))
-    coeff_2 = ((aep_after - x1) * (y2 - aep_before)) / ((x2 - x1) * (y2 - y1))
-    coeff_3 = ((x2 - aep_after) * (aep_before - y1)) / ((x2 - x1) * (y2 - y1))
-    coeff_4 = ((aep_after - x1) * (aep_before - y1)) / ((x2 - x1) * (y2 - y1))
-
-    return (coeff_1 * top_left) + (coeff_2 * top_right) + (coeff_3 * bottom_left) + (coeff_4 * bottom_right)
+    return benefits[..., inverse.reshape(-1)].reshape(aeps_after.shape[:-1] + aeps_before.shape)
 
 # Mental health costs
 
 
-def get_mh_cost_per_depth(depth: float) -> int:
-    """
-    Get mh cost per adult for a given depth
-    """
-    direct_damages = const.mental_health_costs
-
-    if depth < 0:
-        return direct_damages[0]
-    if depth <= 0.3:
-        return direct_damages[1]
-    if depth <= 1:
-        return direct_damages[2]
-
-    return direct_damages[3]
+# Mental health costs of each MCM code in each depth band, flattened so costs are found with a single lookup
+mh_mcms = np.array(sorted(const.adults_per_property))
+mh_band_costs = np.outer([const.adults_per_property[mcm] for mcm in mh_mcms], const.mental_health_costs).ravel()
 
 
-def get_mh_costs(depths: List[float], mcm: int) -> List[float]:
+def get_mh_costs_matrix(depths: np.ndarray, mcms: List[int]) -> np.ndarray:
     """
-    Get mental health costs for given depths and property type
+    Get mental health costs for every property and flood event at once
+    Last axis of depths holds flood events and the one before it properties
     """
-    adults = const.adults_per_property[mcm]
-    return [(get_mh_cost_per_depth(depth) * adults) for depth in depths]
+    depths = np.asarray(depths, dtype=float)
+    rows = np.searchsorted(mh_mcms, np.asarray(mcms, dtype=int)) * len(const.mental_health_costs)
+
+    # Cost band of each depth, counted down so depths which are NaN get the highest band
+    bands = 3 - (depths < 0).astype(np.intp) - (depths <= 0.3) - (depths <= 1)
+    bands += rows[:, None]
+    return mh_band_costs.take(bands)
 
 # Vehicular damages
 
 
-def get_vehicular_damage_per_depth(depth: float) -> int:
+def get_vehicle_weighting(event_type: str) -> float:
     """
-    Get vehicular damage for a given depth
-    .15m added to depth to adjust for internal property threshold
+    Get weighting of vehicle damages from event type
+    Full damages are only applied to events with no warning
     """
-    if depth + 0.15 > 0.35:
-        return const.vehicle_damages[1]
+    if event_type in [
+        "Short Duration Major Flood Storm No Warning",
+        "Long Duration Major Flood Storm No Warning",
+            "Extra-Long Duration Major Flood Storm No Warning"]:
+        return const.weightings[0]
 
-    return const.vehicle_damages[0]
+    return const.weightings[1]
 
 
-def get_vehicle_damages(depths: List[float], weighting: float) -> List[float]:
+def get_vehicle_damages_matrix(depths: np.ndarray, weighting: float) -> np.ndarray:
     """
-    Get vehicle damages for given depths and flood type
+    Get vehicle damages for every property and flood event at once
+    .15m added to depth to adjust for internal property threshold
     """
-    return [(get_vehicular_damage_per_depth(depth) * weighting) for depth in depths]
+    depths = np.asarray(depths, dtype=float)
+    return np.where(depths + 0.15 > 0.35, const.vehicle_damages[1], const.vehicle_damages[0]) * weighting
 
 # Evacuation costs
 
 
-def get_evac_category_costs(category: str) -> Dict[int, List[float]]:
+def get_evac_cost_curves(category: str) -> DamageCurves:
     """
-    Get evacuation direct costs (from tables.py)
+    Return evacuation cost curves for cost category
     """
-    costs = {
-        "Low": const.low_evacuation,
-        "Mid": const.mid_evacuation,
-        "High": const.high_evacuation
-    }
+    return evac_cost_curves[category]
 
-    return costs[category]
+# Damages caused by residential flooding
 
 
-def get_evac_costs(evac_costs: List[float], depths: List[float]) -> List[float]:
-    """
-    Get evac costs for given depths and direct evac costs
+def get_res_event_damages(flood_events: List[int], depths: np.ndarray, mcms: List[int], event_type: str,
+                          evac_cost_category: str) -> Tuple[np.ndarray, np.ndarray]:
     """
-    measured_depths = const.evacuation_depths
-    costs = []
-
-    for depth in depths:
-        # Depth less than 0, no cost
-        if depth < 0:
-            costs.append(0)
+    Find current SOPs, mental health costs, vehicle damages and evacuation costs from (capped) residential depths
+    in a single stage, so depths are only converted and read once for all four damage types
+    Last axis of depths holds flood events and the one before it properties
 
-        # Depth grater than 2, max costs
-        elif depth >= 2:
-            costs.append(evac_costs[-1])
-
-        # Interpolate
-        else:
-            i = 0
-            while depth >= measured_depths[i]:
-                i += 1
-
-            total_damage_diff = evac_costs[i] - evac_costs[i-1]
-            actual_depth_diff = depth - measured_depths[i-1]
-            total_depth_diff = measured_depths[i] - measured_depths[i-1]
-            depth_diff_pct = actual_depth_diff / total_depth_diff
-
-            costs.append(evac_costs[i-1] +
-                         (depth_diff_pct * total_damage_diff))
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Current SOP (AEP) of every property, and mental health, vehicle and
+        evacuation damages at each flood event stacked along a new leading axis so they are integrated together
+    """
+    depths = np.asarray(depths, dtype=float)
+    current_sops = get_current_sops(flood_events, depths)
+    event_damages = np.stack((
+        get_mh_costs_matrix(depths, mcms),
+        get_vehicle_damages_matrix(depths, get_vehicle_weighting(event_type)),
+        get_evac_cost_curves(evac_cost_category).interpolate(mcms, depths)))
 
-    return costs
+    return current_sops, event_damages
 
 # Emergency services
 
@@ -668,17 +986,37 @@ BENEFITS
 """
 
 
-def get_benefits(flood_events: List[int], damages: List[int]) -> List[int]:
+def get_benefits_matrix(flood_events: List[int], damages: np.ndarray) -> np.ndarray:
     """
-    Perform trapezium rule on damages and aeps to get benefits
+    Perform trapezium rule on every row of damages and aeps to get benefits
+    Result has one column per flood event after the first
     """
-    aeps = [(1/flood_event) for flood_event in flood_events]
-    event_count = len(flood_events)
+    return get_trapezium_operator(flood_events).cumulative_integrate(damages)
+
+
+def get_benefits_at_sops(flood_events: List[int], damages: np.ndarray, sops: List[float]) -> np.ndarray:
+    """
+    Find benefits of every row of damages for a scheme of each SOP (expressed as arp not aep)
+    Damages between flood events are interpolated linearly in AEP, matching the trapezium rule,
+    so SOPs equal to a flood event give the same benefits as get_benefits_matrix
+    SOPs outside the range of flood events are clamped to the first or last event
+    """
+    aeps = 1 / np.asarray(flood_events, dtype=float)
+    damages = np.asarray(damages, dtype=float)
+    sop_aeps = np.clip(1 / np.asarray(sops, dtype=float), aeps[-1], aeps[0])
+
+    # Benefits up to each flood event, starting from zero at the first
+    benefits = np.concatenate((np.zeros(damages.shape[:-1] + (1,)),
+                               get_benefits_matrix(flood_events, damages)), axis=-1)
+
+    # Flood events either side of each SOP
+    lower = np.clip(np.searchsorted(-aeps, -sop_aeps, side="right") - 1, 0, len(aeps) - 2)
+    upper = lower + 1
+    fraction = (aeps[lower] - sop_aeps) / (aeps[lower] - aeps[upper])
 
-    # Perform trapezium rule
-    trapezia = [(damages[i]+damages[i+1]) * (aeps[i]-aeps[i+1]) /
-                2 for i in range(event_count-1)]
-    return list(np.cumsum(trapezia))
+    # Add partial trapezium between the lower flood event and the SOP
+    sop_damages = damages[..., lower] + fraction * (damages[..., upper] - damages[..., lower])
+    return benefits[..., lower] + (damages[..., lower] + sop_damages) * (aeps[lower] - sop_aeps) / 2
 
 
 def get_current_benefit(flood_events: List[int], benefits: List[float], sop: int) -> float:
@@ -769,6 +1107,12 @@ class NumpyEncoder(json.JSONEncoder):
     def default(self, o: Any) -> Any:
         if isinstance(o, np.ndarray):
             return o.tolist()
+        if isinstance(o, np.generic):
+            return o.item()
+        if isinstance(o, ColumnStore):
+            return o.to_dict()
+        if isinstance(o, (LazyRaster, CachedRaster)):
+            return o.to_dict()
         return json.JSONEncoder.default(self, o)
 
 
@@ -1,14 +1,20 @@
 import json
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor
 from typing import List
 
 from PyQt5.QtWidgets import QTableWidget
 from PyQt5.QtCore import QObject, pyqtSignal
 
+import ascii_grid
 import utils
 
 from detailed_appraisal_utils import read_table_with_columns
 
+# Rows added to the data handler per append when uploading properties and nodes
+upload_chunk_size = 10000
+
 
 class JSONWriteWorker(QObject):
     # Signal fields
@@ -53,7 +59,7 @@ class JSONLoadWorker(QObject):
         """
         try:
             with open(self.fname, "r") as f:
-                self.appraisal.db.__dict__ = json.load(f)
+                self.appraisal.db.load_state(json.load(f))
                 
         except Exception as e:
             self.error.emit(e)
@@ -65,7 +71,7 @@ class JSONLoadWorker(QObject):
 class AsciiUploadWorker(QObject):
     # Signal fields
     finished = pyqtSignal()
-    progress = pyqtSignal(float)
+    progress = pyqtSignal(float, float)
     error = pyqtSignal(Exception, str)
     
     def __init__(self, appraisal, fnames: List[str]) -> None :
@@ -75,22 +81,67 @@ class AsciiUploadWorker(QObject):
         
     def run(self) -> None:
         """ Read details of selected ASCII grids into datahandler
+        Grids are parsed into the raster cache by a pool of processes, then added in the order they were
+        selected (later grids take priority where they overlap)
         """   
         ascii_count = len(self.fnames)
+        workers = min(self.appraisal.db.ascii_upload_workers or os.cpu_count() or 1, ascii_count)
+
+        # Lazy grids aren't parsed so are quick to add in this process
+        # Parsed grids reach this process through the disk cache, so are parsed here if it's disabled
+        self.appraisal.db.apply_raster_cache_settings()
+        # Processes are spawned rather than forked, forking a process running Qt threads can deadlock
+        pool = None
+        if workers > 1 and not self.appraisal.db.lazy_rasters and ascii_grid.cache_enabled:
+            pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
         
+        i = 0
         try:
+            parsed = [pool.submit(ascii_grid.cache_grid, fname, ascii_grid.cache_dir, ascii_grid.cache_budget) for fname in self.fnames] if pool else []
             for i in range(ascii_count):
-                self.appraisal.db.add_ascii(self.fnames[i])
-                # Update UI with upload progress
-                self.progress.emit(i/ascii_count)
+                throughput = parsed[i].result() if pool else None
+
+                # Parsed grids are memory-mapped from the cache
+                read_throughput = self.appraisal.db.add_ascii(self.fnames[i])
+
+                # Update UI with upload progress and read speed
+                self.progress.emit(i/ascii_count, throughput or read_throughput)
                 
         except Exception as e:
             self.error.emit(e, self.fnames[i])
+
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
             
         # Execution finished 
         self.finished.emit()
         
 
+class AsciiCatalogWorker(QObject):
+    # Signal fields
+    finished = pyqtSignal()
+    progress = pyqtSignal(float)
+    error = pyqtSignal(Exception, str)
+
+    def __init__(self, appraisal, directory: str) -> None:
+        super().__init__()
+        self.appraisal = appraisal
+        self.directory = directory
+
+    def run(self) -> None:
+        """ Catalog directory of ASCII grid tiles into datahandler
+        """
+        try:
+            self.appraisal.db.add_ascii_catalog(self.directory, self.progress.emit)
+
+        except Exception as e:
+            self.error.emit(e, self.directory)
+
+        # Execution finished
+        self.finished.emit()
+
+
 class PropUploadWorker(QObject):
     # Signal fields 
     finished = pyqtSignal()
@@ -109,8 +160,8 @@ class PropUploadWorker(QObject):
         try:
             props = read_table_with_columns(self.columns, self.table)
             prop_count = len(props)
-            for i in range(prop_count):
-                self.appraisal.db.add_prop(props[i])
+            for i in range(0, prop_count, upload_chunk_size):
+                self.appraisal.db.add_props(props[i:i+upload_chunk_size])
                 # Update UI with upload progress
                 self.progress.emit(i/prop_count)
                 
@@ -139,8 +190,8 @@ class NodeUploadWorker(QObject):
         try:
             nodes = read_table_with_columns(self.columns, self.table)
             node_count = len(nodes)
-            for i in range(node_count):
-                self.appraisal.db.add_node(nodes[i])
+            for i in range(0, node_count, upload_chunk_size):
+                self.appraisal.db.add_nodes(nodes[i:i+upload_chunk_size])
                 # Update UI with upload progress 
                 self.progress.emit(i/node_count)
                 
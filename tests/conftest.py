@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+# Modules are imported from src, and load their tables relative to the repository root
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, "src"))
+os.chdir(root)
+
+# Widgets are built without a display
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+
+@pytest.fixture
+def make_appraisal():
+    return random_appraisal
+
+
+def random_appraisal(seed=0, n_res=60, n_non_res=30, n_nodes=25):
+    """ Detailed appraisal of random properties and nodes, with some of each unchecked
+    Node values are water levels a little above or below property ground levels, so some events are dry
+    """
+    import numpy as np
+    import const
+    from detailed_datahandler import DetailedDataHandler
+
+    rng = np.random.default_rng(seed)
+    db = DetailedDataHandler()
+    res_mcms, non_res_mcms = list(const.res_mcm), list(const.non_res_mcm)
+
+    props = [[str(x), str(y), f"{i} Road", "", rng.choice(["Town", "City"]), "AB1 2CD", "", str(rng.choice(res_mcms))]
+             for i, (x, y) in enumerate(rng.uniform(0, 1000, (n_res, 2)).round(1))]
+    props += [[str(x), str(y), f"{i} Estate", "", "Town", "AB1 2CD", str(round(rng.uniform(50, 500))),
+               str(rng.choice(non_res_mcms))] for i, (x, y) in enumerate(rng.uniform(0, 1000, (n_non_res, 2)).round(1))]
+    db.add_props(props)
+    db.res_ground_levels[:] = rng.uniform(10, 11, n_res).round(2)
+    db.non_res_ground_levels[:] = rng.uniform(10, 11, n_non_res).round(2)
+
+    # Levels rise with return period
+    levels = 9.5 + np.sort(rng.uniform(0, 2.5, (n_nodes, len(db.return_periods))), axis=1).round(2)
+    db.add_nodes([[str(x), str(y)] + [str(level) for level in node_levels]
+                  for (x, y), node_levels in zip(rng.uniform(0, 1000, (n_nodes, 2)).round(1), levels)])
+
+    db.res_checks = (rng.random(n_res) < 0.9).tolist()
+    db.non_res_checks = (rng.random(n_non_res) < 0.9).tolist()
+    db.node_checks = (rng.random(n_nodes) < 0.9).tolist()
+    return db
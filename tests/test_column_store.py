@@ -0,0 +1,144 @@
+"""
+Columnar storage of properties and nodes
+"""
+import numpy as np
+import pytest
+
+from column_store import ColumnStore
+
+kinds = {"eastings": "f8", "addresses": "text", "towns": "category", "depths": "f8"}
+
+
+def make_store():
+    store = ColumnStore(kinds)
+    store.append(eastings=[1.0, 2.0, 3.0], addresses=["a", "bb", "ccc"], towns=["x", "y", "x"],
+                 depths=[[0.1, 0.2], [0.3, 0.4], [0.5, 0.6]])
+    return store
+
+
+def rows(store):
+    return [[store.column("eastings")[i], store.column("addresses")[i], store.column("towns")[i],
+             store.column("depths")[i].tolist()] for i in range(len(store))]
+
+
+def test_append_pads_ragged_vector_rows():
+    store = make_store()
+    ids = store.append(eastings=[4.0, 5.0], addresses=["d", "e"], towns=["z", "x"], depths=[[1.0], [1.0, 2.0, 3.0]])
+
+    assert ids.tolist() == [3, 4]
+    depths = store.column("depths")
+    assert depths.shape == (5, 3)
+    assert np.isnan(depths[:3, 2]).all() and np.isnan(depths[3, 1:]).all()
+    assert depths[4].tolist() == [1.0, 2.0, 3.0]
+
+
+def test_empty_append_keeps_store():
+    store = make_store()
+    before = rows(store)
+
+    assert len(store.append(eastings=[], addresses=[], towns=[], depths=[])) == 0
+    assert rows(store) == before
+    assert store.append(eastings=[4.0], addresses=["d"], towns=["x"], depths=[[1.0, 2.0]]).tolist() == [3]
+
+    empty = ColumnStore(kinds)
+    empty.append(eastings=[], addresses=[], towns=[], depths=[])
+    assert len(empty) == 0
+
+
+def test_append_rejects_mismatched_columns():
+    store = make_store()
+    with pytest.raises(ValueError):
+        store.append(eastings=[1.0], addresses=["a"], towns=["x"])
+    with pytest.raises(ValueError):
+        store.append(eastings=[1.0, 2.0], addresses=["a"], towns=["x"], depths=[[1.0]])
+
+
+def test_masked_and_indexed_delete_keep_ids():
+    store = make_store()
+    store.append(eastings=[4.0, 5.0], addresses=["d", "e"], towns=["z", "x"], depths=[[0.7, 0.8], [0.9, 1.0]])
+
+    store.delete(store.column("eastings") > 4.5)
+    store.delete([0, 2])
+
+    assert store.row_ids.tolist() == [1, 3]
+    assert rows(store) == [[2.0, "bb", "y", [0.3, 0.4]], [4.0, "d", "z", [0.7, 0.8]]]
+    assert store.get_indexes([3, 1]).tolist() == [1, 0]
+
+
+def test_get_indexes_of_missing_ids():
+    store = make_store()
+    store.delete(1)
+
+    with pytest.raises(KeyError):
+        store.get_indexes([1])
+    with pytest.raises(KeyError):
+        store.get_indexes([7])
+    with pytest.raises(KeyError):
+        ColumnStore(kinds).get_indexes([0])
+    assert len(store.get_indexes([])) == 0
+
+
+def test_scalar_and_sequence_edit():
+    store = make_store()
+    store.edit([0, 2], towns="w", eastings=9.0)
+    store.edit(np.array([False, True, True]), addresses=["long address", "é"], depths=[[1.0, 1.5], [2.0, 2.5]])
+
+    assert rows(store) == [[9.0, "a", "w", [0.1, 0.2]], [2.0, "long address", "y", [1.0, 1.5]],
+                           [9.0, "é", "w", [2.0, 2.5]]]
+
+
+def test_dict_round_trip():
+    store = make_store()
+    store.delete(0)
+    store.edit(1, addresses="edited")
+
+    restored = ColumnStore.from_dict(kinds, store.to_dict())
+
+    assert rows(restored) == rows(store)
+    assert restored.row_ids.tolist() == [1, 2]
+    assert restored.append(eastings=[1.0], addresses=["f"], towns=["x"], depths=[[1.0, 1.0]]).tolist() == [3]
+
+    emptied = ColumnStore(kinds)
+    assert len(ColumnStore.from_dict(kinds, emptied.to_dict())) == 0
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_operations_match_list_model(seed):
+    rng = np.random.default_rng(seed)
+    store = ColumnStore(kinds)
+    model = []
+    next_id = 0
+
+    def random_rows(count, width):
+        return [[float(rng.integers(100)), "a" * int(rng.integers(5)), str(rng.integers(3)),
+                 rng.random(int(rng.integers(1, width + 1))).round(3).tolist()] for _ in range(count)]
+
+    for _ in range(30):
+        action = rng.integers(4)
+        if action == 0:
+            new = random_rows(int(rng.integers(0, 4)), 3)
+            ids = store.append(eastings=[r[0] for r in new], addresses=[r[1] for r in new],
+                               towns=[r[2] for r in new], depths=[r[3] for r in new])
+            model += [[next_id + i] + r for i, r in enumerate(new)]
+            next_id += len(new)
+            assert ids.tolist() == list(range(next_id - len(new), next_id))
+        elif action == 1 and model:
+            mask = rng.random(len(model)) < 0.3
+            store.delete(mask)
+            model = [r for r, m in zip(model, mask) if not m]
+        elif action == 2 and model:
+            indexes = rng.choice(len(model), int(rng.integers(1, len(model) + 1)), replace=False)
+            edits = random_rows(len(indexes), 1)
+            store.edit(indexes, eastings=[e[0] for e in edits], addresses=[e[1] for e in edits])
+            for i, e in zip(indexes, edits):
+                model[i][1:3] = e[:2]
+        elif action == 3:
+            store = ColumnStore.from_dict(kinds, store.to_dict())
+
+        width = store.column("depths").shape[1] if model else 0
+        expected = [r[1:4] + [r[4] + [np.nan] * (width - len(r[4]))] for r in model]
+        actual = rows(store)
+        assert store.row_ids.tolist() == [r[0] for r in model]
+        assert [a[:3] for a in actual] == [e[:3] for e in expected]
+        for a, e in zip(actual, expected):
+            np.testing.assert_array_equal(a[3], e[3])
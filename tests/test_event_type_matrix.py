@@ -0,0 +1,51 @@
+"""
+Damages by event type table, compared with damages calculated for each event type
+"""
+import csv
+
+import numpy as np
+import pytest
+
+import utils
+
+
+@pytest.mark.parametrize("caps", [True, False])
+@pytest.mark.parametrize("seed", range(2))
+def test_matrix_matches_damages_of_each_event_type(make_appraisal, caps, seed):
+    db = make_appraisal(seed)
+    db.caps_enabled = caps
+    db.update_results()
+    matrix = db.get_event_type_matrix()
+
+    assert [row[:2] for row in matrix] == [[event_type, cellar] for cellar in [False, True]
+                                           for event_type in utils.res_damage_curves]
+    for row in matrix:
+        db.event_type, db.cellar = row[:2]
+        db.get_damages()
+
+        expected = [db.total_average_res_damage, db.total_lifetime_res_damage,
+                    db.total_average_non_res_damage, db.total_lifetime_non_res_damage,
+                    db.total_average_vehicular_damages, db.total_lifetime_vehicular_damages,
+                    db.total_average_evac_costs, db.total_lifetime_evac_costs]
+        np.testing.assert_allclose(row[2:], expected, rtol=1e-9, err_msg=str(row[:2]))
+
+
+def test_exported_table_layout(make_appraisal, tmp_path):
+    db = make_appraisal()
+    db.update_results()
+    (tmp_path / "CSVs").mkdir()
+    db.write_event_type_matrix(str(tmp_path), [True, False])
+
+    with open(tmp_path / "CSVs" / "Damages By Event Type.csv", newline="", encoding="utf-8") as f:
+        table = list(csv.reader(f))
+
+    assert table[0] == ["Event Type", "Non-Residential Cellars"] + [
+        f"{damage_type} {period} Damages (£)" for damage_type in ["Residential", "Non-Residential", "Vehicular", "Evacuation"]
+        for period in ["Annual", "Lifetime"]]
+
+    # One row per event type without then with cellars
+    matrix = db.get_event_type_matrix()
+    assert len(table) == len(matrix) + 1
+    for line, row in zip(table[1:], matrix):
+        assert line[:2] == [row[0], "Enabled" if row[1] else "Disabled"]
+        np.testing.assert_allclose([float(value) for value in line[2:]], row[2:], rtol=1e-9)
@@ -0,0 +1,105 @@
+"""
+Detailed appraisals flooded from flood depth grids rather than nodes
+"""
+import numpy as np
+import pytest
+from PyQt5.QtWidgets import QApplication, QMessageBox
+
+import ascii_grid
+from detailed_datahandler import DetailedDataHandler, dry_depth
+
+# Depth at every cell of each event's grid, one per default return period
+event_depths = [0.1, 0.3, 0.5, 0.8, 1.0, 1.2, 1.5]
+
+
+def write_grid(fname, value, n_cells=10, cellsize=100):
+    """ Write square ASCII grid with its lower left corner at the origin and every cell holding value
+    """
+    with open(fname, "w") as f:
+        f.write(f"ncols {n_cells}\nnrows {n_cells}\nxllcorner 0\nyllcorner 0\ncellsize {cellsize}\n"
+                f"NODATA_value -9999\n")
+        for _ in range(n_cells):
+            f.write(" ".join([str(value)] * n_cells) + "\n")
+
+
+def set_depth_grids(db, directory):
+    for rp, depth in zip(db.return_periods, event_depths):
+        fname = str(directory / f"depths_{rp}.asc")
+        write_grid(fname, depth)
+        db.set_flood_grids(rp, [fname])
+
+
+def add_props(db):
+    """ Residential properties inside and outside the grids and a non-residential property inside, without
+    ground levels
+    """
+    db.add_props([
+        ["250", "250", "1 Flooded Road", "", "Town", "AB1 2CD", "", "11"],
+        ["5000", "5000", "2 Dry Road", "", "Town", "AB1 2CD", "", "11"],
+        ["650", "450", "3 Flooded Road", "", "Town", "AB1 2CD", "100", "2"]])
+
+
+@pytest.fixture(autouse=True)
+def raster_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(ascii_grid, "cache_dir", str(tmp_path / "raster_cache"))
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+def test_grid_only_appraisal_from_gui(app, tmp_path, monkeypatch):
+    from stix import Stix
+
+    # Any message box (e.g. no flood nodes) would stop results being calculated
+    messages = []
+    monkeypatch.setattr(QMessageBox, "exec_", lambda msgbox: messages.append(msgbox.informativeText()) or
+                        QMessageBox.No)
+
+    window = Stix()
+    window.selection.start_detailed()
+    appraisal = window.stack.widget(4)
+    db = appraisal.db
+
+    add_props(db)
+    set_depth_grids(db, tmp_path)
+    appraisal.res_tab.display_props()
+    appraisal.non_res_tab.display_props()
+
+    appraisal.results_tab.get_results()
+
+    assert messages == []
+    assert db.node_count == 0
+    assert db.clean_res_count == 2 and db.clean_non_res_count == 1
+
+    # Properties inside the grids take their depths, properties outside are dry
+    np.testing.assert_allclose(db.res_depths[0], event_depths, rtol=1e-6)
+    assert list(db.res_depths[1]) == [dry_depth] * len(event_depths)
+    assert sum(db.res_damages[0]) > 0 and sum(db.res_damages[1]) == 0
+    assert sum(db.non_res_damages[0]) > 0
+    assert db.total_average_annual_damage > 0
+
+
+def test_grids_match_equivalent_node(tmp_path):
+    grid_db = DetailedDataHandler()
+    add_props(grid_db)
+    set_depth_grids(grid_db, tmp_path)
+
+    # A single node at every property's ground level plus the depth floods every property equally
+    node_db = DetailedDataHandler()
+    add_props(node_db)
+    node_db.add_node(["250", "250"] + [str(depth) for depth in event_depths])
+    node_db.res_ground_levels[:] = 0
+    node_db.non_res_ground_levels[:] = 0
+
+    for db in [grid_db, node_db]:
+        db.res_checks = [True, False, True][:db.res_count]
+        db.non_res_checks = [True]
+        db.node_checks = [True] * db.node_count
+        db.update_results()
+
+    for field in ["res_damages", "non_res_damages", "mh_costs", "vehicular_damages", "evac_costs"]:
+        np.testing.assert_allclose(np.array(getattr(grid_db, field), dtype=float),
+                                   np.array(getattr(node_db, field), dtype=float), rtol=1e-6)
+    assert grid_db.total_current_annual_benefit == pytest.approx(node_db.total_current_annual_benefit, rel=1e-6)
@@ -0,0 +1,127 @@
+"""
+Results updated for edited properties only, compared with results calculated in full
+"""
+import numpy as np
+import pytest
+
+# Totals summed from per-property results, and totals derived from them
+total_attributes = [
+    "total_average_res_damage", "total_lifetime_res_damage", "total_res_benefits",
+    "total_average_non_res_damage", "total_lifetime_non_res_damage", "total_non_res_benefits",
+    "total_average_intangible_damage", "total_lifetime_intangible_damage",
+    "total_average_mh_costs", "total_lifetime_mh_costs", "total_mh_benefits",
+    "total_average_vehicular_damages", "total_lifetime_vehicular_damages", "total_vehicular_benefits",
+    "total_average_evac_costs", "total_lifetime_evac_costs", "total_evac_benefits",
+    "total_average_disruption", "total_lifetime_disruption",
+    "total_average_infrastructure_damage", "total_lifetime_infrastructure_damage",
+    "total_average_emergency_services_costs", "total_lifetime_emergency_services_costs",
+    "total_average_annual_damage", "total_lifetime_damage", "total_annual_damage_after",
+    "total_lifetime_damage_after", "total_current_annual_benefit", "total_current_lifetime_benefit"
+] + [f"{period}_{component}_after" for period in ["annual", "lifetime"] for component in [
+    "res_damage", "intangible_damage", "mh_damage", "vehicle_damage", "evac_damage", "non_res_damage",
+    "disruption", "infrastructure_damage", "emergency_services_cost"]
+] + [f"current_{period}_{component}_benefit" for period in ["annual", "lifetime"] for component in [
+    "res", "intangible", "mh", "vehicle", "evac", "non_res", "disruption", "infrastructure", "emergency_services"]]
+
+# Per-property results, one row per clean property
+field_attributes = [
+    "res_depths", "res_damages", "capped_res_damages", "average_annual_damage_per_res",
+    "capped_lifetime_damage_per_res", "res_benefits", "current_sops", "lifetime_intangible_damages",
+    "annual_intangible_benefits", "mh_costs", "mh_benefits", "vehicular_damages", "vehicular_benefits",
+    "evac_costs", "evac_benefits", "non_res_depths", "non_res_damages", "capped_non_res_damages",
+    "capped_lifetime_damage_per_non_res", "non_res_benefits"
+]
+
+
+def res_details(db, index, rng):
+    """ Details of residential property moved and given another MCM code, in the order edit_res takes them
+    """
+    return [str(db.res_eastings[index] + rng.uniform(-200, 200)), str(db.res_northings[index] + rng.uniform(-200, 200)),
+            db.res_addresses[index], db.res_towns[index], db.res_postcodes[index], str(rng.choice([11, 12, 13, 14]))]
+
+
+def non_res_details(db, index, rng):
+    return [str(db.non_res_eastings[index] + rng.uniform(-200, 200)), str(db.non_res_northings[index]),
+            db.non_res_addresses[index], db.non_res_towns[index], db.non_res_postcodes[index],
+            str(rng.uniform(50, 500)), str(rng.choice([3, 51, 6]))]
+
+
+def edit_props(db, rng):
+    for index in rng.choice(db.res_count, 5, replace=False):
+        db.edit_res(res_details(db, index, rng), str(rng.uniform(10, 11)), int(index))
+    for index in rng.choice(db.non_res_count, 3, replace=False):
+        db.edit_non_res(non_res_details(db, index, rng), str(rng.uniform(10, 11)), int(index))
+
+    # Blank ground levels and repeated edits of one property
+    db.edit_res(res_details(db, 0, rng), "", 0)
+    db.edit_res(res_details(db, 0, rng), "10.5", 0)
+
+
+def edit_node(db, rng):
+    levels = np.sort(rng.uniform(9.5, 12, len(db.return_periods)))
+    db.edit_node([str(db.node_eastings[2]), str(db.node_northings[2])] + [str(level) for level in levels], 2)
+
+
+def delete_props(db, rng):
+    index = int(rng.integers(db.res_count))
+    db.delete_res(index)
+    del db.res_checks[index]
+
+    index = int(rng.integers(db.non_res_count))
+    db.delete_non_res(index)
+    del db.non_res_checks[index]
+
+
+def delete_node(db, rng):
+    db.delete_node(1)
+    del db.node_checks[1]
+
+
+def uncheck_props(db, rng):
+    db.res_checks[int(rng.integers(db.res_count))] = False
+
+
+def assert_results_equal(updated, full, rtol):
+    for name in total_attributes:
+        np.testing.assert_allclose(np.asarray(getattr(updated, name), dtype=float),
+                                   np.asarray(getattr(full, name), dtype=float), rtol=rtol, atol=1e-6, err_msg=name)
+    for name in field_attributes:
+        np.testing.assert_allclose(np.asarray(getattr(updated, name), dtype=float),
+                                   np.asarray(getattr(full, name), dtype=float), rtol=rtol, atol=1e-6, err_msg=name)
+
+
+@pytest.mark.parametrize("compact", [False, True])
+@pytest.mark.parametrize("caps", [True, False])
+@pytest.mark.parametrize("seed", range(3))
+def test_updated_results_match_full_calculation(make_appraisal, compact, caps, seed):
+    # Compact totals are patched with the stored float32 values of the edited properties
+    rtol = 1e-6 if compact else 1e-9
+    rng = np.random.default_rng(seed)
+    updated, full = make_appraisal(seed), make_appraisal(seed)
+    for db in [updated, full]:
+        db.compact_results = compact
+        db.caps_enabled = caps
+        db.update_results()
+
+    for change in [edit_props, edit_props, edit_node, edit_props, delete_props, edit_props, delete_node,
+                   uncheck_props, edit_props]:
+        state = rng.bit_generator.state
+        change(updated, rng)
+        rng.bit_generator.state = state
+        change(full, rng)
+
+        updated.update_results()
+        full.get_damages()
+        full.get_benefits()
+        assert_results_equal(updated, full, rtol)
+
+
+def test_edits_are_updated_incrementally(make_appraisal, monkeypatch):
+    db = make_appraisal()
+    db.update_results()
+    edit_props(db, np.random.default_rng(0))
+
+    # Full calculation isn't used when only properties are edited
+    monkeypatch.setattr(db, "get_damages", lambda: pytest.fail("Results were calculated in full"))
+    db.update_results()
+    assert db.dirty_res_ids == [] and db.dirty_non_res_ids == []
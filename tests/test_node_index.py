@@ -0,0 +1,89 @@
+"""
+Nearest node search, compared with a brute force search
+"""
+import numpy as np
+import pytest
+
+from utils import NodeIndex
+
+
+def brute_force(node_e, node_n, e, n):
+    """ Index of nearest node to each point, lowest index of tied nodes
+    """
+    distances = (np.asarray(e)[:, None] - np.asarray(node_e)[None]) ** 2 \
+        + (np.asarray(n)[:, None] - np.asarray(node_n)[None]) ** 2
+    return np.argmin(np.nan_to_num(distances, nan=np.inf), axis=1)
+
+
+@pytest.mark.parametrize("leaf_size, max_pairs", [(16, 2 ** 16), (1, 7), (4, 50)])
+@pytest.mark.parametrize("seed", range(10))
+def test_random_points_match_brute_force(seed, leaf_size, max_pairs):
+    rng = np.random.default_rng(seed)
+    node_e, node_n = rng.uniform(0, 1000, (2, int(rng.integers(1, 300))))
+    e, n = rng.uniform(-100, 1100, (2, 500))
+
+    index = NodeIndex(node_e, node_n, leaf_size, max_pairs)
+
+    np.testing.assert_array_equal(index.query(e, n), brute_force(node_e, node_n, e, n))
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_ties_go_to_lowest_index(seed):
+    # Nodes on a coarse lattice, several at each location, so most points are equally near many nodes
+    rng = np.random.default_rng(seed)
+    node_e, node_n = rng.integers(0, 6, (2, 80)).astype(float) * 10
+    e, n = rng.integers(-2, 13, (2, 400)).astype(float) * 5
+
+    np.testing.assert_array_equal(NodeIndex(node_e, node_n, leaf_size=2, max_pairs=64).query(e, n),
+                                  brute_force(node_e, node_n, e, n))
+
+
+def test_points_on_nodes_and_outlying_nodes():
+    rng = np.random.default_rng(0)
+    node_e = np.append(rng.normal(500, 1, 200), 1e6)
+    node_n = np.append(rng.normal(500, 1, 200), -1e6)
+
+    # Points exactly on nodes find those nodes
+    on_nodes = rng.choice(len(node_e), 50)
+    assert NodeIndex(node_e, node_n).query(node_e[on_nodes], node_n[on_nodes]).tolist() == on_nodes.tolist()
+
+    e, n = np.append(rng.normal(500, 5, 100), 9e5), np.append(rng.normal(500, 5, 100), -9e5)
+    np.testing.assert_array_equal(NodeIndex(node_e, node_n).query(e, n), brute_force(node_e, node_n, e, n))
+
+
+def test_single_node():
+    e, n = np.random.default_rng(0).uniform(0, 1000, (2, 20))
+    assert NodeIndex([5.0], [7.0]).query(e, n).tolist() == [0] * 20
+
+
+def test_missing_locations():
+    node_e, node_n = np.array([np.nan, 10.0, 0.0]), np.array([0.0, 10.0, np.nan])
+
+    # Nodes without locations are never nearest
+    assert NodeIndex(node_e, node_n).query([0.0, 20.0], [0.0, 20.0]).tolist() == [1, 1]
+    with pytest.raises(ValueError):
+        NodeIndex([np.nan], [0.0]).query([0.0], [0.0])
+    assert len(NodeIndex([], []).query([], [])) == 0
+
+
+def test_properties_use_nearest_checked_node(make_appraisal):
+    db = make_appraisal(3, n_nodes=40)
+
+    # Deleted and unchecked nodes are left out of the search
+    db.delete_node([0, 5, 6])
+    db.node_checks = [i % 4 != 1 for i in range(db.node_count)]
+    db.res_checks[0] = True
+    db.update_results()
+
+    node_e, node_n = np.array(db.clean_node_e), np.array(db.clean_node_n)
+    assert len(node_e) < db.node_count
+    np.testing.assert_array_equal(db.res_node_indexes,
+                                  brute_force(node_e, node_n, db.clean_res_e, db.clean_res_n))
+    np.testing.assert_array_equal(db.non_res_node_indexes,
+                                  brute_force(node_e, node_n, db.clean_non_res_e, db.clean_non_res_n))
+
+    # Properties on a node take that node
+    db.edit_res([str(db.node_eastings[2]), str(db.node_northings[2]), "Road", "Town", "AB1 2CD", "11"], "10", 0)
+    db.update_results()
+    node = int(np.flatnonzero(np.array(db.clean_node_ids) == db.node_store.row_ids[2])[0])
+    assert db.res_node_indexes[0] == node
@@ -0,0 +1,48 @@
+"""
+Parsing bodies of large ASCII grids in a pool of processes
+"""
+import numpy as np
+import pytest
+
+import ascii_grid
+from ascii_grid import SharedBody, parse_grid
+
+
+@pytest.fixture(autouse=True)
+def parallel(monkeypatch):
+    monkeypatch.setattr(ascii_grid, "parallel_parse_size", 0)
+
+
+def write_grid(fname, rows, n_cols=10):
+    with open(fname, "w") as f:
+        f.write(f"ncols {n_cols}\nnrows {len(rows)}\nxllcorner 0\nyllcorner 0\ncellsize 1\nNODATA_value -9999\n")
+        f.writelines(" ".join(map(str, row)) + "\n" for row in rows)
+
+
+def grid_rows(n_rows=200, n_cols=10):
+    return [[row * n_cols + col for col in range(n_cols)] for row in range(n_rows)]
+
+
+def test_parallel_body_matches_serial_and_is_not_copied(tmp_path):
+    fname = str(tmp_path / "grid.asc")
+    rows = grid_rows()
+    rows[7][3] = -9999
+    write_grid(fname, rows)
+
+    header, body, _ = parse_grid(fname, workers=3)
+
+    assert isinstance(body.base, SharedBody)
+    assert header == parse_grid(fname, workers=1)[0]
+    assert np.array_equal(body, parse_grid(fname, workers=1)[1], equal_nan=True)
+    assert np.isnan(body[7, 3])
+
+
+def test_bad_row_is_numbered_from_start_of_body(tmp_path):
+    fname = str(tmp_path / "grid.asc")
+    rows = grid_rows()
+    rows[173] = rows[173][:9]
+    write_grid(fname, rows)
+
+    for workers in [1, 2, 3]:
+        with pytest.raises(ValueError, match="^Row 173 of ASCII grid body has 9 values, header gives 10$"):
+            parse_grid(fname, workers=workers)
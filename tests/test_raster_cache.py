@@ -0,0 +1,74 @@
+"""
+Disk cache of parsed ASCII grids
+"""
+import os
+
+import numpy as np
+import pytest
+
+import ascii_grid
+from ascii_grid import AsciiGrid, get_cache_key
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(ascii_grid, "cache_dir", str(tmp_path / "raster_cache"))
+    monkeypatch.setattr(ascii_grid, "cache_enabled", True)
+    monkeypatch.setattr(ascii_grid, "cache_budget", None)
+    return tmp_path / "raster_cache"
+
+
+def write_grid(fname, value, n_cells=20):
+    with open(fname, "w") as f:
+        f.write(f"ncols {n_cells}\nnrows {n_cells}\nxllcorner 0\nyllcorner 0\ncellsize 1\n")
+        for _ in range(n_cells):
+            f.write(" ".join([str(value)] * n_cells) + "\n")
+
+
+def cached_keys(cache):
+    return {name.split(".")[0] for name in os.listdir(cache)} if cache.exists() else set()
+
+
+def test_changed_grid_replaces_its_sidecars(tmp_path, cache):
+    fname = str(tmp_path / "grid.asc")
+    write_grid(fname, 1)
+    old_key = AsciiGrid(fname).cache_key
+
+    write_grid(fname, 2)
+    os.utime(fname, ns=(1, 1))
+    grid = AsciiGrid(fname)
+
+    assert grid.cache_key != old_key and not grid.cached
+    assert cached_keys(cache) == {grid.cache_key}
+    assert AsciiGrid(fname).cached and np.all(AsciiGrid(fname).body == 2)
+
+
+def test_least_recently_used_grids_are_removed_over_budget(tmp_path, cache, monkeypatch):
+    fnames = [str(tmp_path / f"grid_{i}.asc") for i in range(3)]
+    for i, fname in enumerate(fnames):
+        write_grid(fname, i)
+        AsciiGrid(fname)
+        os.utime(cache / f"{get_cache_key(fname)}.json", ns=(i, i))
+
+    # Reading first grid makes it most recently used
+    AsciiGrid(fnames[0])
+    entry_size = sum(os.path.getsize(cache / name) for name in os.listdir(cache)) // 3
+    monkeypatch.setattr(ascii_grid, "cache_budget", 2 * entry_size)
+
+    fname = str(tmp_path / "grid_3.asc")
+    write_grid(fname, 3)
+    AsciiGrid(fname)
+
+    assert cached_keys(cache) == {get_cache_key(fnames[0]), get_cache_key(fname)}
+
+
+def test_disabled_cache_is_not_read_or_written(tmp_path, cache, monkeypatch):
+    fname = str(tmp_path / "grid.asc")
+    write_grid(fname, 1)
+    AsciiGrid(fname)
+    monkeypatch.setattr(ascii_grid, "cache_enabled", False)
+
+    assert not AsciiGrid(fname).cached
+    write_grid(str(tmp_path / "other.asc"), 2)
+    AsciiGrid(str(tmp_path / "other.asc"))
+    assert cached_keys(cache) == {get_cache_key(fname)}
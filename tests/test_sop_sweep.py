@@ -0,0 +1,38 @@
+"""
+Benefits by SOP table, compared with benefits calculated at each SOP
+"""
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize("caps", [True, False])
+@pytest.mark.parametrize("seed", range(3))
+def test_sweep_matches_benefits_at_each_return_period(make_appraisal, caps, seed):
+    db = make_appraisal(seed)
+    db.caps_enabled = caps
+    db.extra_sops = [20, 75, 200]
+    db.update_results()
+    sweep = {row[0]: row[1:] for row in db.get_sop_sweep()}
+
+    for sop in db.return_periods:
+        db.sop = sop
+        db.get_damages()
+        db.get_benefits()
+
+        # Annual then lifetime benefit of each damage type, then totals
+        expected = [value for row in db.get_major_datapoints() for value in row[4:6]]
+        np.testing.assert_allclose(sweep[sop], expected, rtol=1e-9, atol=1e-6, err_msg=f"SOP {sop}")
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_extra_sops_are_between_return_periods(make_appraisal, seed):
+    db = make_appraisal(seed)
+    db.extra_sops = [20, 75, 200, 7]
+    db.update_results()
+    sweep = np.array(db.get_sop_sweep())
+
+    assert sweep[:, 0].tolist() == sorted(set(db.return_periods) | set(db.extra_sops))
+
+    # Higher standards of protection never give lower benefits
+    assert np.all(np.diff(sweep[:, 1:], axis=0) >= -1e-6)
+    assert np.all(np.diff(sweep[:, -2:], axis=0) > 0)
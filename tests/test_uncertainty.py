@@ -0,0 +1,49 @@
+"""
+Monte Carlo uncertainty of results
+"""
+import numpy as np
+import pytest
+
+import monte_carlo
+
+
+@pytest.mark.parametrize("caps", [True, False])
+def test_zero_errors_reproduce_results(make_appraisal, caps):
+    db = make_appraisal()
+    db.caps_enabled = caps
+    percentiles = db.get_uncertainty(samples=5, gl_sd=0, depth_sd=0, seed=0)
+    datapoints = np.array(db.get_major_datapoints(), dtype=float)
+
+    # Every percentile of identical samples is the usual result
+    for i in range(3):
+        np.testing.assert_allclose(np.array(percentiles)[..., i], datapoints, rtol=1e-12, atol=1e-6)
+
+
+def test_seeded_samples_are_independent_of_workers(make_appraisal, monkeypatch):
+    db = make_appraisal()
+    db.update_results()
+    inputs = db.get_uncertainty_inputs(0.1, 0.1)
+
+    # Small batches so samples are split between workers, with a partial last batch
+    monkeypatch.setattr(monte_carlo, "batch_values", 9 * (db.clean_res_count + db.clean_non_res_count)
+                        * len(db.return_periods))
+    one = monte_carlo.run_samples(inputs, 40, workers=1, seed=3)
+    two = monte_carlo.run_samples(inputs, 40, workers=2, seed=3)
+
+    assert set(one) == set(two)
+    for name in one:
+        np.testing.assert_array_equal(one[name], two[name], err_msg=name)
+    assert len(one["total_average_res_damage"]) == 40
+    assert np.std(one["total_average_res_damage"]) > 0
+
+    # Another seed gives other samples
+    other = monte_carlo.run_samples(inputs, 40, workers=1, seed=4)
+    assert not np.array_equal(one["total_average_res_damage"], other["total_average_res_damage"])
+
+
+def test_percentiles_are_ordered(make_appraisal):
+    db = make_appraisal()
+    low, median, high = np.moveaxis(np.array(db.get_uncertainty(samples=50, seed=1, workers=2)), -1, 0)
+
+    assert np.all(low <= median) and np.all(median <= high)
+    assert np.any(low < high)
@@ -0,0 +1,89 @@
+"""
+Discount factors and depth-damage curves
+"""
+import numpy as np
+import pytest
+
+import const
+import utils
+
+# Rate of each band of years, bands start at years 0, 30 and 75
+treasury_rates = [0.035, 0.03, 0.025]
+health_rates = [0.015, 0.01286, 0.01071]
+band_starts = [0, 30, 75, 101]
+
+
+def step_rate_cumulative_factor(rates, year):
+    """ Sum of discount factors from 0 to year, as a geometric series within each band
+    """
+    total, factor = 0.0, 1.0
+    for rate, start, stop in zip(rates, band_starts[:-1], band_starts[1:]):
+        ratio = 1 / (1 + rate)
+        terms = min(year + 1, stop) - start
+        if terms <= 0:
+            break
+        total += factor * (1 - ratio ** terms) / (1 - ratio)
+        factor *= ratio ** (stop - start)
+    return total
+
+
+@pytest.mark.parametrize("year", [0, 1, 29, 30, 31, 74, 75, 76, 100])
+def test_cumulative_discount_factors_match_step_rates(year):
+    assert utils.get_cumulative_discount_factor(year) == pytest.approx(
+        step_rate_cumulative_factor(treasury_rates, year), rel=1e-12)
+    assert utils.get_cumulative_health_discount_factor(year) == pytest.approx(
+        step_rate_cumulative_factor(health_rates, year), rel=1e-12)
+
+
+def test_discount_factors_at_band_edges():
+    assert utils.get_discount_factor(0) == 1
+    assert utils.get_discount_factor(30) == pytest.approx(1.035 ** -30, rel=1e-12)
+    assert utils.get_discount_factor(31) == pytest.approx(1.035 ** -30 / 1.03, rel=1e-12)
+    assert utils.get_discount_factor(100) == pytest.approx(1.035 ** -30 * 1.03 ** -45 * 1.025 ** -25, rel=1e-12)
+
+    # Array of years gives each year's factor
+    years = np.array([0, 30, 31, 75, 100])
+    np.testing.assert_allclose(utils.discount_schedule.cumulative_factor(years),
+                               [step_rate_cumulative_factor(treasury_rates, year) for year in years], rtol=1e-12)
+
+
+@pytest.mark.parametrize("year", [-1, 101])
+def test_years_outside_schedule(year):
+    with pytest.raises(ValueError):
+        utils.get_cumulative_discount_factor(year)
+    with pytest.raises(ValueError):
+        utils.discount_schedule.factor(np.array([50, year]))
+
+
+# Curves of each module level curve set, with the depths and damages read from their CSV
+curve_sets = [(curves, const.residential_depths, damages) for curves, damages in zip(utils.res_damage_curves.values(), [
+    const.short_duration_no_warning, const.short_duration_less_warning, const.short_duration_more_warning,
+    const.long_duration_no_warning, const.long_duration_less_warning, const.long_duration_more_warning,
+    const.extra_long_duration_no_warning, const.extra_long_duration_less_warning, const.extra_long_duration_more_warning])]
+curve_sets += [(curves, const.non_residential_depths, damages) for curves, damages in zip(
+    utils.non_res_damage_curves.values(), [
+        const.short_duration_no_warning_cellar, const.short_duration_no_warning_no_cellar,
+        const.short_duration_warning_cellar, const.short_duration_warning_no_cellar,
+        const.long_duration_no_warning_cellar, const.long_duration_no_warning_no_cellar,
+        const.long_duration_warning_cellar, const.long_duration_warning_no_cellar,
+        const.extra_long_duration_no_warning_cellar, const.extra_long_duration_no_warning_no_cellar,
+        const.extra_long_duration_warning_cellar, const.extra_long_duration_warning_no_cellar])]
+curve_sets += [(curves, const.evacuation_depths, damages) for curves, damages in zip(
+    utils.evac_cost_curves.values(), [const.low_evacuation, const.mid_evacuation, const.high_evacuation])]
+
+
+@pytest.mark.parametrize("curves, measured_depths, direct_damages", curve_sets)
+def test_curves_match_measured_curves(curves, measured_depths, direct_damages):
+    rng = np.random.default_rng(0)
+    mcms = sorted(direct_damages)
+
+    # Measured depths, depths between them, and depths below the first and above the last
+    depths = np.concatenate([measured_depths, rng.uniform(measured_depths[0], measured_depths[-1], 200),
+                             [measured_depths[0] - 5, measured_depths[0] - 1e-9, measured_depths[-1] + 1e-9,
+                              measured_depths[-1] + 5]])
+    damages = curves.interpolate(mcms, np.broadcast_to(depths, (len(mcms), len(depths))))
+
+    for mcm, row in zip(mcms, damages):
+        # No damage below the first measured depth, greatest damage above the last
+        expected = np.interp(depths, measured_depths, direct_damages[mcm], left=0)
+        np.testing.assert_allclose(row, expected, rtol=1e-9, atol=1e-9, err_msg=f"MCM {mcm}")